@@ -7,6 +7,7 @@ RESULT_PATH = BASE_PATH.parent / "docs"  # for github pages
 MODEL_PATH = BASE_PATH.parent / "docs" / "models"
 DATA_PATH = BASE_PATH.parent / "data"
 TEMPLATE_PATH = BASE_PATH / "templates"
+CACHE_PATH = BASE_PATH.parent / ".cache"  # simulation results
 
 
 
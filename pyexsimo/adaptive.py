@@ -0,0 +1,245 @@
+"""
+Adaptive refinement of two-dimensional scans.
+
+Uniform scans spend the same number of simulations on smooth regions as on
+the regions of interest, e.g. the zero contours of HGP, GNG and GLY. The
+adaptive scan starts on a coarse grid and refines the cells
+
+* in which an output changes sign (zero contour), or
+* with high curvature, i.e. the values at the center and edge midpoints
+  deviate from the bilinear interpolation of the corners by more than
+  rtol times the range of the output.
+
+All points lie on the lattice of the finest grid (base * 2^levels cells per
+axis), refining a cell evaluates at most five new points. The refinement
+proceeds level by level until the finest level is reached or the point
+budget is used up; cells with sign changes are refined first. The scattered
+results are interpolated on the regular finest grid for imshow/contour.
+
+    evaluate = steady_state_evaluator(sbml_path, ['[glc_ext]', '[glyglc]'],
+                                      outputs=['HGP', 'GNG', 'GLY'])
+    scan = adaptive_scan(evaluate, {'[glc_ext]': (2, 14),
+                                    '[glyglc]': (0, 500)})
+    x, y, grids = scan.grid()
+"""
+import logging
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def steady_state_evaluator(model, keys: List[str], outputs: List[str],
+                           end: float = 1000, changes: Dict[str, float] = None,
+                           pool=None, **integrator_settings) -> Callable:
+    """Outputs at the end of timecourse simulations from the origin.
+
+    :param model: path of SBML model or SBML string
+    :param keys: ids of the scanned model values in model units
+    :param outputs: ids of the outputs
+    :param end: end time of the simulations, i.e. steady state
+    :param changes: fixed changes of all simulations
+    :return: function of points (n, len(keys)) returning the outputs
+        (n, len(outputs))
+    """
+    from pyexsimo.pool import get_pool
+    from pyexsimo.runner import INTEGRATOR_SETTINGS, set_integrator_settings
+
+    if pool is None:
+        pool = get_pool()
+    settings = dict(INTEGRATOR_SETTINGS)
+    settings.update(integrator_settings)
+
+    def evaluate(points: np.ndarray) -> np.ndarray:
+        values = np.zeros((len(points), len(outputs)))
+        with pool.simulator(model) as r:
+            set_integrator_settings(r, **settings)
+            for k, point in enumerate(points):
+                r.resetToOrigin()
+                for key, value in (changes or {}).items():
+                    r[key] = value
+                for key, value in zip(keys, point):
+                    r[key] = float(value)
+                r.simulate(0, end, 2)
+                values[k] = [r[sid] for sid in outputs]
+        return values
+
+    return evaluate
+
+
+class AdaptiveScanResult(object):
+    """Scattered points and outputs of an adaptive scan."""
+
+    def __init__(self, keys: List[str], ranges, outputs: List[str],
+                 n_cells: int, lattice: np.ndarray, values: np.ndarray):
+        """
+        :param n_cells: number of cells per axis of the finest grid
+        :param lattice: lattice indices of the points (n, 2)
+        :param values: outputs of the points (n, len(outputs))
+        """
+        self.keys = list(keys)
+        self.ranges = [tuple(r) for r in ranges]
+        self.outputs = list(outputs)
+        self.n_cells = n_cells
+        self.lattice = lattice
+        self.values = values
+
+    def __len__(self):
+        return len(self.lattice)
+
+    def axes(self) -> List[np.ndarray]:
+        """Values of the finest grid per axis."""
+        return [np.linspace(lower, upper, self.n_cells + 1)
+                for lower, upper in self.ranges]
+
+    @property
+    def points(self) -> np.ndarray:
+        """Points of the scan (n, 2)."""
+        return np.column_stack([axis[self.lattice[:, k]]
+                                for k, axis in enumerate(self.axes())])
+
+    def grid(self) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+        """Outputs linearly interpolated on the finest regular grid.
+
+        :return: (x, y, {output: values (len(x), len(y))})
+        """
+        from scipy.interpolate import griddata
+
+        x, y = self.axes()
+        X, Y = np.meshgrid(np.arange(len(x)), np.arange(len(y)), indexing="ij")
+        grids = {}
+        for k, sid in enumerate(self.outputs):
+            grids[sid] = griddata(self.lattice, self.values[:, k], (X, Y),
+                                  method="linear")
+        return x, y, grids
+
+    def to_df(self):
+        """Points and outputs as DataFrame."""
+        import pandas as pd
+
+        d = {key: self.points[:, k] for k, key in enumerate(self.keys)}
+        d.update({sid: self.values[:, k] for k, sid in enumerate(self.outputs)})
+        return pd.DataFrame(d)
+
+
+def _refinement_points(i: int, j: int, size: int) -> List[Tuple[int, int]]:
+    """Center and edge midpoints of cell."""
+    h = size // 2
+    return [(i + h, j + h), (i + h, j), (i + h, j + size),
+            (i, j + h), (i + size, j + h)]
+
+
+def adaptive_scan(evaluate: Callable, ranges: Dict[str, Tuple[float, float]],
+                  outputs: List[str] = None, base: int = 4, levels: int = 4,
+                  budget: int = None, rtol: float = 0.02,
+                  zero_outputs: List[str] = None) -> AdaptiveScanResult:
+    """Adaptive two-dimensional scan.
+
+    :param evaluate: function of points (n, 2) returning outputs (n, k)
+    :param ranges: ranges (lower, upper) of the two scan keys
+    :param outputs: ids of the outputs of evaluate
+    :param base: number of cells per axis of the coarse grid
+    :param levels: number of refinements of the coarse cells, the finest
+        grid has base * 2^levels cells per axis
+    :param budget: maximal number of evaluated points
+    :param rtol: curvature tolerance relative to the range of the outputs
+    :param zero_outputs: outputs whose zero contours are refined, all
+        outputs if None
+    """
+    if len(ranges) != 2:
+        raise ValueError(f"Adaptive scans are two-dimensional: {list(ranges)}")
+    if levels < 1:
+        raise ValueError("At least one refinement level required")
+    keys = list(ranges.keys())
+    bounds = [ranges[key] for key in keys]
+    n_cells = base * 2 ** levels
+    axes = [np.linspace(lower, upper, n_cells + 1) for lower, upper in bounds]
+
+    index = {}
+    lattice = []
+    values = []
+
+    def evaluate_points(nodes):
+        nodes = [node for node in dict.fromkeys(nodes) if node not in index]
+        if not nodes:
+            return
+        points = np.array([[axes[0][i], axes[1][j]] for i, j in nodes])
+        result = np.asarray(evaluate(points), dtype=float)
+        for node, value in zip(nodes, result):
+            index[node] = len(lattice)
+            lattice.append(node)
+            values.append(value)
+
+    def value(node):
+        return values[index[node]]
+
+    size = 2 ** levels
+    cells = [(i * size, j * size, size) for i in range(base)
+             for j in range(base)]
+    evaluate_points([(i, j) for i in range(0, n_cells + 1, size)
+                     for j in range(0, n_cells + 1, size)])
+    if outputs is None:
+        outputs = [f"y{k}" for k in range(len(values[0]))]
+    zero = [outputs.index(sid) for sid in (zero_outputs or outputs)]
+
+    # curvature error of the cells, inherited from the parent cell
+    errors = {cell: np.inf for cell in cells}
+    while True:
+        candidates = []
+        for cell in cells:
+            i, j, size = cell
+            if size < 2:
+                continue
+            corners = np.array([value((i, j)), value((i + size, j)),
+                                value((i, j + size)), value((i + size, j + size))])
+            c = corners[:, zero]
+            sign_change = np.any((c.min(axis=0) < 0) & (c.max(axis=0) > 0))
+            if sign_change:
+                candidates.append((np.inf, cell))
+            elif errors[cell] > rtol:
+                candidates.append((errors[cell], cell))
+        if not candidates:
+            break
+
+        candidates.sort(key=lambda item: -item[0])
+        refine = []
+        new = set()
+        for _, cell in candidates:
+            nodes = {node for node in _refinement_points(*cell)
+                     if node not in index}
+            if budget is not None and len(index) + len(new | nodes) > budget:
+                break
+            new |= nodes
+            refine.append(cell)
+        if not refine:
+            break
+        evaluate_points(sorted(new))
+
+        V = np.array(values)
+        scale = np.maximum(np.nanmax(V, axis=0) - np.nanmin(V, axis=0), 1E-300)
+        refined = set(refine)
+        children = [cell for cell in cells if cell not in refined]
+        for cell in refine:
+            i, j, size = cell
+            h = size // 2
+            # deviation of the new points from the bilinear interpolation
+            f00, f10 = value((i, j)), value((i + size, j))
+            f01, f11 = value((i, j + size)), value((i + size, j + size))
+            error = 0.0
+            for (a, b) in _refinement_points(i, j, size):
+                u, w = (a - i) / size, (b - j) / size
+                bilinear = (f00 * (1 - u) * (1 - w) + f10 * u * (1 - w)
+                            + f01 * (1 - u) * w + f11 * u * w)
+                error = max(error, np.nanmax(np.abs(value((a, b)) - bilinear)
+                                             / scale))
+            for child in [(i, j, h), (i + h, j, h), (i, j + h, h),
+                          (i + h, j + h, h)]:
+                children.append(child)
+                errors[child] = error
+        cells = children
+        logger.debug(f"Refined {len(refine)} cells, {len(index)} points")
+
+    return AdaptiveScanResult(keys=keys, ranges=bounds, outputs=outputs,
+                              n_cells=n_cells, lattice=np.array(lattice),
+                              values=np.array(values))
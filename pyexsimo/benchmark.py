@@ -0,0 +1,82 @@
+"""
+Benchmarks of the workflow.
+
+The import time of the lightweight package modules is measured in a fresh
+interpreter and must stay below the import time budget.
+"""
+import sys
+import json
+import subprocess
+
+# dependencies which are only imported on first use
+HEAVY_MODULES = [
+    'jinja2', 'libsbml', 'matplotlib', 'pandas', 'roadrunner', 'sbmlsim',
+    'sbmlutils',
+]
+
+# modules which must be importable without heavy dependencies
+LIGHT_MODULES = [
+    'pyexsimo',
+    'pyexsimo.adaptive',
+    'pyexsimo.cache',
+    'pyexsimo.catalog',
+    'pyexsimo.continuation',
+    'pyexsimo.designs',
+    'pyexsimo.execute',
+    'pyexsimo.experiments',
+    'pyexsimo.mca',
+    'pyexsimo.model_factory',
+    'pyexsimo.monitor',
+    'pyexsimo.network',
+    'pyexsimo.report',
+    'pyexsimo.residuals',
+    'pyexsimo.pool',
+    'pyexsimo.reference',
+    'pyexsimo.render',
+    'pyexsimo.runner',
+    'pyexsimo.schedules',
+    'pyexsimo.service',
+    'pyexsimo.surrogate',
+    'pyexsimo.units',
+    'pyexsimo.validation',
+    'pyexsimo.variants',
+]
+
+IMPORT_BUDGET = 0.5  # [s]
+
+_IMPORT_CODE = """
+import sys, time, json, importlib
+t = time.perf_counter()
+importlib.import_module({module!r})
+t = time.perf_counter() - t
+heavy = {heavy!r}
+print(json.dumps({{
+    'time': t,
+    'heavy': sorted(m for m in heavy if m in sys.modules),
+}}))
+"""
+
+
+def import_time(module: str, repeats: int = 3) -> dict:
+    """Import time of module in a fresh interpreter.
+
+    :param module: module name
+    :param repeats: number of measurements, minimal time is reported
+    :return: dictionary with import time [s] and loaded heavy modules
+    """
+    code = _IMPORT_CODE.format(module=module, heavy=HEAVY_MODULES)
+    timings = []
+    for _ in range(repeats):
+        out = subprocess.check_output([sys.executable, "-c", code])
+        timings.append(json.loads(out.decode("utf-8")))
+    return min(timings, key=lambda t: t['time'])
+
+
+def import_benchmark(modules=LIGHT_MODULES) -> dict:
+    """Import times of the lightweight modules."""
+    return {module: import_time(module) for module in modules}
+
+
+if __name__ == "__main__":
+    for module, info in import_benchmark().items():
+        print(f"{module:<30} {info['time']*1000:8.1f} ms  {info['heavy']}")
@@ -0,0 +1,284 @@
+"""
+Content-addressed cache for simulation results.
+
+Results of timecourse simulations and scans are stored as compressed numpy
+archives. The key of a result is the hash of the SBML model, the normalized
+simulation definition (timecourses, changes, scan values in model units) and
+the integrator settings. Tables of the experiment analyses are stored as
+TSV files, keyed on the simulations of the experiment, the analysis and the
+package source. The cache is limited in size, the least recently used
+results are removed first.
+"""
+import os
+import json
+import hashlib
+import logging
+from pathlib import Path
+
+import numpy as np
+
+from pyexsimo import CACHE_PATH
+from pyexsimo.utils import sbml_hash, write_atomic
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3  # 2 GB
+
+
+def _magnitude(value, unit):
+    """Magnitude of value in given unit as list of floats.
+
+    Values are rounded to 12 significant digits to remove round-off
+    errors of the unit conversion.
+    """
+    if hasattr(value, "units"):
+        value = value.to(unit).magnitude
+    values = np.asarray(value, dtype=float).ravel()
+    return [float(f"{v:.12g}") for v in values]
+
+
+def _tcsim_dict(tcsim, udict) -> dict:
+    """Normalized dictionary representation of the simulation."""
+    return {
+        'timecourses': [{
+            'start': tc.start,
+            'end': tc.end,
+            'steps': tc.steps,
+            'changes': {key: _magnitude(value, udict[key])
+                        for key, value in tc.changes.items()},
+            'model_changes': tc.model_changes,
+        } for tc in tcsim.timecourses],
+        'selections': tcsim.selections,
+        'reset': tcsim.reset,
+        'time_offset': tcsim.time_offset,
+    }
+
+
+def simulation_key(sbml_path, definition, udict, integrator_settings=None) -> str:
+    """Key for a timecourse simulation or scan.
+
+    :param sbml_path: path to SBML model
+    :param definition: TimecourseSim, TimecourseScan or DesignScan
+    :param udict: model units for normalization of changes and scan values
+    :param integrator_settings: dictionary of integrator settings
+    :return: SHA256 hex digest
+    """
+    from sbmlsim.timecourse import TimecourseSim, TimecourseScan
+    from pyexsimo.designs import DesignScan
+
+    if isinstance(definition, (TimecourseScan, DesignScan)):
+        d = {
+            'tcsim': _tcsim_dict(definition.tcsim, udict),
+            # order of scan keys defines the order of results
+            'scan': [[key, _magnitude(values, udict[key])]
+                     for key, values in definition.scan.items()],
+        }
+        if isinstance(definition, DesignScan):
+            # points instead of the product of the scan values
+            d['design'] = True
+    elif isinstance(definition, TimecourseSim):
+        d = {'tcsim': _tcsim_dict(definition, udict)}
+    else:
+        raise ValueError(f"Unsupported simulation definition: "
+                         f"'{type(definition)}'")
+
+    d['model'] = sbml_hash(sbml_path)
+    d['integrator'] = integrator_settings or {}
+    content = json.dumps(d, sort_keys=True, default=str)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def analysis_key(sbml_path, name: str, simulation_keys, source: str) -> str:
+    """Key for the table of an experiment analysis.
+
+    :param sbml_path: path to SBML model or SBML string
+    :param name: name of the analysis, e.g. 'PathwaySSExperiment.control'
+    :param simulation_keys: keys of the simulations and scans of the
+        experiment (model, definitions and integrator settings)
+    :param source: hash of the package source, i.e., the analysis code
+    :return: SHA256 hex digest
+    """
+    d = {
+        'model': sbml_hash(sbml_path),
+        'analysis': name,
+        'simulations': list(simulation_keys),
+        'source': source,
+    }
+    content = json.dumps(d, sort_keys=True)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class ResultCache(object):
+    """Least recently used cache of simulation results on disk."""
+
+    def __init__(self, cache_path: Path = CACHE_PATH,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_path = Path(cache_path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.cache_path.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str, suffix: str = ".npz") -> Path:
+        return self.cache_path / f"{key}{suffix}"
+
+    def __contains__(self, key: str):
+        return self._path(key).exists()
+
+    def get(self, key: str, udict=None, ureg=None):
+        """Cached result for key or None."""
+        path = self._path(key)
+        if not path.exists():
+            self.misses += 1
+            logger.info(f"Cache miss: '{key}'")
+            return None
+
+        result = load_result(path, udict=udict, ureg=ureg)
+        # update access time for least recently used eviction
+        os.utime(str(path))
+        self.hits += 1
+        logger.info(f"Cache hit: '{key}'")
+        return result
+
+    def put(self, key: str, result):
+        """Store result under key."""
+        save_result(result, self._path(key))
+        self.evict()
+
+    def get_table(self, key: str):
+        """Cached analysis table (DataFrame) for key or None."""
+        import pandas as pd
+
+        path = self._path(key, suffix=".tsv")
+        try:
+            table = pd.read_csv(path, sep="\t", float_precision="round_trip")
+        except FileNotFoundError:
+            self.misses += 1
+            logger.info(f"Cache miss: '{key}'")
+            return None
+
+        os.utime(str(path))
+        self.hits += 1
+        logger.info(f"Cache hit: '{key}'")
+        return table
+
+    def put_table(self, key: str, table):
+        """Store analysis table (DataFrame) under key."""
+        write_atomic(self._path(key, suffix=".tsv"),
+                     table.to_csv(sep="\t", index=False))
+        self.evict()
+
+    def _paths(self):
+        """Paths of results and tables in the cache."""
+        return (list(self.cache_path.glob("*.npz"))
+                + list(self.cache_path.glob("*.tsv")))
+
+    def _stats(self):
+        """(path, stat) of the cache entries.
+
+        Entries removed concurrently, e.g. evicted by another process, are
+        skipped.
+        """
+        stats = []
+        for path in self._paths():
+            try:
+                stats.append((path, path.stat()))
+            except FileNotFoundError:
+                continue
+        return stats
+
+    def entries(self):
+        """Cache entries sorted from least to most recently used."""
+        stats = sorted(self._stats(), key=lambda item: item[1].st_mtime)
+        return [path for path, _ in stats]
+
+    @property
+    def size(self) -> int:
+        """Size of cache in bytes."""
+        return sum(stat.st_size for _, stat in self._stats())
+
+    def evict(self):
+        """Remove least recently used results until size limit is reached."""
+        stats = sorted(self._stats(), key=lambda item: item[1].st_mtime)
+        size = sum(stat.st_size for _, stat in stats)
+        for path, stat in stats:
+            if size <= self.max_bytes:
+                break
+            size -= stat.st_size
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                # evicted by another process
+                continue
+            logger.info(f"Cache evict: '{path.stem}'")
+
+    def clear(self):
+        """Remove all results."""
+        for path in self._paths():
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                continue
+
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self.entries()),
+            'size': self.size,
+        }
+
+
+def save_result(result, path: Path):
+    """Store result as compressed numpy archive.
+
+    The scan information (keys, vecs, indices) is stored if available.
+    """
+    path = Path(path)
+    arrays = {
+        'data': result.data,
+        'columns': np.array(result.columns, dtype=str),
+    }
+    if hasattr(result, "keys"):
+        arrays['keys'] = np.array(result.keys, dtype=str)
+        arrays['indices'] = np.array(result.indices, dtype=int)
+        for k, vec in enumerate(result.vecs):
+            units = [str(v.units) for v in vec if hasattr(v, "units")]
+            arrays[f'vec_{k}'] = np.array(
+                [v.magnitude if hasattr(v, "units") else v for v in vec],
+                dtype=float)
+            arrays[f'vec_unit_{k}'] = np.array(units[0] if units else "")
+
+    # atomic write, concurrent readers never see partial files
+    path_tmp = path.parent / f".{path.name}.{os.getpid()}.tmp"
+    with open(str(path_tmp), "wb") as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(str(path_tmp), str(path))
+
+
+def load_result(path: Path, udict=None, ureg=None):
+    """Load result from compressed numpy archive."""
+    import pandas as pd
+    from sbmlsim.result import Result
+
+    with np.load(str(path)) as npz:
+        data = npz['data']
+        columns = list(npz['columns'])
+        frames = [pd.DataFrame(data[:, :, k], columns=columns)
+                  for k in range(data.shape[2])]
+        result = Result(frames, udict=udict, ureg=ureg)
+
+        if 'keys' in npz:
+            result.keys = list(npz['keys'])
+            result.indices = [tuple(index) for index in npz['indices']]
+            vecs = []
+            for k in range(len(result.keys)):
+                values = npz[f'vec_{k}']
+                unit = str(npz[f'vec_unit_{k}'])
+                if unit and ureg is not None:
+                    vecs.append(list(ureg.Quantity(values, unit)))
+                else:
+                    vecs.append(list(values))
+            result.vecs = vecs
+
+    return result
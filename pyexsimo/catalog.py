@@ -0,0 +1,345 @@
+"""
+Indexed catalog of the study data.
+
+The tables of the studies in the data directory (TSV exports of the xlsx
+sheets, the sheets of the xlsx without export and the study.json metadata)
+are ingested in a SQLite database with typed columns. The key columns
+(study, reference, condition, subject) are indexed and the units of the
+'*_unit' columns are precomputed. Files are only ingested again if their
+modification time or size changed, so that opening the catalog of an
+unchanged data collection costs a few stat calls.
+
+Table ids are the ids of the data files, i.e., '<study>_<sheet>' for
+'data/<study>/.<study>_<sheet>.tsv'.
+"""
+import os
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict
+
+from pyexsimo import DATA_PATH, CACHE_PATH
+
+logger = logging.getLogger(__name__)
+
+# indexed columns for queries
+INDEX_COLUMNS = ['study', 'reference', 'condition', 'subject']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS studies (
+    study TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    metadata TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tables (
+    table_id TEXT PRIMARY KEY,
+    study TEXT NOT NULL,
+    path TEXT NOT NULL,
+    sheet TEXT,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    dtypes TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS units (
+    table_id TEXT NOT NULL,
+    unit_column TEXT NOT NULL,
+    units TEXT NOT NULL,
+    PRIMARY KEY (table_id, unit_column)
+);
+CREATE TABLE IF NOT EXISTS workbooks (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    sheets TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tables_study ON tables (study);
+"""
+
+
+def _quote(identifier: str) -> str:
+    """Quote SQL identifier."""
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _data_table(table_id: str) -> str:
+    return _quote(f"data_{table_id}")
+
+
+def _signature(path: Path):
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+class DataCatalog(object):
+    """Catalog of the study tables in the data directory."""
+
+    def __init__(self, data_path: Path = DATA_PATH, db_path: Path = None):
+        """
+        :param data_path: directory of the studies
+        :param db_path: path of the SQLite database, by default the database
+            is stored in the cache directory keyed on the data path
+        """
+        self.data_path = Path(data_path).resolve()
+        if db_path is None:
+            key = hashlib.sha256(str(self.data_path).encode("utf-8")).hexdigest()
+            db_path = CACHE_PATH / "catalog" / f"data_{key[:16]}.sqlite"
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), timeout=60,
+                                     check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        self.update()
+
+    def close(self):
+        self._conn.close()
+
+    # --- ingestion ---
+
+    def _sources(self):
+        """Study metadata and table sources in the data directory.
+
+        :return: (studies, tables) with studies {study: path} and
+            tables {table_id: (study, path, sheet)}
+        """
+        studies = {}
+        tables = {}
+        for study_path in sorted(self.data_path.iterdir()):
+            if not study_path.is_dir() or study_path.name.startswith("."):
+                continue
+            study = study_path.name
+            json_path = study_path / "study.json"
+            if json_path.exists():
+                studies[study] = json_path
+            for tsv_path in sorted(study_path.glob("*.tsv")):
+                table_id = tsv_path.stem.lstrip(".")
+                tables[table_id] = (study, tsv_path, None)
+
+            xlsx_path = study_path / f"{study}.xlsx"
+            if xlsx_path.exists():
+                for sheet in self._sheet_names(xlsx_path):
+                    table_id = f"{study}_{sheet}"
+                    if table_id not in tables:
+                        tables[table_id] = (study, xlsx_path, sheet)
+        return studies, tables
+
+    def _sheet_names(self, xlsx_path: Path):
+        """Sheet names of workbook, cached by file signature."""
+        mtime_ns, size = _signature(xlsx_path)
+        row = self._conn.execute(
+            "SELECT mtime_ns, size, sheets FROM workbooks WHERE path = ?",
+            (str(xlsx_path),)).fetchone()
+        if row is not None and row[:2] == (mtime_ns, size):
+            return json.loads(row[2])
+
+        import openpyxl
+        workbook = openpyxl.load_workbook(str(xlsx_path), read_only=True)
+        sheets = workbook.sheetnames
+        workbook.close()
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO workbooks VALUES (?, ?, ?, ?)",
+                (str(xlsx_path), mtime_ns, size, json.dumps(sheets)))
+        return sheets
+
+    def update(self):
+        """Ingest new and changed files, remove deleted tables.
+
+        :return: list of ingested table ids
+        """
+        with self._lock:
+            studies, tables = self._sources()
+
+            for study, json_path in studies.items():
+                mtime_ns, size = _signature(json_path)
+                row = self._conn.execute(
+                    "SELECT mtime_ns, size FROM studies WHERE study = ?",
+                    (study,)).fetchone()
+                if row == (mtime_ns, size):
+                    continue
+                with open(json_path, "r") as f_json:
+                    content = f_json.read().strip()
+                metadata = json.loads(content) if content else {}
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO studies VALUES (?, ?, ?, ?, ?)",
+                        (study, str(json_path), mtime_ns, size,
+                         json.dumps(metadata)))
+
+            ingested = []
+            known = {row[0]: row[1:] for row in self._conn.execute(
+                "SELECT table_id, path, sheet, mtime_ns, size FROM tables")}
+            for table_id, (study, path, sheet) in tables.items():
+                signature = (str(path), sheet) + _signature(path)
+                if known.get(table_id) != signature:
+                    self._ingest(table_id, study, path, sheet)
+                    ingested.append(table_id)
+
+            for table_id in set(known) - set(tables):
+                self._remove(table_id)
+
+        if ingested:
+            logger.info(f"Data catalog: ingested {ingested}")
+        return ingested
+
+    def _read(self, path: Path, sheet: str = None):
+        import pandas as pd
+
+        if sheet is None:
+            return pd.read_csv(path, sep="\t", comment="#")
+        # first row human readable header, second row column ids
+        return pd.read_excel(str(path), sheet_name=sheet, header=1,
+                             comment="#")
+
+    def _ingest(self, table_id: str, study: str, path: Path, sheet: str):
+        df = self._read(path, sheet)
+        dtypes = {column: str(dtype) for column, dtype in df.dtypes.items()}
+        mtime_ns, size = _signature(path)
+
+        with self._conn:
+            self._remove(table_id, commit=False)
+            # typed columns: REAL, INTEGER and TEXT by pandas dtype
+            df.to_sql(f"data_{table_id}", self._conn, index=False)
+            for column in INDEX_COLUMNS:
+                if column in df.columns:
+                    self._conn.execute(
+                        f"CREATE INDEX {_quote(f'idx_{table_id}_{column}')} "
+                        f"ON {_data_table(table_id)} ({_quote(column)})")
+            self._conn.execute(
+                "INSERT INTO tables VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (table_id, study, str(path), sheet, mtime_ns, size,
+                 json.dumps(dtypes)))
+            for column in df.columns:
+                if column == "unit" or column.endswith("_unit"):
+                    units = [str(u) for u in df[column].dropna().unique()]
+                    self._conn.execute(
+                        "INSERT INTO units VALUES (?, ?, ?)",
+                        (table_id, column, json.dumps(units)))
+
+    def _remove(self, table_id: str, commit=True):
+        def remove():
+            self._conn.execute(f"DROP TABLE IF EXISTS {_data_table(table_id)}")
+            self._conn.execute("DELETE FROM tables WHERE table_id = ?",
+                               (table_id,))
+            self._conn.execute("DELETE FROM units WHERE table_id = ?",
+                               (table_id,))
+        if commit:
+            with self._conn:
+                remove()
+        else:
+            remove()
+
+    # --- queries ---
+
+    def studies(self) -> Dict[str, dict]:
+        """Metadata of the studies."""
+        rows = self._conn.execute(
+            "SELECT study, metadata FROM studies ORDER BY study")
+        return {study: json.loads(metadata) for study, metadata in rows}
+
+    def tables(self, study: str = None):
+        """Table ids of all studies or the given study."""
+        if study is None:
+            rows = self._conn.execute(
+                "SELECT table_id FROM tables ORDER BY table_id")
+        else:
+            rows = self._conn.execute(
+                "SELECT table_id FROM tables WHERE study = ? "
+                "ORDER BY table_id", (study,))
+        return [row[0] for row in rows]
+
+    def _dtypes(self, table_id: str) -> dict:
+        row = self._conn.execute(
+            "SELECT dtypes FROM tables WHERE table_id = ?",
+            (table_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"Table '{table_id}' not in data catalog "
+                           f"'{self.data_path}'")
+        return json.loads(row[0])
+
+    def _where(self, table_id: str, filters: dict):
+        """SQL condition and parameters for filters on columns."""
+        dtypes = self._dtypes(table_id)
+        clauses = []
+        params = []
+        for column, value in filters.items():
+            if value is None:
+                continue
+            if column not in dtypes:
+                raise ValueError(f"Column '{column}' not in table "
+                                 f"'{table_id}'")
+            if isinstance(value, (list, tuple, set)):
+                values = list(value)
+                clauses.append(f"{_quote(column)} IN "
+                               f"({', '.join('?' * len(values))})")
+                params.extend(values)
+            else:
+                clauses.append(f"{_quote(column)} = ?")
+                params.append(value)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+
+    def query(self, table_id: str, **filters):
+        """Rows of table matching the filters as DataFrame.
+
+        Filters are column values or lists of column values, e.g.,
+        query("Glycogen_TabRothman1991", condition="normal", subject="P1").
+        The row order and column types are the ones of the data file.
+        """
+        import numpy as np
+        import pandas as pd
+
+        dtypes = self._dtypes(table_id)
+        where, params = self._where(table_id, filters)
+        df = pd.read_sql_query(
+            f"SELECT * FROM {_data_table(table_id)}{where} ORDER BY rowid",
+            self._conn, params=params)
+        for column, dtype in dtypes.items():
+            if dtype == "object":
+                # missing text values are NaN as in read_csv
+                df[column] = df[column].where(df[column].notna(), np.nan)
+            elif str(df[column].dtype) != dtype:
+                df[column] = df[column].astype(dtype)
+        return df
+
+    def unit(self, table_id: str, column: str, **filters) -> str:
+        """Unit of unit column, i.e., first unit of the matching rows.
+
+        The precomputed units are used if the column has a single unit.
+        """
+        self._dtypes(table_id)
+        row = self._conn.execute(
+            "SELECT units FROM units WHERE table_id = ? AND unit_column = ?",
+            (table_id, column)).fetchone()
+        if row is None:
+            raise ValueError(f"Unit column '{column}' not in table "
+                             f"'{table_id}'")
+        units = json.loads(row[0])
+        if len(units) == 1:
+            return units[0]
+
+        where, params = self._where(table_id, filters)
+        row = self._conn.execute(
+            f"SELECT {_quote(column)} FROM {_data_table(table_id)}{where} "
+            f"ORDER BY rowid LIMIT 1", params).fetchone()
+        if row is None:
+            raise ValueError(f"No rows in table '{table_id}' for {filters}")
+        return row[0]
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(data_path: Path = DATA_PATH) -> DataCatalog:
+    """Data catalog of the data path, opened once per process."""
+    key = (os.getpid(), str(Path(data_path).resolve()))
+    with _catalogs_lock:
+        if key not in _catalogs:
+            _catalogs[key] = DataCatalog(data_path)
+        return _catalogs[key]
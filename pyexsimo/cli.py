@@ -0,0 +1,375 @@
+"""
+Command line interface.
+
+Runs the individual stages of the analysis, e.g.,
+
+    pyexsimo build-models --no-html
+    pyexsimo build-data --jobs 2
+    pyexsimo run -e GlycogenExperiment --no-figures
+    pyexsimo run --jobs 4
+    pyexsimo render --jobs 4 --svgz
+    pyexsimo report
+    pyexsimo reference --check
+    pyexsimo surrogate --method rbf
+    pyexsimo serve --port 8765
+    pyexsimo loadgen --port 8765 --requests 2000 --concurrency 16
+    pyexsimo bench -e DoseResponseExperiment
+"""
+import sys
+import time
+import logging
+import argparse
+from pathlib import Path
+
+from pyexsimo import __version__
+from pyexsimo import MODEL_PATH, RESULT_PATH, CACHE_PATH, DATA_PATH
+from pyexsimo.experiments import EXPERIMENTS
+from pyexsimo.reference import REFERENCE_PATH, RTOL, ATOL
+from pyexsimo.surrogate import METHODS
+from pyexsimo.service import HOST as SERVICE_HOST, PORT as SERVICE_PORT
+
+logger = logging.getLogger(__name__)
+
+
+def build_models(args):
+    """Create the SBML models and HTML reports of changed models."""
+    from pyexsimo.model_factory import create_models, create_model_reports
+
+    sbml_paths = create_models(target_dir=args.output, create_report=False)
+    if not args.no_html:
+        create_model_reports(sbml_paths, report_dir=args.output,
+                             jobs=args.jobs, force=args.force_html)
+
+
+def build_data(args):
+    """Export changed sheets of the study workbooks to TSV."""
+    from pyexsimo.data import build_data as _build_data
+
+    return _build_data(data_path=args.data, studies=args.studies,
+                       jobs=args.jobs, force=args.force)
+
+
+def _result_cache(args):
+    from pyexsimo.cache import ResultCache
+
+    if args.no_cache:
+        return None
+    return ResultCache(args.cache)
+
+
+def run(args):
+    """Run the simulation experiments."""
+    from pyexsimo.execute import run_experiments
+
+    cache = _result_cache(args)
+    monitor = None
+    if args.monitor or args.abort_on_violation:
+        from pyexsimo.monitor import InvariantMonitor
+        monitor = InvariantMonitor(abort=args.abort_on_violation)
+    results = run_experiments(output_path=args.output,
+                              cache=cache,
+                              exp_ids=args.experiments,
+                              jobs=args.jobs,
+                              figures=not args.no_figures,
+                              model_path=args.models,
+                              monitor=monitor)
+    if cache is not None:
+        logger.info(f"Result cache: {cache.stats()}")
+    return results
+
+
+def render(args):
+    """Render the figures from the stored simulation results."""
+    from pyexsimo.render import render_figures
+
+    return render_figures(output_path=args.output,
+                          exp_ids=args.experiments,
+                          model_path=args.models,
+                          jobs=args.jobs,
+                          figure_format="svgz" if args.svgz else "svg",
+                          rasterize=args.rasterize,
+                          force=args.force)
+
+
+def report(args):
+    """Create the markdown report from the experiment summaries."""
+    from pyexsimo.report import create_report
+    from pyexsimo.runner import load_summary
+
+    exp_ids = args.experiments or list(EXPERIMENTS.keys())
+    summaries = [load_summary(exp_id, output_path=args.output)
+                 for exp_id in exp_ids]
+    create_report(summaries, output_path=args.output, force=args.force)
+
+
+def reference(args):
+    """Create the reference results or compare the results with them."""
+    from pyexsimo.reference import (create_references, check_references,
+                                    format_diffs)
+
+    cache = _result_cache(args)
+    if not args.check:
+        return create_references(exp_ids=args.experiments,
+                                 reference_path=args.references,
+                                 model_path=args.models, cache=cache)
+
+    diffs = check_references(exp_ids=args.experiments,
+                             reference_path=args.references,
+                             model_path=args.models, cache=cache,
+                             rtol=args.rtol, atol=args.atol)
+    print(format_diffs(diffs))
+    failed = [d for d in diffs if not d['ok']]
+    if failed:
+        raise SystemExit(f"{len(failed)} outputs differ from the references")
+    return diffs
+
+
+def surrogate(args):
+    """Train the surrogate of HGP, GNG and GLY on the steady-state scan."""
+    from pyexsimo.surrogate import pathway_surrogate
+
+    model = EXPERIMENTS['PathwaySSExperiment']['model']
+    s = pathway_surrogate(results_path=args.output / "sbmlsim",
+                          model_path=args.models / model,
+                          method=args.method, n_validation=args.validation)
+    path = args.path or args.output / f"pathway_surrogate_{args.method}.npz"
+    s.save(path)
+    for sid in s.outputs:
+        if sid in s.validation:
+            errors = s.validation[sid]
+            print(f"{sid:<6} nrmse={errors['nrmse']:.2e}  "
+                  f"max_rel_error={errors['max_rel_error']:.2e}")
+    print(f"Surrogate: '{path}'")
+    return s
+
+
+def serve(args):
+    """Run the local simulation service."""
+    from pyexsimo.service import serve as _serve
+
+    _serve(host=args.host, port=args.port, path=args.unix,
+           model_path=args.models, workers=args.workers,
+           batch_window=args.batch_window / 1000)
+
+
+def loadgen(args):
+    """Load test of the running simulation service."""
+    from pyexsimo.service import load_test, random_payloads
+
+    payloads = random_payloads(args.distinct, end=args.end)
+    stats = load_test(payloads, n=args.requests, concurrency=args.concurrency,
+                      host=args.host, port=args.port, path=args.unix)
+    print(f"requests={stats['requests']}  errors={stats['errors']}  "
+          f"concurrency={stats['concurrency']}")
+    print(f"p50={stats['p50']:.2f} ms  p99={stats['p99']:.2f} ms  "
+          f"mean={stats['mean']:.2f} ms  max={stats['max']:.2f} ms")
+    print(f"throughput={stats['throughput']:.1f} requests/s")
+    return stats
+
+
+def _add_service_arguments(parser):
+    parser.add_argument("--host", default=SERVICE_HOST,
+                        help="host of the service (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=SERVICE_PORT,
+                        help="port of the service (default: %(default)s)")
+    parser.add_argument("--unix", type=Path, metavar="PATH",
+                        help="Unix socket of the service instead of the port")
+
+
+def bench(args):
+    """Benchmark import times and the stages of the experiments."""
+    from pyexsimo.benchmark import import_benchmark
+    from pyexsimo.runner import experiment_summary
+
+    print("-" * 80)
+    print("Import times")
+    print("-" * 80)
+    for module, info in import_benchmark().items():
+        print(f"{module:<30} {info['time'] * 1000:8.1f} ms")
+
+    print("-" * 80)
+    print("Experiments")
+    print("-" * 80)
+    t_start = time.perf_counter()
+    results = run(args)
+    t_total = time.perf_counter() - t_start
+    for item in results:
+        summary = experiment_summary(item)
+        timings = "  ".join(f"{key}={value:.2f} s"
+                            for key, value in summary['timings'].items())
+        print(f"{summary['exp_id']:<30} {timings}")
+    print(f"{'total':<30} {t_total:.2f} s (jobs={args.jobs})")
+
+
+def _add_experiment_arguments(parser):
+    parser.add_argument("-e", "--experiments", nargs="+", metavar="EXP_ID",
+                        choices=list(EXPERIMENTS.keys()),
+                        help="ids of experiments (default: all)")
+
+
+def _add_run_arguments(parser):
+    _add_experiment_arguments(parser)
+    parser.add_argument("-o", "--output", type=Path, default=RESULT_PATH,
+                        help="output directory (default: %(default)s)")
+    parser.add_argument("-m", "--models", type=Path, default=MODEL_PATH,
+                        help="directory of SBML models (default: %(default)s)")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="number of worker processes (default: 1)")
+    parser.add_argument("--no-figures", action="store_true",
+                        help="headless run, do not create figures but store "
+                             "the simulation results")
+    parser.add_argument("--cache", type=Path, default=CACHE_PATH,
+                        help="directory of result cache (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="do not use the result cache")
+    parser.add_argument("--monitor", action="store_true",
+                        help="check non-negativity and conserved totals "
+                             "during the simulations")
+    parser.add_argument("--abort-on-violation", action="store_true",
+                        help="stop at the first violation of the invariants "
+                             "(implies --monitor)")
+
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="pyexsimo",
+        description="EXSIMO: executable simulation model of hepatic "
+                    "glucose metabolism")
+    parser.add_argument("--version", action="version",
+                        version=f"%(prog)s {__version__}")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    p = subparsers.add_parser("build-models", help="create SBML models")
+    p.add_argument("-o", "--output", type=Path, default=MODEL_PATH,
+                   help="model directory (default: %(default)s)")
+    p.add_argument("--no-html", action="store_true",
+                   help="do not create HTML reports of the models")
+    p.add_argument("--force-html", action="store_true",
+                   help="create HTML reports of unchanged models")
+    p.add_argument("-j", "--jobs", type=int, default=2,
+                   help="number of worker processes for the HTML reports "
+                        "(default: %(default)s)")
+    p.set_defaults(func=build_models)
+
+    p = subparsers.add_parser("build-data",
+                              help="export study workbooks to TSV")
+    p.add_argument("-d", "--data", type=Path, default=DATA_PATH,
+                   help="data directory (default: %(default)s)")
+    p.add_argument("-s", "--studies", nargs="+", metavar="STUDY",
+                   help="ids of studies (default: all)")
+    p.add_argument("-j", "--jobs", type=int, default=1,
+                   help="number of worker processes (default: 1)")
+    p.add_argument("--force", action="store_true",
+                   help="parse unchanged workbooks")
+    p.set_defaults(func=build_data)
+
+    p = subparsers.add_parser("run", help="run simulation experiments")
+    _add_run_arguments(p)
+    p.set_defaults(func=run)
+
+    p = subparsers.add_parser("render",
+                              help="render figures from stored results")
+    _add_experiment_arguments(p)
+    p.add_argument("-o", "--output", type=Path, default=RESULT_PATH,
+                   help="output directory (default: %(default)s)")
+    p.add_argument("-m", "--models", type=Path, default=MODEL_PATH,
+                   help="directory of SBML models (default: %(default)s)")
+    p.add_argument("-j", "--jobs", type=int, default=1,
+                   help="number of worker processes (default: 1)")
+    p.add_argument("--svgz", action="store_true",
+                   help="write compressed SVGZ figures")
+    p.add_argument("--rasterize", action="store_true",
+                   help="rasterize dense layers of the figures")
+    p.add_argument("--force", action="store_true",
+                   help="render figures with unchanged inputs")
+    p.set_defaults(func=render)
+
+    p = subparsers.add_parser("report", help="create markdown report")
+    _add_experiment_arguments(p)
+    p.add_argument("-o", "--output", type=Path, default=RESULT_PATH,
+                   help="output directory (default: %(default)s)")
+    p.add_argument("--force", action="store_true",
+                   help="render pages with unchanged inputs")
+    p.set_defaults(func=report)
+
+    p = subparsers.add_parser("reference",
+                              help="create or check reference results")
+    _add_experiment_arguments(p)
+    p.add_argument("--check", action="store_true",
+                   help="compare results with the references")
+    p.add_argument("-r", "--references", type=Path, default=REFERENCE_PATH,
+                   help="directory of references (default: %(default)s)")
+    p.add_argument("-m", "--models", type=Path, default=MODEL_PATH,
+                   help="directory of SBML models (default: %(default)s)")
+    p.add_argument("--rtol", type=float, default=RTOL,
+                   help="relative tolerance (default: %(default)s)")
+    p.add_argument("--atol", type=float, default=ATOL,
+                   help="absolute tolerance (default: %(default)s)")
+    p.add_argument("--cache", type=Path, default=CACHE_PATH,
+                   help="directory of result cache (default: %(default)s)")
+    p.add_argument("--no-cache", action="store_true",
+                   help="do not use the result cache")
+    p.set_defaults(func=reference)
+
+    p = subparsers.add_parser("surrogate",
+                              help="train surrogate of HGP, GNG and GLY")
+    p.add_argument("-o", "--output", type=Path, default=RESULT_PATH,
+                   help="output directory with the results of the "
+                        "PathwaySSExperiment (default: %(default)s)")
+    p.add_argument("-m", "--models", type=Path, default=MODEL_PATH,
+                   help="directory of SBML models (default: %(default)s)")
+    p.add_argument("--method", choices=METHODS, default="grid",
+                   help="surrogate method (default: %(default)s)")
+    p.add_argument("--validation", type=int, default=64,
+                   help="number of held-out validation simulations "
+                        "(default: %(default)s)")
+    p.add_argument("--path", type=Path,
+                   help="path of surrogate file "
+                        "(default: <output>/pathway_surrogate_<method>.npz)")
+    p.set_defaults(func=surrogate)
+
+    p = subparsers.add_parser("serve", help="run local simulation service")
+    _add_service_arguments(p)
+    p.add_argument("-m", "--models", type=Path, default=MODEL_PATH,
+                   help="directory of SBML models (default: %(default)s)")
+    p.add_argument("-w", "--workers", type=int, default=2,
+                   help="number of simulation threads (default: %(default)s)")
+    p.add_argument("--batch-window", type=float, default=2.0,
+                   help="time [ms] compatible requests are batched "
+                        "(default: %(default)s)")
+    p.set_defaults(func=serve)
+
+    p = subparsers.add_parser("loadgen",
+                              help="load test of the simulation service")
+    _add_service_arguments(p)
+    p.add_argument("-n", "--requests", type=int, default=1000,
+                   help="number of requests (default: %(default)s)")
+    p.add_argument("-c", "--concurrency", type=int, default=8,
+                   help="number of concurrent connections "
+                        "(default: %(default)s)")
+    p.add_argument("--distinct", type=int, default=200,
+                   help="number of random requests, sent cyclically "
+                        "(default: %(default)s)")
+    p.add_argument("--end", type=float, default=120,
+                   help="end time [min] of the simulations "
+                        "(default: %(default)s)")
+    p.set_defaults(func=loadgen)
+
+    p = subparsers.add_parser("bench", help="benchmark the analysis")
+    _add_run_arguments(p)
+    p.set_defaults(func=bench)
+
+    return parser
+
+
+def main(argv=None):
+    """Entry point of the command line interface."""
+    args = create_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO,
+                        format="%(levelname)s %(name)s: %(message)s")
+    args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
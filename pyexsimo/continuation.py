@@ -0,0 +1,432 @@
+"""
+Numerical continuation of steady states.
+
+Steady-state branches are traced with pseudo-arclength continuation in a
+model parameter, e.g. '[glc_ext]' or any global parameter. The steady-state
+equations are solved for the independent floating species z (the dependent
+species follow from the conservation laws, x = L z + c) with the
+concentration stoichiometry of 'pyexsimo.mca':
+
+    F(z, p) = Nc_R v(L z + c, p) = 0
+
+The parameter is scaled by the length of its interval, so that parameter
+and concentrations [mM] have similar magnitudes. Every step predicts
+along the tangent of the branch and corrects with Newton iterations on F
+and the arclength condition. The step size is adapted to the number of
+Newton iterations. Folds are detected by a sign change of the parameter
+component of the tangent, Hopf points by complex eigenvalues of the
+Jacobian crossing the imaginary axis.
+
+    branch = continuation(sbml_path, '[glc_ext]', 2, 14,
+                          changes={'[glyglc]': 250})
+    branch.df[['[glc_ext]', 'HGP', 'GNG', 'GLY', 'stable']]
+
+Branches are stored as one table (branch_table) with the results of the
+experiment and plotted from it (table_branches).
+"""
+import logging
+from typing import Dict, List
+
+import numpy as np
+
+from pyexsimo.network import get_network
+from pyexsimo.mca import (elasticities, concentration_stoichiometry,
+                          active_network, link_matrix)
+
+logger = logging.getLogger(__name__)
+
+# outputs of the branches
+OUTPUTS = ['HGP', 'GNG', 'GLY']
+
+FOLD = "fold"
+HOPF = "hopf"
+
+
+class ContinuationError(RuntimeError):
+    """Continuation failed, e.g. no initial steady state."""
+
+
+class SteadyStateSystem(object):
+    """Steady-state equations of the model in scaled coordinates."""
+
+    def __init__(self, r, network, parameter: str, x0: np.ndarray,
+                 rel_step: float = 1E-6):
+        """
+        :param r: roadrunner instance of model at the initial state
+        :param network: Network of the model
+        :param parameter: id of the continuation parameter
+        :param x0: initial floating species concentrations
+        """
+        self.r = r
+        self.parameter = parameter
+        self.rel_step = rel_step
+        model = r.model
+        self.x0 = np.array(x0, dtype=float)
+        self.species_ids = list(model.getFloatingSpeciesIds())
+
+        Nc = concentration_stoichiometry(r, network)
+        model.setFloatingSpeciesConcentrations(self.x0)
+        v0 = model.getReactionRates()
+        E0, _ = elasticities(r, self.x0[None, :],
+                             model.getBoundarySpeciesConcentrations()[None, :])
+        active, self.dynamic = active_network(Nc, E0, v0[None, :])
+        Na = Nc[np.ix_(self.dynamic, active)]
+        self.active = active
+        independent, self.L = link_matrix(Na)
+        self.NR = Na[independent]
+        self.independent = self.dynamic[independent]
+        # conserved part of the dynamic species, x = L z + c
+        xd = self.x0[self.dynamic]
+        self.c = xd - self.L @ self.x0[self.independent]
+
+        # scales of species and parameter
+        self.sz = np.ones(len(self.independent))
+        self.sp = 1.0
+
+    def state(self, z: np.ndarray) -> np.ndarray:
+        """Floating species concentrations of independent species z."""
+        x = self.x0.copy()
+        x[self.dynamic] = self.L @ z + self.c
+        return x
+
+    def set(self, y: np.ndarray):
+        """Set scaled state y = (z/sz, p/sp) in the model."""
+        z, p = y[:-1] * self.sz, y[-1] * self.sp
+        self.r[self.parameter] = p
+        self.r.model.setFloatingSpeciesConcentrations(self.state(z))
+
+    def residual(self, y: np.ndarray) -> np.ndarray:
+        self.set(y)
+        return self.NR @ self.r.model.getReactionRates()[self.active]
+
+    def jacobian(self, y: np.ndarray):
+        """Jacobian of the residual in scaled coordinates.
+
+        :return: (Jz (n x n), Jp (n, )), Jz is the reduced Jacobian of the
+            unscaled species
+        """
+        model = self.r.model
+        self.set(y)
+        x = model.getFloatingSpeciesConcentrations()
+        E, _ = elasticities(self.r, x[None, :],
+                            model.getBoundarySpeciesConcentrations()[None, :],
+                            rel_step=self.rel_step)
+        Ea = E[0][np.ix_(self.active, self.dynamic)]
+        Jz = self.NR @ Ea @ self.L
+
+        p = y[-1] * self.sp
+        h = self.rel_step * abs(p) + 1E-12
+        yp = y.copy()
+        yp[-1] = (p + h) / self.sp
+        f_up = self.residual(yp)
+        yp[-1] = (p - h) / self.sp
+        f_down = self.residual(yp)
+        self.set(y)
+        Jp = (f_up - f_down) / (2 * h)
+        return Jz, Jp
+
+    def scaled_jacobian(self, y: np.ndarray):
+        """Jacobian (n x n+1) with respect to scaled coordinates y."""
+        Jz, Jp = self.jacobian(y)
+        return np.column_stack([Jz * self.sz, Jp * self.sp]), Jz
+
+
+def _tangent(J: np.ndarray, previous: np.ndarray) -> np.ndarray:
+    """Unit tangent of the branch oriented along the previous tangent."""
+    A = np.vstack([J, previous])
+    b = np.zeros(A.shape[0])
+    b[-1] = 1.0
+    t = np.linalg.solve(A, b)
+    return t / np.linalg.norm(t)
+
+
+class Branch(object):
+    """Steady-state branch of the continuation."""
+
+    def __init__(self, parameter: str, species_ids: List[str],
+                 outputs: List[str]):
+        self.parameter = parameter
+        self.species_ids = species_ids
+        self.outputs = outputs
+        self.points = []
+        self.bifurcations = []
+
+    def __len__(self):
+        return len(self.points)
+
+    @property
+    def df(self):
+        """Branch as DataFrame with the columns of the simulation results."""
+        import pandas as pd
+
+        return pd.DataFrame(self.points)
+
+
+def continuation(model, parameter: str, start: float, stop: float,
+                 outputs=OUTPUTS, changes: Dict[str, float] = None,
+                 h0: float = 0.01, h_min: float = 1E-6, h_max: float = 0.1,
+                 max_steps: int = 2000, tol: float = 1E-9,
+                 max_iterations: int = 8, t_end: float = 1000,
+                 pool=None) -> Branch:
+    """Steady-state branch in parameter from start to stop.
+
+    The initial steady state is simulated at start. The continuation stops
+    if the parameter leaves the interval [start, stop], i.e., branches with
+    folds are followed until they leave the interval.
+
+    :param model: path of SBML model or SBML string
+    :param parameter: id of parameter, e.g. '[glc_ext]'
+    :param outputs: ids of the outputs stored per point
+    :param changes: fixed changes of the model, e.g. {'[glyglc]': 250}
+    :param h0: initial step length (scaled coordinates)
+    :param h_min: minimal step length, continuation fails below
+    :param h_max: maximal step length
+    :param tol: tolerance of the Newton corrections (scaled coordinates)
+    :param t_end: simulation time of the initial steady state
+    :param pool: SimulatorPool, the pool of the process if None
+    """
+    from pyexsimo.pool import get_pool
+
+    if pool is None:
+        pool = get_pool()
+    network = get_network(model)
+    direction = 1.0 if stop >= start else -1.0
+    p_min, p_max = min(start, stop), max(start, stop)
+
+    with pool.simulator(model) as r:
+        for key, value in (changes or {}).items():
+            r[key] = value
+        r[parameter] = start
+        r.simulate(0, t_end, 2)
+        x0 = r.model.getFloatingSpeciesConcentrations()
+        system = SteadyStateSystem(r, network, parameter, x0)
+        system.sp = max(abs(p_max - p_min), abs(start), 1E-12)
+
+        branch = Branch(parameter, system.species_ids, list(outputs))
+
+        # initial correction at fixed parameter
+        y = np.append(x0[system.independent] / system.sz, start / system.sp)
+        fixed = np.zeros(len(y))
+        fixed[-1] = 1.0
+        y, iterations = _newton(system, y, fixed, y, tol, max_iterations)
+        if y is None:
+            raise ContinuationError(
+                f"No steady state at {parameter} = {start}")
+
+        J, Jz = system.scaled_jacobian(y)
+        t = _tangent(J, direction * fixed)
+        h = h0
+        branch.points.append(_point(system, y, t, Jz, branch.outputs))
+        for step in range(max_steps):
+            y_pred = y + h * t
+            y_new, iterations = _newton(system, y_pred, t, y_pred, tol,
+                                        max_iterations)
+            if y_new is None:
+                h = h / 2
+                if h < h_min:
+                    logger.warning(f"Continuation stopped at {parameter} = "
+                                   f"{y[-1] * system.sp:.6g}, step size "
+                                   f"below {h_min}")
+                    break
+                continue
+
+            J, Jz = system.scaled_jacobian(y_new)
+            t_new = _tangent(J, t)
+            point = _point(system, y_new, t_new, Jz, branch.outputs)
+            kind = _bifurcation(branch.points[-1], point)
+            if kind is not None:
+                bifurcation = _locate(system, y, t, h, kind,
+                                      branch.points[-1], point,
+                                      branch.outputs, tol, max_iterations)
+                bifurcation.update({'type': kind, 'index': len(branch)})
+                branch.bifurcations.append(bifurcation)
+                logger.info(f"{kind} at {parameter} = "
+                            f"{bifurcation[parameter]:.6g}")
+            y, t = y_new, t_new
+            branch.points.append(point)
+            p = y[-1] * system.sp
+            if p < p_min or p > p_max:
+                break
+            if iterations <= 3:
+                h = min(1.5 * h, h_max)
+            elif iterations >= max_iterations - 2:
+                h = max(h / 2, h_min)
+
+    return branch
+
+
+def _newton(system: SteadyStateSystem, y, t, y_pred, tol, max_iterations):
+    """Newton correction of y on F(y) = 0 and t.(y - y_pred) = 0.
+
+    :return: (corrected y or None, number of iterations)
+    """
+    y = y.copy()
+    for k in range(1, max_iterations + 1):
+        F = system.residual(y)
+        J, _ = system.scaled_jacobian(y)
+        A = np.vstack([J, t])
+        b = -np.append(F, t @ (y - y_pred))
+        try:
+            dy = np.linalg.solve(A, b)
+        except np.linalg.LinAlgError:
+            return None, k
+        if not np.all(np.isfinite(dy)):
+            return None, k
+        y = y + dy
+        if np.max(np.abs(dy)) <= tol:
+            x = system.state(y[:-1] * system.sz)
+            if np.any(x < -tol):
+                return None, k
+            return y, k
+    return None, max_iterations
+
+
+def _point(system: SteadyStateSystem, y, t, Jz, outputs) -> dict:
+    """Point of the branch at state y with tangent t and reduced Jacobian
+    Jz."""
+    system.set(y)
+    x = system.r.model.getFloatingSpeciesConcentrations()
+    eigenvalues = np.linalg.eigvals(Jz)
+    scale = max(np.max(np.abs(eigenvalues)), 1.0) if len(eigenvalues) else 1.0
+    unstable = eigenvalues.real > 1E-10 * scale
+    complex_ = np.abs(eigenvalues.imag) > 1E-10 * scale
+    point = {system.parameter: y[-1] * system.sp}
+    point.update({f"[{sid}]": value for sid, value in zip(system.species_ids, x)})
+    point.update({sid: system.r[sid] for sid in outputs})
+    point.update({
+        'n_unstable': int(unstable.sum()),
+        'stable': not unstable.any(),
+        'tangent_p': float(t[-1]),
+        'max_real_complex': float(eigenvalues.real[complex_].max())
+        if complex_.any() else np.nan,
+    })
+    return point
+
+
+# keys of the points besides parameter, species and outputs
+_POINT_KEYS = ['n_unstable', 'stable', 'tangent_p', 'max_real_complex']
+
+# test function of the bifurcations, changes sign at the bifurcation
+_TEST_FUNCTIONS = {FOLD: 'tangent_p', HOPF: 'max_real_complex'}
+
+
+def _bifurcation(p0: dict, p1: dict):
+    """Type of bifurcation between adjacent points or None.
+
+    Folds change the direction of the parameter, at Hopf points the real
+    part of a complex pair of eigenvalues changes sign.
+    """
+    if np.sign(p0['tangent_p']) != np.sign(p1['tangent_p']):
+        return FOLD
+    a, b = p0['max_real_complex'], p1['max_real_complex']
+    if p0['n_unstable'] != p1['n_unstable'] and np.isfinite(a) \
+            and np.isfinite(b) and np.sign(a) != np.sign(b):
+        return HOPF
+    return None
+
+
+def _locate(system, y, t, h, kind, p0, p1, outputs, tol, max_iterations,
+            bisections: int = 40) -> dict:
+    """Bifurcation between y and the next point at step h by bisection of
+    the step on the test function of the bifurcation."""
+    key = _TEST_FUNCTIONS[kind]
+    a, b = 0.0, h
+    g_a = p0[key]
+    point = p1
+    for _ in range(bisections):
+        s = 0.5 * (a + b)
+        y_pred = y + s * t
+        y_s, _ = _newton(system, y_pred, t, y_pred, tol, max_iterations)
+        if y_s is None:
+            break
+        J, Jz = system.scaled_jacobian(y_s)
+        point = _point(system, y_s, _tangent(J, t), Jz, outputs)
+        g = point[key]
+        if not np.isfinite(g) or g == 0 or b - a <= tol:
+            break
+        if np.sign(g) == np.sign(g_a):
+            a, g_a = s, g
+        else:
+            b = s
+    return dict(point)
+
+
+def branch_table(branches: Dict[str, Branch]):
+    """Points and bifurcations of branches as one table.
+
+    The branches are labeled in column 'branch', bifurcations are rows with
+    their type in column 'bifurcation'.
+
+    :param branches: branches by label
+    """
+    import pandas as pd
+
+    dfs = []
+    for label, branch in branches.items():
+        df = branch.df
+        df['bifurcation'] = np.nan
+        df['index'] = np.nan
+        if branch.bifurcations:
+            bifurcations = pd.DataFrame(branch.bifurcations).rename(
+                columns={'type': 'bifurcation'})
+            df = pd.concat([df, bifurcations], ignore_index=True, sort=False)
+        df.insert(0, 'parameter', branch.parameter)
+        df.insert(0, 'branch', label)
+        dfs.append(df)
+    return pd.concat(dfs, ignore_index=True, sort=False)
+
+
+def table_branches(table) -> Dict[str, Branch]:
+    """Branches of a table of branch_table."""
+    branches = {}
+    for label, df in table.groupby('branch', sort=False):
+        parameter = df.parameter.iloc[0]
+        df = df.drop(columns=['branch', 'parameter'])
+        columns = [c for c in df.columns if c not in ['bifurcation', 'index']]
+        species_ids = [c[1:-1] for c in columns
+                       if c.startswith("[") and c != parameter]
+        outputs = [c for c in columns if c != parameter
+                   and not c.startswith("[") and c not in _POINT_KEYS]
+        branch = Branch(parameter, species_ids, outputs)
+        is_bifurcation = df.bifurcation.notna()
+        branch.points = df.loc[~is_bifurcation, columns].to_dict('records')
+        for point in df[is_bifurcation].to_dict('records'):
+            point['type'] = point.pop('bifurcation')
+            point['index'] = int(point['index'])
+            branch.bifurcations.append(point)
+        branches[label] = branch
+    return branches
+
+
+def plot_branches(branches: Dict[str, Branch], outputs=OUTPUTS, axes=None):
+    """Outputs of branches over the parameter.
+
+    Unstable parts of the branches are dashed, bifurcations are marked.
+
+    :param branches: branches by label
+    :param axes: axes per output, new figure if None
+    :return: matplotlib Figure
+    """
+    if axes is None:
+        from matplotlib import pyplot as plt
+        f, axes = plt.subplots(1, len(outputs), figsize=(5 * len(outputs), 5))
+        axes = np.atleast_1d(axes)
+    f = axes[0].figure
+    for label, branch in branches.items():
+        df = branch.df
+        p = df[branch.parameter].values
+        for ax, sid in zip(axes, outputs):
+            y = df[sid].values
+            line, = ax.plot(p, np.where(df.stable, y, np.nan), '-',
+                            label=label)
+            ax.plot(p, np.where(df.stable, np.nan, y), '--',
+                    color=line.get_color(), label="__nolabel__")
+            for bifurcation in branch.bifurcations:
+                ax.plot(bifurcation[branch.parameter], bifurcation[sid],
+                        'o' if bifurcation['type'] == FOLD else 's',
+                        color="black", label="__nolabel__")
+    for ax, sid in zip(axes, outputs):
+        ax.set_xlabel(branch.parameter)
+        ax.set_ylabel(sid)
+        ax.legend()
+    return f
@@ -0,0 +1,160 @@
+"""
+Export of the study data.
+
+Every study directory contains an xlsx workbook with one sheet per table.
+The first row of a sheet is the human readable header, the second row the
+column ids. The sheets are exported as hidden TSV files
+'data/<study>/.<study>_<sheet>.tsv' which are read by the experiments.
+
+The export is incremental: workbooks with unchanged hash are not parsed,
+for changed workbooks only sheets with changed content are written. The
+hashes are stored in 'data/<study>/.build.json'. Sheets are validated
+against the column schema before export.
+"""
+import json
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict, List
+
+from pyexsimo import DATA_PATH
+from pyexsimo.utils import file_hash, write_atomic
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = ".build.json"
+
+# missing values in the TSV files
+NA_REP = "NA"
+
+
+def tsv_path(study_path: Path, sheet: str) -> Path:
+    """Path of TSV export of sheet."""
+    study = Path(study_path).name
+    return Path(study_path) / f".{study}_{sheet}.tsv"
+
+
+def validate_sheet(df, study: str, sheet: str) -> List[str]:
+    """Validate column schema of sheet.
+
+    * column ids are unique and not empty
+    * 'study' column exists with the id of the study
+    * every unit column '<key>_unit' belongs to a column '<key>' and has
+      a unit for every value of the column
+
+    :param df: DataFrame with column ids as columns
+    :return: list of schema errors
+    """
+    errors = []
+    columns = [str(c) for c in df.columns]
+    for column in columns:
+        if column.startswith("Unnamed:") or not column.strip():
+            errors.append(f"empty column id in '{sheet}'")
+    duplicates = sorted({c for c in columns if columns.count(c) > 1})
+    if duplicates:
+        errors.append(f"duplicate column ids in '{sheet}': {duplicates}")
+
+    if "study" not in columns:
+        errors.append(f"missing column 'study' in '{sheet}'")
+    else:
+        studies = set(df["study"].dropna().unique())
+        if studies != {study}:
+            errors.append(f"'study' column in '{sheet}' is {sorted(studies)}, "
+                          f"expected '{study}'")
+
+    for column in columns:
+        if not column.endswith("_unit"):
+            continue
+        key = column[:-5]
+        if key not in columns:
+            errors.append(f"unit column '{column}' in '{sheet}' without "
+                          f"column '{key}'")
+            continue
+        missing = df[key].notna() & df[column].isna()
+        if missing.any():
+            errors.append(f"missing units in '{column}' of '{sheet}' "
+                          f"(rows {list(df.index[missing] + 3)})")
+    return errors
+
+
+def export_study(study_path: Path, force: bool = False) -> Dict[str, str]:
+    """Export changed sheets of the study workbook to TSV.
+
+    :param study_path: directory of the study
+    :param force: parse the workbook even if unchanged
+    :return: dictionary of sheet and status ('unchanged', 'written')
+    """
+    import pandas as pd
+
+    study_path = Path(study_path)
+    study = study_path.name
+    xlsx_path = study_path / f"{study}.xlsx"
+    manifest_path = study_path / MANIFEST_FILENAME
+
+    manifest = {}
+    if manifest_path.exists():
+        with open(manifest_path, "r") as f_json:
+            manifest = json.load(f_json)
+    sheets = manifest.get('sheets', {})
+
+    xlsx_hash = file_hash(xlsx_path)
+    if not force and manifest.get('xlsx') == xlsx_hash and all(
+            tsv_path(study_path, sheet).exists()
+            and file_hash(tsv_path(study_path, sheet)) == sheet_hash
+            for sheet, sheet_hash in sheets.items()):
+        logger.info(f"'{xlsx_path.name}' is up to date")
+        return {sheet: 'unchanged' for sheet in sheets}
+
+    dfs = pd.read_excel(str(xlsx_path), sheet_name=None, header=1)
+    errors = []
+    for sheet, df in dfs.items():
+        errors.extend(validate_sheet(df, study=study, sheet=sheet))
+    if errors:
+        raise ValueError(f"Invalid schema in '{xlsx_path}':\n  " +
+                         "\n  ".join(errors))
+
+    status = {}
+    sheets = {}
+    for sheet, df in dfs.items():
+        path = tsv_path(study_path, sheet)
+        content = df.to_csv(sep="\t", index=False, na_rep=NA_REP)
+        sheets[sheet] = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        if path.exists() and file_hash(path) == sheets[sheet]:
+            status[sheet] = 'unchanged'
+            continue
+        write_atomic(path, content)
+        status[sheet] = 'written'
+        logger.info(f"Export '{path}'")
+
+    manifest = {'xlsx': xlsx_hash, 'sheets': sheets}
+    write_atomic(manifest_path, json.dumps(manifest, indent=2, sort_keys=True))
+    return status
+
+
+def study_paths(data_path: Path = DATA_PATH) -> List[Path]:
+    """Directories of the studies with workbook."""
+    return [p for p in sorted(Path(data_path).iterdir())
+            if p.is_dir() and (p / f"{p.name}.xlsx").exists()]
+
+
+def build_data(data_path: Path = DATA_PATH, studies=None, jobs: int = 1,
+               force: bool = False) -> Dict[str, Dict[str, str]]:
+    """Export changed sheets of all study workbooks.
+
+    :param studies: ids of studies, all studies if None
+    :param jobs: number of worker processes
+    :param force: parse workbooks even if unchanged
+    :return: dictionary of study and export status of sheets
+    """
+    paths = study_paths(data_path)
+    if studies is not None:
+        paths = [p for p in paths if p.name in studies]
+
+    if jobs <= 1 or len(paths) <= 1:
+        return {p.name: export_study(p, force=force) for p in paths}
+
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {p.name: executor.submit(export_study, p, force)
+                   for p in paths}
+        return {study: future.result() for study, future in futures.items()}
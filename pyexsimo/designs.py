@@ -0,0 +1,326 @@
+"""
+Space-filling and sparse-grid scan designs.
+
+A TimecourseScan simulates the full factorial product of the scan values,
+i.e. 40 x 40 = 1600 simulations for two inputs and far too many for four or
+five. A DesignScan simulates the points of a design instead, which cover
+the input ranges within a fixed budget of simulations:
+
+* 'lhs': Latin hypercube, every input is stratified in n intervals
+* 'sobol': scrambled Sobol low-discrepancy sequence
+* 'smolyak': Smolyak sparse grid of nested Clenshaw-Curtis nodes, the
+  largest level within the budget
+
+    scan = DesignScan.from_ranges(tcsim, ranges={
+        '[glc_ext]': Q_([2, 14], 'mM'),
+        '[glyglc]': Q_([0, 500], 'mM'),
+        'bodyweight': Q_([50, 100], 'kg'),
+        'x_ins1': Q_([400, 1200], 'pM'),
+    }, n=256, design='sobol')
+
+The results of design scans are addressable by point index: the frame k
+of the result is the simulation of point k, and result.vecs and
+result.indices are stored "diagonally" (index (k, ..., k) for point k), so
+the scan values of results from the cache, the residuals and the
+references are handled like factorial scans. Response surfaces interpolate
+outputs of scans between the points.
+"""
+import logging
+from itertools import product
+from typing import Dict, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DESIGNS = ['lhs', 'sobol', 'smolyak']
+
+
+def latin_hypercube(n: int, d: int, seed: int = None) -> np.ndarray:
+    """Latin hypercube points (n, d) in the unit cube."""
+    from scipy.stats import qmc
+    return qmc.LatinHypercube(d, seed=seed).random(n)
+
+
+def sobol(n: int, d: int, seed: int = None) -> np.ndarray:
+    """Scrambled Sobol points (n, d) in the unit cube.
+
+    Balance properties of the sequence require n to be a power of 2.
+    """
+    import warnings
+    from scipy.stats import qmc
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        return qmc.Sobol(d, scramble=True, seed=seed).random(n)
+
+
+def _cc_nodes(i: int) -> np.ndarray:
+    """Nested Clenshaw-Curtis nodes of level i >= 1 in [0, 1]."""
+    if i == 1:
+        return np.array([0.5])
+    m = 2 ** (i - 1) + 1
+    # rounding makes the nodes of the levels identical
+    return np.round(0.5 * (1 - np.cos(np.pi * np.arange(m) / (m - 1))), 15)
+
+
+def _smolyak_indices(level: int, d: int) -> List[tuple]:
+    """Multi-indices i (i_k >= 1) with d <= |i| <= d + level."""
+    return [i for i in product(range(1, level + 2), repeat=d)
+            if sum(i) <= d + level]
+
+
+def smolyak(level: int, d: int) -> np.ndarray:
+    """Smolyak sparse grid points (n, d) in the unit cube.
+
+    :param level: level of the sparse grid, 0 is the center point
+    """
+    points = set()
+    for i in _smolyak_indices(level, d):
+        points.update(product(*[_cc_nodes(ik) for ik in i]))
+    return np.array(sorted(points))
+
+
+def smolyak_level(n: int, d: int) -> int:
+    """Largest level of the Smolyak grid with at most n points."""
+    level = 0
+    while len(smolyak(level + 1, d)) <= n:
+        level += 1
+    return level
+
+
+def design_points(design: str, n: int, d: int, seed: int = None) -> np.ndarray:
+    """Points (n, d) of the design in the unit cube.
+
+    For the Smolyak grid n is the budget, the grid can have fewer points.
+    """
+    if design == 'lhs':
+        return latin_hypercube(n, d, seed=seed)
+    elif design == 'sobol':
+        return sobol(n, d, seed=seed)
+    elif design == 'smolyak':
+        return smolyak(smolyak_level(n, d), d)
+    raise ValueError(f"Unknown design '{design}', designs are: {DESIGNS}")
+
+
+class DesignScan(object):
+    """Scan over the points of a design.
+
+    Attributes as TimecourseScan, but the scan values of the keys are the
+    coordinates of the points, i.e. all values have the same length.
+    """
+
+    def __init__(self, tcsim, scan: Dict, design: str = None):
+        """
+        :param tcsim: TimecourseSim
+        :param scan: dictionary of key and values of the points
+        :param design: name of the design
+        """
+        lengths = {len(values) for values in scan.values()}
+        if len(lengths) != 1:
+            raise ValueError(f"Scan values of the points must have the same "
+                             f"length: {sorted(lengths)}")
+        self.tcsim = tcsim
+        self.scan = scan
+        self.design = design
+
+    def __len__(self):
+        return len(next(iter(self.scan.values())))
+
+    @classmethod
+    def from_ranges(cls, tcsim, ranges: Dict, n: int, design: str = 'sobol',
+                    seed: int = 0) -> 'DesignScan':
+        """Design in the ranges of the keys.
+
+        :param ranges: dictionary of key and (lower, upper), values can be
+            quantities
+        :param n: number of points (budget of the Smolyak grid)
+        """
+        u = design_points(design, n, len(ranges), seed=seed)
+        scan = {}
+        for k, (key, (lower, upper)) in enumerate(ranges.items()):
+            scan[key] = lower + (upper - lower) * u[:, k]
+        logger.info(f"{design} design: {len(u)} points, {len(ranges)} keys")
+        return cls(tcsim=tcsim, scan=scan, design=design)
+
+    def normalize(self, udict, ureg):
+        self.tcsim.normalize(udict=udict, ureg=ureg)
+
+    def simulate(self, simulator):
+        """Simulate the points of the design.
+
+        :param simulator: sbmlsim simulator
+        :return: Result with frame k for point k
+        """
+        from copy import deepcopy
+
+        keys = list(self.scan.keys())
+        vecs = [list(values) for values in self.scan.values()]
+        sims = []
+        for p in range(len(self)):
+            sim = deepcopy(self.tcsim)
+            # changes are mixed in the first timecourse
+            tc = sim.timecourses[0]
+            for key, vec in zip(keys, vecs):
+                tc.add_change(key, vec[p])
+            sims.append(sim)
+
+        result = simulator.timecourses(sims)
+        result.keys = keys
+        result.vecs = vecs
+        result.indices = [(p,) * len(keys) for p in range(len(self))]
+        return result
+
+
+def run_scan(simulator, definition):
+    """Simulate TimecourseScan or DesignScan."""
+    if isinstance(definition, DesignScan):
+        return definition.simulate(simulator)
+    return simulator.scan(definition)
+
+
+def scan_points(result):
+    """Scan values of the points of a scan result in model units.
+
+    :return: DataFrame with row k for point (frame) k
+    """
+    import pandas as pd
+
+    values = {}
+    for k, key in enumerate(result.keys):
+        vec = [getattr(v, 'magnitude', v) for v in result.vecs[k]]
+        values[key] = np.array([vec[index[k]] for index in result.indices],
+                               dtype=float)
+    return pd.DataFrame(values, columns=list(result.keys))
+
+
+def _lagrange_weights(nodes: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """Lagrange basis polynomials of the nodes at x (len(x), len(nodes))."""
+    W = np.ones((len(x), len(nodes)))
+    for j, xj in enumerate(nodes):
+        for m, xm in enumerate(nodes):
+            if m != j:
+                W[:, j] *= (x - xm) / (xj - xm)
+    return W
+
+
+class _SmolyakInterpolant(object):
+    """Smolyak interpolation (combination technique) on the unit cube."""
+
+    def __init__(self, u: np.ndarray, values: np.ndarray):
+        from scipy.special import comb
+
+        d = u.shape[1]
+        level = 0
+        while len(smolyak(level, d)) < len(u):
+            level += 1
+        nodes = smolyak(level, d)
+        if len(nodes) != len(u):
+            raise ValueError(f"Points are not a Smolyak grid: {len(u)} points")
+        lookup = {tuple(np.round(p, 12)): v for p, v in zip(u, values)}
+        self.terms = []
+        for i in _smolyak_indices(level, d):
+            q = d + level - sum(i)
+            if q > d - 1:
+                continue
+            coefficient = (-1) ** q * comb(d - 1, q, exact=True)
+            grids = [_cc_nodes(ik) for ik in i]
+            try:
+                F = np.array([lookup[tuple(np.round(p, 12))]
+                              for p in product(*grids)])
+            except KeyError:
+                raise ValueError("Points are not a Smolyak grid")
+            F = F.reshape([len(g) for g in grids])
+            self.terms.append((coefficient, grids, F))
+
+    def __call__(self, u: np.ndarray) -> np.ndarray:
+        y = np.zeros(len(u))
+        for coefficient, grids, F in self.terms:
+            R = F[None, ...]
+            for k, grid in enumerate(grids):
+                W = _lagrange_weights(grid, u[:, k])
+                R = np.einsum('qa,qa...->q...', W, np.broadcast_to(
+                    R, (len(u),) + R.shape[1:]))
+            y += coefficient * R
+        return y
+
+
+class ResponseSurface(object):
+    """Interpolation of an output between the points of a scan."""
+
+    METHODS = ['linear', 'nearest', 'rbf', 'smolyak']
+
+    def __init__(self, keys: List[str], points: np.ndarray, values: np.ndarray,
+                 method: str = 'rbf', **kwargs):
+        """
+        :param points: scan values of the points (n, len(keys))
+        :param values: output of the points (n,), outputs (n, m) with 'rbf'
+        :param method: interpolation method, 'rbf' (thin plate spline),
+            'linear' (Delaunay), 'nearest' or 'smolyak' (points of a Smolyak
+            design)
+        :param kwargs: arguments of the scipy interpolator
+        """
+        from scipy import interpolate
+
+        self.keys = list(keys)
+        self.method = method
+        points = np.asarray(points, dtype=float)
+        values = np.asarray(values, dtype=float)
+        # interpolation on the unit cube, the inputs have different scales
+        self.lower = points.min(axis=0)
+        self.scale = np.where(points.max(axis=0) > self.lower,
+                              points.max(axis=0) - self.lower, 1.0)
+        u = self._unit(points)
+
+        if method == 'rbf':
+            kwargs.setdefault('kernel', 'thin_plate_spline')
+            self._f = interpolate.RBFInterpolator(u, values, **kwargs)
+        elif method == 'linear':
+            if len(self.keys) == 1:
+                order = np.argsort(u[:, 0])
+                self._f = lambda x: np.interp(x[:, 0], u[order, 0],
+                                              values[order], left=np.nan,
+                                              right=np.nan)
+            else:
+                self._f = interpolate.LinearNDInterpolator(u, values, **kwargs)
+        elif method == 'nearest':
+            self._f = interpolate.NearestNDInterpolator(u, values, **kwargs)
+        elif method == 'smolyak':
+            self._f = _SmolyakInterpolant(u, values)
+        else:
+            raise ValueError(f"Unknown method '{method}', methods are: "
+                             f"{self.METHODS}")
+
+    def _unit(self, points: np.ndarray) -> np.ndarray:
+        return (points - self.lower) / self.scale
+
+    def __call__(self, points) -> np.ndarray:
+        """Interpolated output.
+
+        :param points: array (n, len(keys)) or dictionary of key and values,
+            the values are broadcast, e.g. meshgrids
+        :return: array (n,) or of the broadcast shape of the values
+        """
+        if isinstance(points, dict):
+            arrays = np.broadcast_arrays(*[np.asarray(points[key], dtype=float)
+                                           for key in self.keys])
+            shape = arrays[0].shape
+            points = np.column_stack([a.ravel() for a in arrays])
+            return self(points).reshape(shape)
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        return np.asarray(self._f(self._unit(points)), dtype=float)
+
+
+def response_surface(result, output: str, method: str = 'rbf',
+                     time_index: int = -1, **kwargs) -> ResponseSurface:
+    """Response surface of an output of a scan result.
+
+    :param output: id of the output column
+    :param time_index: time point of the output, the end of the simulations
+        (steady state) by default
+    """
+    points = scan_points(result)
+    columns = list(result.columns)
+    values = result.data[time_index, columns.index(output), :]
+    return ResponseSurface(list(points.columns), points.values, values,
+                           method=method, **kwargs)
@@ -1,20 +1,15 @@
 """
 Entry point to run the complete analysis
-"""
-from pyexsimo import MODEL_PATH
-from pyexsimo import __version__
-from pyexsimo.model_factory import create_liver_glucose, \
-    create_liver_glucose_const_glycogen
-from pyexsimo.report import create_report
 
+Heavy dependencies (sbmlsim, sbmlutils, libsbml, matplotlib, jinja2) are
+imported on first use of the respective stage.
+"""
+import os
 import logging
-from sbmlsim.experiment import run_experiment
 
-from pyexsimo import MODEL_PATH, DATA_PATH, RESULT_PATH
-from pyexsimo.experiments.dose_response import DoseResponseExperiment
-from pyexsimo.experiments.hgp_gng import PathwayExperiment
-from pyexsimo.experiments.glycogen import GlycogenExperiment
-from pyexsimo.experiments.hgp_gng_ss import PathwaySSExperiment
+from pyexsimo import __version__
+from pyexsimo import MODEL_PATH, DATA_PATH, RESULT_PATH, CACHE_PATH
+from pyexsimo.experiments import EXPERIMENTS, load_experiment
 
 logger = logging.getLogger(__name__)
 
@@ -28,34 +23,116 @@ class bcolors:
     ENDC = '\033[0m'
 
 
-def run_experiments(output_path, show_figures=False):
-    """Run all simulation experiments"""
-    results = []
-    for exp_class in [DoseResponseExperiment, PathwayExperiment,
-                      GlycogenExperiment]:
-        info = run_experiment(exp_class,
-                              output_path=output_path,
-                              model_path=MODEL_PATH / "liver_glucose.xml",
-                              data_path=DATA_PATH,
-                              show_figures=show_figures)
-        results.append(info)
+def _run_experiment(exp_id, output_path, model_path, show_figures=False,
+                    cache=None, figures=True, monitor=None):
+    """Run single experiment by id.
+
+    Without figures the experiment runs headless. sbmlsim imports pyplot
+    on import of the experiments, the non-interactive backend is selected
+    before, so that no GUI toolkit is loaded.
+    """
+    if not figures:
+        os.environ.setdefault("MPLBACKEND", "agg")
+    from pyexsimo.runner import run_experiment
 
-    info = run_experiment(PathwaySSExperiment,
+    return run_experiment(load_experiment(exp_id),
                           output_path=output_path,
-                          model_path=MODEL_PATH / "liver_glucose_const_glyglc.xml",
+                          model_path=model_path / EXPERIMENTS[exp_id]['model'],
                           data_path=DATA_PATH,
-                          show_figures=show_figures)
-    results.append(info)
-    return results
+                          show_figures=show_figures,
+                          cache=cache,
+                          figures=figures,
+                          monitor=monitor)
+
+
+def _run_experiment_worker(exp_id, output_path, model_path, cache, figures,
+                           monitor=None):
+    """Run experiment in worker process.
+
+    The cache is a copy in the worker process, the cache hits and misses
+    of the experiment are returned with the summary.
+
+    :return: (experiment summary, cache hits, cache misses)
+    """
+    from pyexsimo.runner import experiment_summary
+
+    hits, misses = (cache.hits, cache.misses) if cache is not None else (0, 0)
+    info = _run_experiment(exp_id, output_path=output_path,
+                           model_path=model_path, cache=cache,
+                           figures=figures, monitor=monitor)
+    if cache is not None:
+        hits, misses = cache.hits - hits, cache.misses - misses
+    return experiment_summary(info), hits, misses
+
+
+def run_experiments(output_path, show_figures=False, cache=None,
+                    exp_ids=None, jobs=1, figures=True,
+                    model_path=MODEL_PATH, monitor=None):
+    """Run simulation experiments
+
+    :param exp_ids: ids of experiments to run, all experiments if None
+    :param jobs: number of worker processes, experiments run in the main
+        process for a single job
+    :param figures: create and save figures
+    :param model_path: directory of the SBML models
+    :param monitor: InvariantMonitor of the simulations
+    :return: list of experiment summaries
+    """
+    if exp_ids is None:
+        exp_ids = list(EXPERIMENTS.keys())
+    for exp_id in exp_ids:
+        if exp_id not in EXPERIMENTS:
+            raise ValueError(f"Unknown experiment '{exp_id}', experiments "
+                             f"are: {sorted(EXPERIMENTS.keys())}")
+
+    if jobs <= 1:
+        from pyexsimo.runner import experiment_summary
+
+        return [experiment_summary(
+                    _run_experiment(exp_id, output_path=output_path,
+                                    model_path=model_path,
+                                    show_figures=show_figures, cache=cache,
+                                    figures=figures, monitor=monitor))
+                for exp_id in exp_ids]
+
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(_run_experiment_worker, exp_id,
+                                   output_path, model_path, cache, figures,
+                                   monitor)
+                   for exp_id in exp_ids]
+        summaries = []
+        for future in futures:
+            summary, hits, misses = future.result()
+            if cache is not None:
+                cache.hits += hits
+                cache.misses += misses
+            summaries.append(summary)
+        return summaries
 
 
 def execute(output_path=RESULT_PATH, model_output_path=MODEL_PATH,
-            show_figures=False):
+            show_figures=False, cache=None, jobs=1, html=True):
     """ Execute simulation model.
 
     Creates all SBML model and runs all simulation experiments defined for the
     model. Creates models in ./models folder and results in ./results folder.
+    Simulation results are cached in CACHE_PATH if no cache is provided.
+    Experiments are run headless, figures are rendered afterwards from the
+    stored results. Experiments and figures are processed in parallel for
+    multiple jobs. The HTML reports of changed models are created in the
+    background during the simulations.
+
+    :param html: create HTML reports of the models
     """
+    from pyexsimo.cache import ResultCache
+    from pyexsimo.model_factory import create_models, ModelReports
+    from pyexsimo.render import render_figures
+    from pyexsimo.report import create_report
+
+    if cache is None:
+        cache = ResultCache(CACHE_PATH)
+
     logger.info("#" * 80)
     logger.info(f"Execute simulation model: Version {__version__}")
     logger.info("#" * 80)
@@ -64,21 +141,45 @@ def execute(output_path=RESULT_PATH, model_output_path=MODEL_PATH,
     logger.info("-" * 80)
     logger.info("Create models")
     logger.info("-" * 80)
-    [_, _, sbml_path] = create_liver_glucose(target_dir=model_output_path)
-    create_liver_glucose_const_glycogen(sbml_path, target_dir=model_output_path)
-
-    # run experiments
-    logger.info("-" * 80)
-    logger.info("Run simulation experiments")
-    logger.info("-" * 80)
-    results = run_experiments(output_path=output_path,
-                              show_figures=show_figures)
-
-    # create report
-    logger.info("-" * 80)
-    logger.info("Create report")
-    logger.info("-" * 80)
-    create_report(results, output_path=output_path)
+    sbml_paths = create_models(target_dir=model_output_path,
+                               create_report=False)
+    model_reports = None
+    if html:
+        model_reports = ModelReports(sbml_paths, report_dir=model_output_path,
+                                     jobs=len(sbml_paths)).start()
+    try:
+        # run experiments
+        logger.info("-" * 80)
+        logger.info("Run simulation experiments")
+        logger.info("-" * 80)
+        results = run_experiments(output_path=output_path,
+                                  show_figures=show_figures,
+                                  cache=cache,
+                                  jobs=jobs,
+                                  figures=show_figures,
+                                  model_path=model_output_path)
+        logger.info(f"Result cache: {cache.stats()}")
+
+        # render figures
+        if not show_figures:
+            logger.info("-" * 80)
+            logger.info("Render figures")
+            logger.info("-" * 80)
+            results = render_figures(output_path=output_path,
+                                     model_path=model_output_path,
+                                     jobs=jobs)
+
+        # create report
+        logger.info("-" * 80)
+        logger.info("Create report")
+        logger.info("-" * 80)
+        if model_reports is not None:
+            model_reports.join()
+        create_report(results, output_path=output_path)
+    finally:
+        # report workers are shut down if a stage failed
+        if model_reports is not None:
+            model_reports.close()
 
     logger.info('-' * 80)
     logger.info(
@@ -0,0 +1,36 @@
+"""
+Simulation experiments.
+
+The experiments are registered by id and imported on first use. Importing
+an experiment module loads sbmlsim, pandas and matplotlib.
+"""
+import importlib
+
+# experiment id: module & model of experiment
+EXPERIMENTS = {
+    'DoseResponseExperiment': {
+        'module': 'pyexsimo.experiments.dose_response',
+        'model': 'liver_glucose.xml',
+    },
+    'PathwayExperiment': {
+        'module': 'pyexsimo.experiments.hgp_gng',
+        'model': 'liver_glucose.xml',
+    },
+    'GlycogenExperiment': {
+        'module': 'pyexsimo.experiments.glycogen',
+        'model': 'liver_glucose.xml',
+    },
+    'PathwaySSExperiment': {
+        'module': 'pyexsimo.experiments.hgp_gng_ss',
+        'model': 'liver_glucose_const_glyglc.xml',
+    },
+}
+
+
+def load_experiment(exp_id: str):
+    """Import experiment class for given experiment id."""
+    if exp_id not in EXPERIMENTS:
+        raise ValueError(f"Unknown experiment '{exp_id}', experiments are: "
+                         f"{sorted(EXPERIMENTS.keys())}")
+    module = importlib.import_module(EXPERIMENTS[exp_id]['module'])
+    return getattr(module, exp_id)
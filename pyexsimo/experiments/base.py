@@ -0,0 +1,46 @@
+"""
+Base class of the simulation experiments.
+"""
+from typing import Callable, Dict
+
+from sbmlsim.experiment import SimulationExperiment
+
+from pyexsimo.catalog import get_catalog
+from pyexsimo.residuals import DataFit
+
+
+class ExsimoExperiment(SimulationExperiment):
+    """Simulation experiment with data from the data catalog."""
+
+    def load_data(self, sid, **filters):
+        """ Loads data from given figure/table id.
+
+        The data is queried from the indexed data catalog, filters are
+        column values or lists of values of the columns, e.g.,
+        condition="normal".
+        """
+        return get_catalog(self.data_path).query(sid, **filters)
+
+    def load_unit(self, sid, column, **filters) -> str:
+        """ Loads unit of unit column for given figure/table id."""
+        return get_catalog(self.data_path).unit(sid, column, **filters)
+
+    @property
+    def fits(self) -> Dict[str, DataFit]:
+        """Comparisons of simulations with datasets for the residuals."""
+        return {}
+
+    @property
+    def analyses(self) -> Dict[str, Callable]:
+        """Analyses of the simulation results, e.g. control coefficients.
+
+        Functions of the model (path or SBML string) returning a DataFrame.
+        The analyses run after the simulations, the tables are stored with
+        the results, so that figures are created without computations.
+        """
+        return {}
+
+    @property
+    def analysis_results(self):
+        """Tables of the analyses by key."""
+        return self._analysis_results
@@ -1,16 +1,19 @@
-from typing import Dict
-from matplotlib.pyplot import Figure
+from typing import Dict, TYPE_CHECKING
 import numpy as np
 import pandas as pd
 
-from sbmlsim.experiment import SimulationExperiment
 from sbmlsim.data import DataSet
 from sbmlsim.timecourse import Timecourse, TimecourseSim, TimecourseScan
-from sbmlsim.plotting_matplotlib import add_data, add_line, plt
 from sbmlsim.pkpd import pkpd
 
+from pyexsimo.experiments.base import ExsimoExperiment
+from pyexsimo.residuals import DataFit
 
-class DoseResponseExperiment(SimulationExperiment):
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+
+
+class DoseResponseExperiment(ExsimoExperiment):
     """Hormone dose-response curves."""
 
     @property
@@ -19,8 +22,7 @@ class DoseResponseExperiment(SimulationExperiment):
 
         # dose-response data for hormones
         for hormone_key in ['Epinephrine', 'Glucagon', 'Insulin']:
-            df = self.load_data(f"DoseResponse_Tab{hormone_key}")
-            df = df[df.condition == "normal"]  # only healthy controls
+            dset_id = f"DoseResponse_Tab{hormone_key}"
             epi_normal_studies = [
                 "Degn2004", "Lerche2009", "Mitrakou1991",
                 "Levy1998", "Israelian2006", "Jones1998",
@@ -40,11 +42,15 @@ class DoseResponseExperiment(SimulationExperiment):
                 'Lerche2009', 'Henkel2005', 'Butler1991', 'Knop2007',
                 'Cobelli2010', 'Mitrakou1992',
             ]
-            # filter studies
-            if hormone_key == "Epinephrine":
-                df = df[df.reference.isin(epi_normal_studies)]
-            elif hormone_key == "Glucagon":
-                df = df[df.reference.isin(glu_normal_studies)]
+            # filter studies (only healthy controls)
+            normal_studies = {
+                "Epinephrine": epi_normal_studies,
+                "Glucagon": glu_normal_studies,
+                "Insulin": ins_normal_studies,
+            }[hormone_key]
+            filters = {'condition': "normal", 'reference': normal_studies}
+            df = self.load_data(dset_id, **filters)
+            if hormone_key == "Glucagon":
                 # correct glucagon data for insulin suppression
                 # (hyperinsulinemic clamps)
                 insulin_supression = 3.4
@@ -59,12 +65,9 @@ class DoseResponseExperiment(SimulationExperiment):
                     glu_clamp_studies), 'se'] = insulin_supression * df[
                     df.reference.isin(glu_clamp_studies)]['se']
 
-            elif hormone_key == "Insulin":
-                df = df[df.reference.isin(ins_normal_studies)]
-
             udict = {
-                'glc': df["glc_unit"].unique()[0],
-                'mean': df["unit"].unique()[0],
+                'glc': self.load_unit(dset_id, "glc_unit", **filters),
+                'mean': self.load_unit(dset_id, "unit", **filters),
             }
             dsets[hormone_key.lower()] = DataSet.from_df(df, udict=udict,
                                                          ureg=self.ureg)
@@ -89,7 +92,22 @@ class DoseResponseExperiment(SimulationExperiment):
         }
 
     @property
-    def figures(self) -> Dict[str, Figure]:
+    def fits(self) -> Dict[str, DataFit]:
+        """Hormone data against the dose-response curves."""
+        return {
+            dset_key: DataFit(dset_key, "glc_scan",
+                              xid="glc", yid="mean", yid_se="se",
+                              xid_sim="[glc_ext]", yid_sim=yid_sim,
+                              across_scan=True)
+            for dset_key, yid_sim in [("glucagon", "glu"),
+                                      ("epinephrine", "epi"),
+                                      ("insulin", "ins")]
+        }
+
+    @property
+    def figures(self) -> Dict[str, 'Figure']:
+        from pyexsimo.plotting import add_data, add_line, plt
+
         xunit = "mM"
         yunit_hormone = "pmol/l"
         yunit_gamma = "dimensionless"
@@ -1,14 +1,17 @@
-from typing import Dict
-from matplotlib.pyplot import Figure
+from typing import Dict, TYPE_CHECKING
 import numpy as np
 
-from sbmlsim.experiment import SimulationExperiment
 from sbmlsim.data import DataSet
 from sbmlsim.timecourse import Timecourse, TimecourseSim, TimecourseScan
-from sbmlsim.plotting_matplotlib import add_data, add_line, plt
 
+from pyexsimo.experiments.base import ExsimoExperiment
+from pyexsimo.residuals import DataFit
 
-class GlycogenExperiment(SimulationExperiment):
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+
+
+class GlycogenExperiment(ExsimoExperiment):
     """Simulation of glycogenolysis and glycogen synthesis.
 
     Setting various glucose concentration and running
@@ -20,10 +23,11 @@ class GlycogenExperiment(SimulationExperiment):
         for study_id in ['Magnusson1992', 'Rothman1991', 'Radziuk2001',
                          'Taylor1996']:
             dset_id = f"Glycogen_Tab{study_id}"
-            df = self.load_data(dset_id)
-            df = df[df.condition == "normal"]  # only healthy controls
-            udict = {key: df[f"{key}_unit"].unique()[0] for key in
-                     ["time", "gly"]}
+            # only healthy controls
+            df = self.load_data(dset_id, condition="normal")
+            udict = {key: self.load_unit(dset_id, f"{key}_unit",
+                                         condition="normal")
+                     for key in ["time", "gly"]}
             dsets[study_id] = DataSet.from_df(df, udict=udict, ureg=self.ureg)
 
         return dsets
@@ -60,8 +64,26 @@ class GlycogenExperiment(SimulationExperiment):
         }
 
     @property
-    def figures(self) -> Dict[str, Figure]:
+    def fits(self) -> Dict[str, DataFit]:
+        """Glycogen data of glycogenolysis and glycogen synthesis."""
+        kwargs = {'xid': "time", 'yid': "gly",
+                  'xid_sim': "time", 'yid_sim': "[glyglc]"}
+        return {
+            "Magnusson1992": DataFit("Magnusson1992", "gly_scan",
+                                     yid_sd="gly_sd", **kwargs),
+            "Rothman1991": DataFit("Rothman1991", "gly_scan",
+                                   yid_sd="gly_sd",
+                                   groups=("reference", "subject"), **kwargs),
+            "Radziuk2001": DataFit("Radziuk2001", "gs_scan", **kwargs),
+            "Taylor1996": DataFit("Taylor1996", "gs_scan",
+                                  yid_sd="gly_sd", **kwargs),
+        }
+
+    @property
+    def figures(self) -> Dict[str, 'Figure']:
         """Glycogenolysis and glycogen synthesis figure."""
+        from pyexsimo.plotting import add_data, add_line, plt
+
         xunit_ax1 = "hr"
         xunit_ax2 = "min"
         yunit_gly = "mM"
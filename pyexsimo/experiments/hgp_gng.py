@@ -1,14 +1,18 @@
-from typing import Dict
-from matplotlib.pyplot import Figure
+from typing import Dict, TYPE_CHECKING
 import numpy as np
 
-from sbmlsim.experiment import SimulationExperiment
 from sbmlsim.data import DataSet
 from sbmlsim.timecourse import Timecourse, TimecourseSim, TimecourseScan
-from sbmlsim.plotting_matplotlib import add_data, add_line, plt
 
+from pyexsimo.experiments.base import ExsimoExperiment
+from pyexsimo.residuals import DataFit
+from pyexsimo.units import conversion_factor
 
-class PathwayExperiment(SimulationExperiment):
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+
+
+class PathwayExperiment(ExsimoExperiment):
     """Timecourse simulations of HGP, GNG, GLY and HGP/GNG.
 
     Time varying contribution of pathways to hepatic gluconeogenesis.
@@ -17,10 +21,11 @@ class PathwayExperiment(SimulationExperiment):
     def datasets(self) -> Dict[str, DataSet]:
         dsets = {}
         dset_id = "Nuttal2008_TabA"
-        df = self.load_data(dset_id)
-        df = df[df.condition == "normal"]  # only healthy controls
-        udict = {key: df[f"{key}_unit"].unique()[0] for key in
-                 ["time", "hgp", "gng", "gly", "gng_hgp"]}
+        # only healthy controls
+        df = self.load_data(dset_id, condition="normal")
+        udict = {key: self.load_unit(dset_id, f"{key}_unit",
+                                     condition="normal")
+                 for key in ["time", "hgp", "gng", "gly", "gng_hgp"]}
 
         dsets[dset_id] = DataSet.from_df(df, udict=udict, ureg=self.ureg)
         return dsets
@@ -41,7 +46,19 @@ class PathwayExperiment(SimulationExperiment):
         }
 
     @property
-    def figures(self) -> Dict[str, Figure]:
+    def fits(self) -> Dict[str, DataFit]:
+        """Pathway contributions of Nuttal2008."""
+        return {
+            yid: DataFit("Nuttal2008_TabA", "glc_scan",
+                         xid="time", yid=yid.lower(),
+                         xid_sim="time", yid_sim=yid, groups=("source",))
+            for yid in ["HGP", "GNG", "GLY"]
+        }
+
+    @property
+    def figures(self) -> Dict[str, 'Figure']:
+        from pyexsimo.plotting import add_data, add_line, plt
+
         xunit = "hr"
         yunit_flux = "µmol/kg/min"
         yunit_ratio = "percent"
@@ -67,9 +84,9 @@ class PathwayExperiment(SimulationExperiment):
                  all_lines=True, **kwargs)
 
         # manual plot of s.GNG/s.HGP * 100
+        fx = conversion_factor(result.udict['time'], xunit, ureg=result.ureg)
         for df in result.frames:
-            xk = df['time'].values * result.ureg(result.udict['time'])
-            xk = xk.to(xunit)
+            xk = df['time'].values * fx
             yk = df['GNG'].values / df['HGP'].values * 100
             ax4.plot(xk, yk, '-', **kwargs)
 
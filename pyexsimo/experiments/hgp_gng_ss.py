@@ -1,14 +1,17 @@
-from typing import Dict
-from matplotlib.pyplot import Figure
+from typing import Callable, Dict, TYPE_CHECKING
 import numpy as np
 
-from sbmlsim.experiment import SimulationExperiment
 from sbmlsim.data import DataSet
 from sbmlsim.timecourse import Timecourse, TimecourseSim, TimecourseScan
-from sbmlsim.plotting_matplotlib import plt
 
+from pyexsimo.experiments.base import ExsimoExperiment
 
-class PathwaySSExperiment(SimulationExperiment):
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+    from pandas import DataFrame
+
+
+class PathwaySSExperiment(ExsimoExperiment):
     """Steady state pathway contributions."""
     @property
     def datasets(self) -> Dict[str, DataSet]:
@@ -31,7 +34,32 @@ class PathwaySSExperiment(SimulationExperiment):
         }
 
     @property
-    def figures(self) -> Dict[str, Figure]:
+    def analyses(self) -> Dict[str, Callable]:
+        return {
+            "control": self.control,
+            "continuation": self.continuation,
+        }
+
+    def control(self, model) -> 'DataFrame':
+        """Flux control coefficients of the enzymes over the grid."""
+        from pyexsimo.mca import grid_mca, control_table
+
+        return control_table(grid_mca(self.scan_results['ss_scan'], model))
+
+    def continuation(self, model) -> 'DataFrame':
+        """Steady-state branches over glucose for glycogen levels."""
+        from pyexsimo.continuation import continuation, branch_table
+
+        return branch_table({
+            f"glycogen {glyglc} mM": continuation(
+                model, '[glc_ext]', 2, 14, changes={'[glyglc]': glyglc})
+            for glyglc in [100, 250, 400]
+        })
+
+    @property
+    def figures(self) -> Dict[str, 'Figure']:
+        from sbmlsim.plotting_matplotlib import plt
+
         import matplotlib
         import matplotlib.cm as cm
         matplotlib.rcParams['contour.negative_linestyle'] = 'solid'
@@ -84,5 +112,24 @@ class PathwaySSExperiment(SimulationExperiment):
             ax.clabel(CS, inline=1, fontsize=10)
 
         return {
-            'fig1': f
+            'fig1': f,
+            'fig2': self.figure_control(),
+            'fig3': self.figure_continuation(),
         }
+
+    def figure_control(self) -> 'Figure':
+        """Flux control coefficients of the enzymes over the grid."""
+        from pyexsimo.mca import plot_control_coefficients
+
+        return plot_control_coefficients(self.analysis_results['control'])
+
+    def figure_continuation(self) -> 'Figure':
+        """Steady-state branches of HGP, GNG and GLY over glucose."""
+        from pyexsimo.continuation import plot_branches, table_branches
+
+        f = plot_branches(table_branches(
+            self.analysis_results['continuation']))
+        for ax in f.axes:
+            ax.set_xlabel('glucose [mM]')
+            ax.set_ylabel(f"{ax.get_ylabel()} [µmol/kg/min]")
+        return f
@@ -0,0 +1,381 @@
+"""
+Metabolic control analysis of steady-state scans.
+
+Elasticities, flux and concentration control coefficients are computed at
+every point of a steady-state scan, e.g., the glucose x glycogen grid of
+the PathwaySSExperiment. The steady states are the last time points of the
+scan. The elasticities (reactions x species) are central finite differences
+of the reaction rates of the compiled model (roadrunner's elasticity
+functions fail on models with compartments defined by assignment rules).
+
+With the stoichiometric matrix in concentrations Nc = V^-1 N, the reduced
+matrix Nc_R of the independent species and the link matrix L (Nc = L Nc_R)
+the unscaled control coefficients are
+
+    M = Nc_R E L                    (reduced Jacobian)
+    Cs = -L M^-1 Nc_R               (species x reactions)
+    CJ = I + E Cs                   (reactions x reactions)
+
+The reduced Jacobians of all grid points are stacked and solved in a single
+batched LU factorization, every factorization is used for the right hand
+sides of all reactions.
+
+    mca = grid_mca(exp.scan_results['ss_scan'], exp.model_path)
+    C = mca.flux_control_grid('HGP', 'GK')
+
+The long control table (control_table) is stored with the results of the
+experiment, the maps are plotted from the table.
+"""
+import logging
+from typing import Dict, List
+
+import numpy as np
+
+from pyexsimo.network import get_network
+
+logger = logging.getLogger(__name__)
+
+# pathway fluxes and their reactions, e.g. HGP = -GLUT2
+FLUXES = {
+    'HGP': 'GLUT2',
+    'GNG': 'GPI',
+    'GLY': 'G16PI',
+}
+
+# enzymes of glucose metabolism (cytosolic PEPCK has zero Vmax, the
+# mitochondrial PEPCKM is active)
+ENZYMES = ['GK', 'G6PASE', 'PFK1', 'FBP1', 'PEPCKM', 'GS', 'GP']
+
+# relative step of the finite differences
+REL_STEP = 1E-6
+ABS_STEP = 1E-12
+
+
+def link_matrix(N: np.ndarray, tol: float = 1E-10):
+    """Independent species and link matrix of stoichiometric matrix.
+
+    :param N: stoichiometric matrix (species x reactions)
+    :return: (indices of independent species, L (species x independent)),
+        N = L @ N[independent]
+    """
+    from scipy import linalg
+
+    if N.shape[1] == 0:
+        return np.array([], dtype=int), np.zeros((N.shape[0], 0))
+    _, R, P = linalg.qr(N.T, mode="economic", pivoting=True)
+    diag = np.abs(np.diag(R))
+    rank = int(np.sum(diag > tol * max(diag.max(), 1.0)))
+    independent = np.sort(P[:rank])
+    NR = N[independent]
+    L = np.linalg.lstsq(NR.T, N.T, rcond=None)[0].T
+    L[np.abs(L) < tol] = 0.0
+    return independent, L
+
+
+def elasticities(r, floating: np.ndarray, boundary: np.ndarray,
+                 rel_step: float = REL_STEP, abs_step: float = ABS_STEP):
+    """Unscaled elasticities and rates at states.
+
+    The state of the model is changed, the roadrunner instance must be
+    reset afterwards.
+
+    :param r: roadrunner instance
+    :param floating: floating species concentrations (points x species)
+    :param boundary: boundary species concentrations (points x species)
+    :return: (elasticities (points x reactions x species),
+        rates (points x reactions))
+    """
+    model = r.model
+    n_points, n_species = floating.shape
+    n_reactions = model.getNumReactions()
+    E = np.zeros((n_points, n_reactions, n_species))
+    v = np.zeros((n_points, n_reactions))
+    for p in range(n_points):
+        x = np.array(floating[p], dtype=float)
+        model.setBoundarySpeciesConcentrations(boundary[p])
+        model.setFloatingSpeciesConcentrations(x)
+        v[p] = model.getReactionRates()
+        h = rel_step * np.abs(x) + abs_step
+        for i in range(n_species):
+            xi = x[i]
+            central = xi - h[i] >= 0
+            x[i] = xi + h[i]
+            model.setFloatingSpeciesConcentrations(x)
+            v_up = model.getReactionRates()
+            if central:
+                x[i] = xi - h[i]
+                model.setFloatingSpeciesConcentrations(x)
+                E[p, :, i] = (v_up - model.getReactionRates()) / (2 * h[i])
+            else:
+                E[p, :, i] = (v_up - v[p]) / h[i]
+            x[i] = xi
+        model.setFloatingSpeciesConcentrations(x)
+    return E, v
+
+
+def concentration_stoichiometry(r, network) -> np.ndarray:
+    """Stoichiometric matrix in concentrations Nc = V^-1 N of the floating
+    species (species x reactions).
+
+    :param r: roadrunner instance of the model for the compartment volumes
+    :param network: Network of the model
+    """
+    species_ids = network.species(boundary=False)
+    if list(r.model.getFloatingSpeciesIds()) != species_ids:
+        raise ValueError("Floating species of model differ from the "
+                         "non-boundary species of the SBML")
+    volumes = dict(zip(r.model.getCompartmentIds(),
+                       r.model.getCompartmentVolumes()))
+    V = np.array([volumes[network.compartments[network.species_index[sid]]]
+                  for sid in species_ids])
+    return network.stoichiometric_matrix(boundary=False).toarray() / V[:, None]
+
+
+def active_network(Nc: np.ndarray, E: np.ndarray, v: np.ndarray = None):
+    """Active reactions and dynamic species.
+
+    Reactions with zero rate and zero elasticities at all points (e.g.
+    enzymes with zero Vmax) do not change the state, species changed only
+    by them are constant.
+
+    :param E: unscaled elasticities (points x reactions x species)
+    :param v: rates (points x reactions)
+    :return: (indices of active reactions, indices of dynamic species)
+    """
+    active = np.any(E != 0, axis=(0, 2))
+    if v is not None:
+        active |= np.any(v != 0, axis=0)
+    active = np.flatnonzero(active)
+    dynamic = np.flatnonzero(np.any(Nc[:, active] != 0, axis=1))
+    return active, dynamic
+
+
+def control_coefficients(Nc: np.ndarray, E: np.ndarray,
+                         v: np.ndarray = None) -> Dict[str, np.ndarray]:
+    """Unscaled control coefficients of all points.
+
+    Inactive reactions and constant species (see active_network) are
+    removed from the Jacobian, the control coefficients of inactive
+    reactions are zero.
+
+    :param Nc: stoichiometric matrix in concentrations (species x reactions)
+    :param E: unscaled elasticities (points x reactions x species)
+    :param v: rates (points x reactions)
+    :return: dictionary with 'concentration' (points x species x reactions)
+        and 'flux' (points x reactions x reactions), NaN for points with
+        singular Jacobian
+    """
+    n_points, n_reactions, n_species = E.shape
+    active, dynamic = active_network(Nc, E, v)
+    Na = Nc[np.ix_(dynamic, active)]
+    Ea = E[np.ix_(np.arange(n_points), active, dynamic)]
+
+    independent, L = link_matrix(Na)
+    NR = Na[independent]
+    M = NR @ Ea @ L  # (points x independent x independent)
+    X = np.full((n_points,) + NR.shape, np.nan)
+    try:
+        X[:] = np.linalg.solve(M, np.broadcast_to(NR, X.shape))
+    except np.linalg.LinAlgError:
+        # singular Jacobians at single points
+        for p in range(n_points):
+            try:
+                X[p] = np.linalg.solve(M[p], NR)
+            except np.linalg.LinAlgError:
+                pass
+        singular = int(np.isnan(X).any(axis=(1, 2)).sum())
+        logger.warning(f"Singular Jacobian at {singular}/{n_points} points")
+
+    Cs = np.zeros((n_points, n_species, n_reactions))
+    Cs[np.ix_(np.arange(n_points), dynamic, active)] = -L @ X
+    CJ = np.tile(np.eye(n_reactions), (n_points, 1, 1))
+    CJ[np.ix_(np.arange(n_points), active, active)] += Ea @ (-L @ X)
+    return {'concentration': Cs, 'flux': CJ}
+
+
+def _scale(C: np.ndarray, rows: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """Scaled control coefficients C[i, k] * v[k] / rows[i]."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scaled = C * v[:, None, :] / rows[:, :, None]
+    scaled[~np.isfinite(scaled)] = np.nan
+    return scaled
+
+
+class GridMCA(object):
+    """Control analysis of all points of a steady-state scan."""
+
+    def __init__(self, species_ids, reaction_ids, keys, vecs, indices,
+                 concentrations, rates, elasticities, control):
+        self.species_ids = list(species_ids)
+        self.reaction_ids = list(reaction_ids)
+        self.keys = list(keys)
+        self.vecs = [np.asarray(vec, dtype=float) for vec in vecs]
+        self.indices = [tuple(index) for index in indices]
+        self.shape = tuple(len(vec) for vec in self.vecs)
+        self.concentrations = concentrations
+        self.rates = rates
+        self.elasticities = elasticities
+        self.concentration_control = _scale(
+            control['concentration'], concentrations, rates)
+        self.flux_control = _scale(control['flux'], rates, rates)
+        self.concentration_control_unscaled = control['concentration']
+        self.flux_control_unscaled = control['flux']
+
+    def __repr__(self):
+        return (f"GridMCA({self.keys}, {len(self.reaction_ids)} reactions, "
+                f"{len(self.species_ids)} species)")
+
+    def grid(self, values: np.ndarray) -> np.ndarray:
+        """Values of points (points, ...) on the scan grid."""
+        values = np.asarray(values)
+        grid = np.full(self.shape + values.shape[1:], np.nan)
+        for p, index in enumerate(self.indices):
+            grid[index] = values[p]
+        return grid
+
+    def flux_control_grid(self, flux: str, reaction: str) -> np.ndarray:
+        """Scaled control coefficients of reaction on flux on the grid.
+
+        :param flux: reaction id or pathway flux of FLUXES, e.g. 'HGP'
+        """
+        j = self.reaction_ids.index(FLUXES.get(flux, flux))
+        k = self.reaction_ids.index(reaction)
+        return self.grid(self.flux_control[:, j, k])
+
+    def concentration_control_grid(self, sid: str, reaction: str) -> np.ndarray:
+        """Scaled control coefficients of reaction on species on the grid."""
+        i = self.species_ids.index(sid)
+        k = self.reaction_ids.index(reaction)
+        return self.grid(self.concentration_control[:, i, k])
+
+
+def _magnitudes(vec) -> List[float]:
+    return [float(getattr(value, 'magnitude', value)) for value in vec]
+
+
+def grid_mca(result, model, pool=None) -> GridMCA:
+    """Control analysis of the steady states of a scan result.
+
+    :param result: scan result with the full model selections
+    :param model: path of SBML model of the scan
+    :param pool: SimulatorPool, the pool of the process if None
+    """
+    from pyexsimo.pool import get_pool
+
+    if pool is None:
+        pool = get_pool()
+    network = get_network(model)
+    species_ids = network.species(boundary=False)
+    columns = list(result.columns)
+    # steady states (points x columns)
+    states = result.data[-1, :, :].T
+
+    with pool.simulator(model) as r:
+        Nc = concentration_stoichiometry(r, network)
+        boundary_ids = list(r.model.getBoundarySpeciesIds())
+        floating = states[:, [columns.index(f"[{sid}]") for sid in species_ids]]
+        boundary = states[:, [columns.index(f"[{sid}]") for sid in boundary_ids]]
+        E, v = elasticities(r, floating, boundary)
+    control = control_coefficients(Nc, E, v)
+
+    return GridMCA(species_ids=species_ids,
+                   reaction_ids=network.reaction_ids,
+                   keys=result.keys,
+                   vecs=[_magnitudes(vec) for vec in result.vecs],
+                   indices=result.indices,
+                   concentrations=floating, rates=v, elasticities=E,
+                   control=control)
+
+
+def control_table(mca: GridMCA, fluxes=None, reactions=None):
+    """Scaled flux control coefficients of all points as long table.
+
+    :param fluxes: fluxes of the table, FLUXES if None
+    :param reactions: controlling reactions, ENZYMES if None
+    """
+    import pandas as pd
+
+    if fluxes is None:
+        fluxes = list(FLUXES.keys())
+    if reactions is None:
+        reactions = ENZYMES
+    rows = [mca.reaction_ids.index(FLUXES.get(f, f)) for f in fluxes]
+    cols = [mca.reaction_ids.index(rid) for rid in reactions]
+    C = mca.flux_control[:, rows, :][:, :, cols]  # (points, fluxes, reactions)
+    n_points = C.shape[0]
+    n = len(fluxes) * len(reactions)
+
+    d = {}
+    for k, key in enumerate(mca.keys):
+        values = np.array([mca.vecs[k][index[k]] for index in mca.indices])
+        d[key] = np.repeat(values, n)
+    d.update({
+        'point': np.repeat(np.arange(n_points), n),
+        'flux': np.tile(np.repeat(fluxes, len(reactions)), n_points),
+        'reaction': np.tile(reactions, n_points * len(fluxes)),
+        'control': C.ravel(),
+    })
+    return pd.DataFrame(d)
+
+
+def control_grid(table, flux: str, reaction: str):
+    """Scaled flux control coefficients of the control table on the grid of
+    the 2D scan.
+
+    :param table: control table of control_table
+    :return: (values of first key, values of second key, grid)
+    """
+    columns = list(table.columns)
+    keys = columns[:columns.index('point')]
+    if len(keys) != 2:
+        raise ValueError(f"Control maps require 2D scans: {keys}")
+    df = table[(table.flux == flux) & (table.reaction == reaction)]
+    if df.empty:
+        raise ValueError(f"No control of '{reaction}' on '{flux}' in table")
+    grid = df.pivot(index=keys[0], columns=keys[1], values='control')
+    return grid.index.values, grid.columns.values, grid.values
+
+
+def plot_control_coefficients(table, fluxes=None, reactions=None,
+                              vmax: float = 2.0):
+    """Maps of the scaled flux control coefficients over the scan grid.
+
+    The first scan key is the x axis, the second the y axis.
+
+    :param table: control table of control_table, e.g. stored with the
+        results of the experiment
+    :param fluxes: fluxes of the maps, all fluxes of the table if None
+    :param reactions: controlling reactions, all reactions of the table
+        if None
+    :return: matplotlib Figure with rows of fluxes and columns of reactions
+    """
+    from matplotlib import pyplot as plt
+    import matplotlib.cm as cm
+
+    if fluxes is None:
+        fluxes = list(dict.fromkeys(table.flux))
+    if reactions is None:
+        reactions = list(dict.fromkeys(table.reaction))
+    columns = list(table.columns)
+    keys = columns[:columns.index('point')]
+
+    f, axes = plt.subplots(len(fluxes), len(reactions),
+                           figsize=(2.5 * len(reactions), 2.5 * len(fluxes)),
+                           sharex=True, sharey=True, squeeze=False)
+    f.subplots_adjust(hspace=0.15, wspace=0.1)
+    for i, flux in enumerate(fluxes):
+        for k, reaction in enumerate(reactions):
+            ax = axes[i, k]
+            x, y, C = control_grid(table, flux, reaction)
+            extent = [x.min(), x.max(), y.min(), y.max()]
+            image = ax.imshow(C.transpose(), interpolation='nearest',
+                              cmap=cm.seismic, origin="lower", extent=extent,
+                              aspect="auto", vmin=-vmax, vmax=vmax)
+            if i == 0:
+                ax.set_title(reaction)
+            if k == 0:
+                ax.set_ylabel(f"C^{flux}\n{keys[1]}")
+            if i == len(fluxes) - 1:
+                ax.set_xlabel(keys[0])
+    f.colorbar(image, ax=axes, shrink=0.6, label="scaled flux control")
+    return f
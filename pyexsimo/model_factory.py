@@ -1,30 +1,102 @@
 """Model factory.
 
 Creates all SBML models from model definitions in sbmlutils.
+
+The HTML reports of the models are a separate stage. The reports are created
+in background worker processes and are only created again if the SBML of
+the model changed.
 """
 import os
-from sbmlutils.modelcreator import creator
-from sbmlutils.report import sbmlreport
-import libsbml
-from pyexsimo import MODEL_PATH, BASE_PATH
+import json
+import time
+import logging
+from pathlib import Path
+
+from pyexsimo import MODEL_PATH, BASE_PATH, CACHE_PATH
+from pyexsimo.utils import file_hash, sbml_hash, write_atomic
+from pyexsimo.variants import ModelVariant
+
+logger = logging.getLogger(__name__)
+
+# hashes of the SBML models of the HTML reports
+REPORT_MANIFEST_FILENAME = ".reports.json"
+
+# external annotation file
+ANNOTATIONS_PATH = BASE_PATH / "models" / 'liver_glucose_annotations.xlsx'
+ANNOTATIONS_CACHE_PATH = CACHE_PATH / "annotations"
+
+
+def cached_annotations(xlsx_path: Path = ANNOTATIONS_PATH,
+                       cache_path: Path = ANNOTATIONS_CACHE_PATH) -> Path:
+    """Annotations workbook converted to a cached TSV file.
+
+    Parsing the xlsx is slow, the workbook is converted once into a TSV
+    which is read by the sbmlutils annotator. The conversion is keyed on the
+    modification time and hash of the workbook, the hash is only calculated
+    if the modification time changed.
+    Numeric resources (charges) are read back as text from the TSV, the
+    annotator converts them with int(), so the created model is identical.
+
+    :return: path of TSV file
+    """
+    xlsx_path = Path(xlsx_path)
+    cache_path = Path(cache_path)
+    cache_path.mkdir(parents=True, exist_ok=True)
+    meta_path = cache_path / f"{xlsx_path.stem}.json"
+    mtime = xlsx_path.stat().st_mtime
+
+    meta = {}
+    if meta_path.exists():
+        with open(meta_path, "r") as f_json:
+            meta = json.load(f_json)
+    tsv_path = cache_path / meta.get('tsv', "")
+    if meta.get('mtime') == mtime and tsv_path.is_file():
+        return tsv_path
 
+    xlsx_hash = file_hash(xlsx_path)
+    tsv_path = cache_path / f"{xlsx_path.stem}_{xlsx_hash[:16]}.tsv"
+    if not tsv_path.is_file():
+        import pandas as pd
 
-def create_liver_glucose(target_dir):
-    """Create the SBML model"""
+        t_start = time.perf_counter()
+        # same parsing as in the sbmlutils annotator
+        df = pd.read_excel(str(xlsx_path), comment="#")
+        df.dropna(axis='index', inplace=True, how="all")
+        write_atomic(tsv_path, df.to_csv(sep="\t", index=False))
+        logger.info(f"Convert annotations '{xlsx_path.name}': "
+                    f"{time.perf_counter() - t_start:.2f} s")
 
-    # external annotation file
-    annotations_path = BASE_PATH / "models" / 'liver_glucose_annotations.xlsx'
+    meta = {'mtime': mtime, 'hash': xlsx_hash, 'tsv': tsv_path.name}
+    write_atomic(meta_path, json.dumps(meta, indent=2))
+    return tsv_path
 
-    return creator.create_model(
+# model with constant glycogen
+CONST_GLYCOGEN = ModelVariant(clamp=['glyglc'], suffix="_const_glyglc")
+
+
+def create_liver_glucose(target_dir, create_report=True):
+    """Create the SBML model
+
+    :param create_report: create HTML report of the model
+    """
+    from sbmlutils.modelcreator import creator
+
+    t_start = time.perf_counter()
+    annotations_path = cached_annotations(ANNOTATIONS_PATH)
+    results = creator.create_model(
         modules=['pyexsimo.models.liver_glucose'],
         filename="liver_glucose.xml",
         target_dir=target_dir,
         annotations=str(annotations_path),
-        create_report=True
+        create_report=create_report
     )
+    logger.info(f"Create model 'liver_glucose.xml': "
+                f"{time.perf_counter() - t_start:.2f} s")
+    return results
 
 
-def create_liver_glucose_const_glycogen(sbml_path, target_dir):
+def create_liver_glucose_const_glycogen(sbml_path, target_dir,
+                                        create_report=True):
     """Modifies the glucose model with constant glycogen.
 
     For some of the simulations the glycogen concentration ([glyglc])
@@ -33,25 +105,152 @@ def create_liver_glucose_const_glycogen(sbml_path, target_dir):
     The original model is modified accordingly and a second model is
     generated.
     """
-    suffix = "_const_glyglc"
-    doc = libsbml.readSBMLFromFile(str(sbml_path))  # type: libsbml.SBMLDocument
-    model = doc.getModel()
+    from pyexsimo.variants import write_variant
 
-    # set glycogen constant (boundary Condition)
-    s_glyglc = model.getSpecies('glyglc')
-    s_glyglc.setBoundaryCondition(True)
-    model.setId(model.getId() + suffix)
+    return write_variant(sbml_path, CONST_GLYCOGEN, target_dir=target_dir,
+                         create_report=create_report)
 
-    _, filename = os.path.split(str(sbml_path))
-    sbml_path_new = os.path.join(target_dir, f"{filename[:-4]}{suffix}.xml")
-    libsbml.writeSBMLToFile(doc, sbml_path_new)
 
-    sbmlreport.create_report(sbml_path_new, report_dir=target_dir)
+def create_models(target_dir, create_report=True):
+    """Create all SBML models.
 
-    return sbml_path_new
+    :param target_dir: directory of the models
+    :param create_report: create HTML reports of the models
+    :return: list of SBML paths
+    """
+    [_, _, sbml_path] = create_liver_glucose(target_dir=target_dir,
+                                             create_report=False)
+    sbml_path2 = create_liver_glucose_const_glycogen(
+        sbml_path, target_dir=target_dir, create_report=False
+    )
+    sbml_paths = [sbml_path, sbml_path2]
+    if create_report:
+        create_model_reports(sbml_paths, report_dir=target_dir)
+    return sbml_paths
 
 
-if __name__ == "__main__":
+def create_model_report(sbml_path, report_dir):
+    """Create HTML report of SBML model.
+
+    sbmlutils writes a copy of the SBML next to the report. The report is
+    created in a temporary directory and moved to the report directory, so
+    that the SBML of the model is never overwritten while it is simulated.
+    """
+    import tempfile
+    from sbmlutils.report import sbmlreport
 
-    [_, _, sbml_path] = create_liver_glucose(target_dir=MODEL_PATH)
-    create_liver_glucose_const_glycogen(sbml_path, target_dir=MODEL_PATH)
+    model_path = Path(sbml_path).resolve()
+    report_dir = Path(report_dir)
+    with tempfile.TemporaryDirectory(dir=str(report_dir),
+                                     prefix=".report_") as tmp_dir:
+        sbmlreport.create_report(str(model_path), report_dir=tmp_dir)
+        for path in Path(tmp_dir).iterdir():
+            target = report_dir / path.name
+            if target.resolve() == model_path:
+                continue
+            os.replace(str(path), str(target))
+    return str(sbml_path)
+
+
+class ModelReports(object):
+    """HTML reports of SBML models created in background worker processes.
+
+    Reports are keyed on the SBML hash, reports of unchanged models are not
+    created again. The reports are started before the simulation experiments
+    and joined before the report links to them.
+    """
+
+    def __init__(self, sbml_paths, report_dir, jobs: int = 1,
+                 force: bool = False):
+        """
+        :param sbml_paths: paths of the SBML models
+        :param report_dir: directory of the HTML reports
+        :param jobs: number of worker processes
+        :param force: create reports of unchanged models
+        """
+        self.sbml_paths = [Path(p) for p in sbml_paths]
+        self.report_dir = Path(report_dir)
+        self.jobs = jobs
+        self.force = force
+        self._manifest_path = self.report_dir / REPORT_MANIFEST_FILENAME
+        self._executor = None
+        self._futures = {}
+        self._hashes = {}
+
+    def load_manifest(self) -> dict:
+        if not self._manifest_path.exists():
+            return {}
+        with open(self._manifest_path, "r") as f_json:
+            return json.load(f_json)
+
+    def outdated(self):
+        """SBML paths of models with outdated or missing reports."""
+        manifest = self.load_manifest()
+        paths = []
+        for path in self.sbml_paths:
+            self._hashes[path.name] = sbml_hash(path)
+            html_path = self.report_dir / f"{path.stem}.html"
+            if (self.force or not html_path.exists()
+                    or manifest.get(path.name) != self._hashes[path.name]):
+                paths.append(path)
+        return paths
+
+    def start(self):
+        """Start creating the outdated reports in the background."""
+        from concurrent.futures import ProcessPoolExecutor
+
+        paths = self.outdated()
+        logger.info(f"Create HTML reports: {[p.name for p in paths]}, "
+                    f"{len(self.sbml_paths) - len(paths)} up to date")
+        if paths:
+            self._executor = ProcessPoolExecutor(max_workers=self.jobs)
+            for path in paths:
+                self._futures[path.name] = self._executor.submit(
+                    create_model_report, path, self.report_dir)
+        return self
+
+    def join(self):
+        """Wait for the reports and update the manifest.
+
+        :return: list of SBML paths of the created reports
+        """
+        manifest = self.load_manifest()
+        created = []
+        try:
+            for name, future in self._futures.items():
+                created.append(future.result())
+                manifest[name] = self._hashes[name]
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+            self._futures = {}
+            write_atomic(self._manifest_path,
+                         json.dumps(manifest, indent=2, sort_keys=True))
+        return created
+
+    def close(self):
+        """Cancel the pending reports and shut down the worker processes.
+
+        Reports which are not joined are not added to the manifest. Does
+        nothing after join.
+        """
+        for future in self._futures.values():
+            future.cancel()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self._futures = {}
+
+
+def create_model_reports(sbml_paths, report_dir, jobs=1, force=False):
+    """Create HTML reports of SBML models with changed SBML.
+
+    :return: list of SBML paths of the created reports
+    """
+    return ModelReports(sbml_paths, report_dir=report_dir, jobs=jobs,
+                        force=force).start().join()
+
+
+if __name__ == "__main__":
+    create_models(target_dir=MODEL_PATH)
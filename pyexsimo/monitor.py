@@ -0,0 +1,170 @@
+"""
+Runtime monitor of model invariants.
+
+The monitor checks the output of every simulated timecourse (one output
+chunk per simulation or scan point) during the simulations of experiments:
+
+* species concentrations are non-negative, [sid] >= -atol
+* conserved moiety totals (e.g. 'atp_tot') are constant, i.e., equal to
+  the value at the first time point within atol + rtol * |total|
+
+The checks run on the NumPy array of the chunk at once. The first
+violation per check and point is recorded with the scan point and time. With
+'abort=True' the simulations stop at the first violation, so that long scans
+do not continue with broken runs.
+
+    monitor = InvariantMonitor(abort=True)
+    simulate_experiment(exp, monitor=monitor)
+"""
+import logging
+from typing import List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# totals of conserved moieties of the model
+CONSERVED_TOTALS = [
+    'nadh_tot', 'atp_tot', 'utp_tot', 'gtp_tot',
+    'nadh_mito_tot', 'atp_mito_tot', 'gtp_mito_tot',
+]
+
+NONNEGATIVE = "nonnegative"
+CONSERVED = "conserved"
+
+
+class InvariantViolation(RuntimeError):
+    """Invariant of the model violated during simulation."""
+
+    def __init__(self, violation: dict):
+        self.violation = violation
+        super(InvariantViolation, self).__init__(format_violation(violation))
+
+
+def format_violation(v: dict) -> str:
+    """Description of violation."""
+    return (f"{v['check']} violated in '{v['exp_id']}' '{v['simulation']}' "
+            f"point {v['point']} at time {v['time']:.6g}: "
+            f"{v['sid']} = {v['value']:.6g} (reference {v['reference']:.6g})")
+
+
+class InvariantMonitor(object):
+    """Checks of non-negativity and conserved totals of simulation output."""
+
+    def __init__(self, totals=CONSERVED_TOTALS, nonnegative: bool = True,
+                 atol: float = 1E-8, rtol: float = 1E-6, abort: bool = False):
+        """
+        :param totals: ids of conserved totals
+        :param nonnegative: check non-negativity of species concentrations
+        :param atol: absolute tolerance
+        :param rtol: relative tolerance of the totals
+        :param abort: raise InvariantViolation on first violation
+        """
+        self.totals = list(totals)
+        self.nonnegative = nonnegative
+        self.atol = atol
+        self.rtol = rtol
+        self.abort = abort
+        self.violations = []
+        self.exp_id = None
+        self.simulation = None
+        self.point = 0
+        self._columns = None
+
+    def start(self, exp_id: str, simulation: str):
+        """Start monitoring of simulation or scan of experiment."""
+        self.exp_id = exp_id
+        self.simulation = simulation
+        self.point = 0
+
+    def _indices(self, columns):
+        """Indices of the checked columns, cached for identical columns."""
+        columns = tuple(columns)
+        if self._columns is None or self._columns[0] != columns:
+            index = {c: k for k, c in enumerate(columns)}
+            species = [k for k, c in enumerate(columns) if c.startswith("[")]
+            totals = [index[sid] for sid in self.totals if sid in index]
+            self._columns = (columns, np.array(species, dtype=int),
+                             np.array(totals, dtype=int), index.get("time"))
+        return self._columns[1:]
+
+    def _violation(self, check, point, time, sid, value, reference) -> dict:
+        violation = {
+            'exp_id': self.exp_id,
+            'simulation': self.simulation,
+            'point': point,
+            'time': float(time),
+            'check': check,
+            'sid': sid,
+            'value': float(value),
+            'reference': float(reference),
+        }
+        self.violations.append(violation)
+        logger.warning(format_violation(violation))
+        if self.abort:
+            raise InvariantViolation(violation)
+        return violation
+
+    def check_array(self, values: np.ndarray, columns, point: int) -> List[dict]:
+        """Check output (time points x columns) of a single point.
+
+        :return: list of violations, at most one per check
+        """
+        species, totals, k_time = self._indices(columns)
+        time = values[:, k_time] if k_time is not None \
+            else np.arange(values.shape[0], dtype=float)
+        violations = []
+
+        if self.nonnegative and len(species):
+            x = values[:, species]
+            bad = x < -self.atol
+            if bad.any():
+                row, k = _first(bad)
+                violations.append(self._violation(
+                    NONNEGATIVE, point, time[row], columns[species[k]],
+                    x[row, k], 0.0))
+
+        if len(totals):
+            x = values[:, totals]
+            x0 = x[0]
+            bad = ~(np.abs(x - x0) <= self.atol + self.rtol * np.abs(x0))
+            if bad.any():
+                row, k = _first(bad)
+                violations.append(self._violation(
+                    CONSERVED, point, time[row], columns[totals[k]],
+                    x[row, k], x0[k]))
+        return violations
+
+    def check_frame(self, df) -> List[dict]:
+        """Check output DataFrame of the next point of the simulation."""
+        point = self.point
+        self.point += 1
+        return self.check_array(df.values, list(df.columns), point)
+
+    def check_result(self, result) -> List[dict]:
+        """Check all points of a result, e.g., from the result cache."""
+        violations = []
+        columns = list(result.columns)
+        for point in range(result.data.shape[2]):
+            violations.extend(
+                self.check_array(result.data[:, :, point], columns, point))
+        self.point = result.data.shape[2]
+        return violations
+
+    def monitored(self, timecourse):
+        """Timecourse function of simulator with check of the output."""
+        def monitored_timecourse(simulation):
+            df = timecourse(simulation)
+            self.check_frame(df)
+            return df
+        return monitored_timecourse
+
+    def experiment_violations(self, exp_id: str) -> List[dict]:
+        """Violations of experiment."""
+        return [v for v in self.violations if v['exp_id'] == exp_id]
+
+
+def _first(bad: np.ndarray):
+    """Position (row, column) of the first True in row order."""
+    row = int(np.argmax(bad.any(axis=1)))
+    return row, int(np.argmax(bad[row]))
@@ -0,0 +1,341 @@
+"""
+Stoichiometric network of the model.
+
+The structure of the reaction network is derived once per model from the
+SBML and shared by the structural analyses (conservation laws, dead-end
+species, connectivity, dependencies of the rates and sparsity of the
+Jacobian) and the balance checks. The stoichiometric matrix N (species x
+reactions) is a scipy.sparse matrix, reactants have negative and products
+positive stoichiometries. Boundary species are part of the network and
+removed from the analyses with 'boundary=False'.
+
+    network = get_network(sbml_path)
+    N = network.stoichiometric_matrix(boundary=False)
+    laws = network.conservation_laws()
+"""
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+
+import numpy as np
+
+from pyexsimo.utils import sbml_hash
+
+logger = logging.getLogger(__name__)
+
+# maximal number of cached networks
+MAX_CACHED = 16
+
+# tolerance of the numerical rank and the elimination
+TOL = 1E-10
+
+
+def _math_symbols(ast) -> set:
+    """Names of symbols in math."""
+    import libsbml
+
+    symbols = set()
+    if ast is None:
+        return symbols
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        if node.getType() == libsbml.AST_NAME:
+            symbols.add(node.getName())
+        stack.extend(node.getChild(k) for k in range(node.getNumChildren()))
+    return symbols
+
+
+def _assignment_symbols(model) -> Dict[str, set]:
+    """Symbols of assignment rules by variable."""
+    symbols = {}
+    for k in range(model.getNumRules()):
+        rule = model.getRule(k)
+        if rule.isAssignment():
+            symbols[rule.getVariable()] = _math_symbols(rule.getMath())
+    return symbols
+
+
+def _expand(symbols: set, assignments: Dict[str, set]) -> set:
+    """Symbols including the symbols of assignment rules (transitive)."""
+    expanded = set()
+    stack = list(symbols)
+    while stack:
+        sid = stack.pop()
+        if sid in expanded:
+            continue
+        expanded.add(sid)
+        stack.extend(assignments.get(sid, ()))
+    return expanded
+
+
+def left_null_space(matrix, tol: float = TOL) -> np.ndarray:
+    """Basis of the left null space of matrix in reduced row echelon form.
+
+    Every basis vector has a pivot entry of 1 for a species which is not
+    part of the other vectors, so that for integer stoichiometries the
+    vectors are the sums of conserved moieties.
+
+    :param matrix: (species x reactions) dense or sparse
+    :return: array (laws x species), L @ matrix = 0
+    """
+    from scipy import linalg
+
+    if hasattr(matrix, "toarray"):
+        matrix = matrix.toarray()
+    matrix = np.asarray(matrix, dtype=float)
+    if matrix.shape[1] == 0:
+        return np.eye(matrix.shape[0])
+    basis = linalg.null_space(matrix.T, rcond=tol).T  # (laws x species)
+    return _rref(basis, tol=tol)
+
+
+def _rref(a: np.ndarray, tol: float = TOL) -> np.ndarray:
+    """Reduced row echelon form with partial pivoting."""
+    a = a.copy()
+    n_rows, n_cols = a.shape
+    row = 0
+    for col in range(n_cols):
+        if row == n_rows:
+            break
+        pivot = row + np.argmax(np.abs(a[row:, col]))
+        if abs(a[pivot, col]) <= tol:
+            continue
+        a[[row, pivot]] = a[[pivot, row]]
+        a[row] /= a[row, col]
+        others = np.arange(n_rows) != row
+        a[others] -= np.outer(a[others, col], a[row])
+        row += 1
+    a[np.abs(a) <= tol] = 0.0
+    # remove round-off errors of rational entries
+    rounded = np.round(a, 8)
+    return np.where(np.abs(a - rounded) <= tol, rounded, a)[:row]
+
+
+class Network(object):
+    """Reaction network of a libsbml.Model."""
+
+    def __init__(self, model):
+        """
+        :param model: libsbml.Model
+        """
+        from scipy import sparse
+
+        self.species_ids = [model.getSpecies(k).getId()
+                            for k in range(model.getNumSpecies())]
+        self.compartments = [model.getSpecies(k).getCompartment()
+                             for k in range(model.getNumSpecies())]
+        self.boundary = np.array(
+            [model.getSpecies(k).getBoundaryCondition()
+             for k in range(model.getNumSpecies())], dtype=bool)
+        self.species_index = {sid: k for k, sid in enumerate(self.species_ids)}
+
+        assignments = _assignment_symbols(model)
+        self.reaction_ids = []
+        reversible = []
+        rows, cols, values = [], [], []
+        dep_rows, dep_cols = [], []
+        mod_rows, mod_cols = [], []
+        for j in range(model.getNumReactions()):
+            reaction = model.getReaction(j)
+            self.reaction_ids.append(reaction.getId())
+            reversible.append(reaction.getReversible())
+            for k in range(reaction.getNumReactants()):
+                ref = reaction.getReactant(k)
+                rows.append(self.species_index[ref.getSpecies()])
+                cols.append(j)
+                values.append(-ref.getStoichiometry())
+            for k in range(reaction.getNumProducts()):
+                ref = reaction.getProduct(k)
+                rows.append(self.species_index[ref.getSpecies()])
+                cols.append(j)
+                values.append(ref.getStoichiometry())
+            for k in range(reaction.getNumModifiers()):
+                mod_rows.append(j)
+                mod_cols.append(
+                    self.species_index[reaction.getModifier(k).getSpecies()])
+
+            if reaction.isSetKineticLaw():
+                symbols = _expand(_math_symbols(reaction.getKineticLaw().getMath()),
+                                  assignments)
+                for sid in symbols:
+                    if sid in self.species_index:
+                        dep_rows.append(j)
+                        dep_cols.append(self.species_index[sid])
+
+        self.reaction_index = {rid: k for k, rid in enumerate(self.reaction_ids)}
+        self.reversible = np.array(reversible, dtype=bool)
+        shape = (len(self.species_ids), len(self.reaction_ids))
+        # duplicated species references are summed
+        self.N = sparse.csr_matrix((values, (rows, cols)), shape=shape)
+        self.N.sum_duplicates()
+        self.M = _pattern(mod_rows, mod_cols, shape[::-1])
+        self.D = _pattern(dep_rows, dep_cols, shape[::-1])
+
+    @classmethod
+    def from_sbml(cls, sbml) -> 'Network':
+        """Network of SBML file or SBML string."""
+        import libsbml
+
+        if isinstance(sbml, str) and sbml.lstrip().startswith("<"):
+            doc = libsbml.readSBMLFromString(sbml)
+        else:
+            doc = libsbml.readSBMLFromFile(str(sbml))
+        model = doc.getModel()
+        if model is None:
+            raise ValueError(f"No model in SBML: {doc.getErrorLog().toString()}")
+        return cls(model)
+
+    def __repr__(self):
+        return (f"Network({len(self.species_ids)} species "
+                f"({int(self.boundary.sum())} boundary), "
+                f"{len(self.reaction_ids)} reactions)")
+
+    def _species(self, boundary: bool) -> np.ndarray:
+        """Indices of species."""
+        if boundary:
+            return np.arange(len(self.species_ids))
+        return np.flatnonzero(~self.boundary)
+
+    def species(self, boundary: bool = True) -> List[str]:
+        """Species ids of the rows of the stoichiometric matrix."""
+        return [self.species_ids[k] for k in self._species(boundary)]
+
+    def stoichiometric_matrix(self, boundary: bool = True):
+        """Sparse stoichiometric matrix (species x reactions).
+
+        :param boundary: include the boundary species
+        """
+        if boundary:
+            return self.N
+        return self.N[self._species(boundary), :]
+
+    def conservation_laws(self, boundary: bool = False) -> Dict[str, Dict[str, float]]:
+        """Conservation laws, i.e., basis of the left null space of N.
+
+        :param boundary: treat the boundary species as dynamic species
+        :return: dictionary of the pivot species and the coefficients of
+            the conserved sum {sid: coefficient}
+        """
+        species = self.species(boundary)
+        laws = left_null_space(self.stoichiometric_matrix(boundary))
+        conserved = {}
+        for law in laws:
+            nonzero = np.flatnonzero(law)
+            coefficients = {species[k]: float(law[k]) for k in nonzero}
+            conserved[species[nonzero[0]]] = coefficients
+        return conserved
+
+    def connectivity(self, boundary: bool = True) -> Dict[str, int]:
+        """Number of reactions per species."""
+        counts = np.diff(self.stoichiometric_matrix(boundary).indptr)
+        return dict(zip(self.species(boundary), counts.tolist()))
+
+    def dead_ends(self, boundary: bool = False) -> List[str]:
+        """Species which are only produced or only consumed.
+
+        Reversible reactions produce and consume their species. Species
+        without reactions are dead ends.
+        """
+        N = self.stoichiometric_matrix(boundary).tocoo()
+        n_species = N.shape[0]
+        reversible = self.reversible[N.col]
+        produced = np.zeros(n_species, dtype=bool)
+        consumed = np.zeros(n_species, dtype=bool)
+        produced[N.row[(N.data > 0) | reversible]] = True
+        consumed[N.row[(N.data < 0) | reversible]] = True
+        species = self.species(boundary)
+        return [species[k] for k in np.flatnonzero(~(produced & consumed))]
+
+    def dependency_matrix(self, boundary: bool = True):
+        """Sparse pattern (reactions x species) of the species the rates
+        depend on, i.e., the species in the kinetic laws including the
+        species of assignment rules used in the kinetic laws."""
+        if boundary:
+            return self.D
+        return self.D[:, self._species(boundary)]
+
+    def dependency_graph(self) -> Dict[str, Dict[str, List[str]]]:
+        """Reaction-species dependency graph.
+
+        :return: dictionary per reaction with the 'reactants', 'products',
+            'modifiers' and the species of the 'rate'
+        """
+        N = self.N.tocsc()
+        M = self.M.tocsr()
+        D = self.D.tocsr()
+        graph = {}
+        for j, rid in enumerate(self.reaction_ids):
+            rows = N.indices[N.indptr[j]:N.indptr[j + 1]]
+            values = N.data[N.indptr[j]:N.indptr[j + 1]]
+            graph[rid] = {
+                'reactants': [self.species_ids[k] for k in rows[values < 0]],
+                'products': [self.species_ids[k] for k in rows[values > 0]],
+                'modifiers': [self.species_ids[k]
+                              for k in M.indices[M.indptr[j]:M.indptr[j + 1]]],
+                'rate': sorted(self.species_ids[k]
+                               for k in D.indices[D.indptr[j]:D.indptr[j + 1]]),
+            }
+        return graph
+
+    def jacobian_sparsity(self):
+        """Sparse pattern (species x species) of the Jacobian of the
+        non-boundary species, i.e., d(dx_i/dt)/dx_k is structurally
+        non-zero."""
+        from scipy import sparse
+
+        N = abs(self.stoichiometric_matrix(boundary=False))
+        D = self.dependency_matrix(boundary=False)
+        J = sparse.csr_matrix(N @ D)
+        J.data[:] = 1
+        return J.astype(bool)
+
+
+def _pattern(rows, cols, shape):
+    """Sparse boolean matrix with True at (rows, cols)."""
+    from scipy import sparse
+
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=bool), (rows, cols)), shape=shape)
+    matrix.sum_duplicates()
+    return matrix
+
+
+_networks = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_network(model) -> Network:
+    """Network of model, cached per hash of the SBML.
+
+    :param model: path of SBML model, SBML string or libsbml.Model
+    """
+    if hasattr(model, "getSBMLDocument"):
+        import libsbml
+        sbml = libsbml.writeSBMLToString(model.getSBMLDocument())
+    elif isinstance(model, str) and model.lstrip().startswith("<"):
+        sbml = model
+    else:
+        with open(str(model), "r", encoding="utf-8") as f:
+            sbml = f.read()
+    key = sbml_hash(sbml)
+
+    with _lock:
+        if key in _networks:
+            _networks.move_to_end(key)
+            return _networks[key]
+
+    network = Network.from_sbml(sbml)
+    with _lock:
+        _networks[key] = network
+        while len(_networks) > MAX_CACHED:
+            _networks.popitem(last=False)
+    logger.debug(f"Create {network}")
+    return network
+
+
+def clear_cache():
+    """Remove all cached networks."""
+    with _lock:
+        _networks.clear()
@@ -0,0 +1,134 @@
+"""
+Plotting of simulation results and datasets.
+
+Drop-in replacements of 'add_data' and 'add_line' of
+'sbmlsim.plotting_matplotlib'. Units are converted with the cached
+conversion factors of 'pyexsimo.units', i.e., one multiplication per array
+instead of pint Quantities per array and frame.
+"""
+import logging
+
+import pandas as pd
+from sbmlsim.data import DataSet
+from sbmlsim.result import Result
+from sbmlsim.plotting_matplotlib import plt, kwargs_data, kwargs_sim
+
+from pyexsimo.units import conversion_factor
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['add_data', 'add_line', 'plt', 'kwargs_data', 'kwargs_sim']
+
+
+def _factor(data, key: str, unit: str, f=1.0) -> float:
+    """Conversion factor of column in data to unit."""
+    if abs(f - 1.0) > 1E-8:
+        logger.warning("xf/yf attributes are deprecated, use units instead.")
+    if not unit or data.udict is None:
+        return f
+    return f * conversion_factor(data.udict[key], unit, ureg=data.ureg)
+
+
+def add_data(ax, data: DataSet,
+             xid: str, yid: str, yid_sd=None, yid_se=None, count=None,
+             xunit=None, yunit=None,
+             xf=1.0, yf=1.0,
+             label='__nolabel__', **kwargs):
+    """Add experimental data.
+
+    :param ax: axis to plot to
+    :param data: DataSet or DataFrame
+    :param xid: id for xdata
+    :param yid: id for ydata
+    :param yid_sd: id for standard deviation of ydata
+    :param yid_se: id for standard error of ydata
+    :param xunit: target unit for x
+    :param yunit: target unit for y
+    """
+    if isinstance(data, DataSet):
+        dset = data
+    elif isinstance(data, pd.DataFrame):
+        dset = DataSet.from_df(data=data, udict=None, ureg=None)
+    if dset.empty:
+        logger.error(f"Empty dataset in adding data: {dset}")
+
+    # add default styles
+    kwargs.setdefault('marker', 's')
+    kwargs.setdefault('linestyle', '--')
+
+    fx = _factor(dset, xid, xunit, xf)
+    fy = _factor(dset, yid, yunit, yf)
+    x = dset[xid].values.astype(float) * fx
+    y = dset[yid].values.astype(float) * fy
+    y_err = None
+    y_err_type = None
+    if yid_sd:
+        y_err = dset[yid_sd].values.astype(float) * fy
+        y_err_type = "SD"
+    elif yid_se:
+        y_err = dset[yid_se].values.astype(float) * fy
+        y_err_type = "SE"
+
+    # labels
+    if label != "__nolabel__":
+        if y_err_type:
+            label = f"{label} ± {y_err_type}"
+        if count:
+            label += f" (n={count})"
+
+    if y_err is not None:
+        kwargs.setdefault('capsize', 3)
+        ax.errorbar(x, y, y_err, label=label, **kwargs)
+    else:
+        ax.plot(x, y, label=label, **kwargs)
+
+
+def add_line(ax, data: Result,
+             xid: str, yid: str,
+             xunit=None, yunit=None, xf=1.0, yf=1.0, all_lines=False,
+             label='__nolabel__', **kwargs):
+    """Add simulation result.
+
+    :param ax: axis to plot to
+    :param data: Result data structure
+    :param xid: id for xdata
+    :param yid: id for ydata
+    :param xunit: target unit for x
+    :param yunit: target unit for y
+    :param all_lines: plot all individual lines, otherwise mean with
+        standard deviation and range
+    """
+    if not isinstance(data, Result):
+        raise ValueError("Only Result objects supported in plotting.")
+
+    fx = _factor(data, xid, xunit, xf)
+    fy = _factor(data, yid, yunit, yf)
+
+    # get next color
+    kwargs.setdefault("color", ax._get_lines.get_next_color())
+    color = kwargs["color"]
+
+    if all_lines:
+        # frames share the columns, convert all frames at once
+        k_x = list(data.columns).index(xid)
+        k_y = list(data.columns).index(yid)
+        xs = data.data[:, k_x, :] * fx
+        ys = data.data[:, k_y, :] * fy
+        for k in range(xs.shape[1]):
+            ax.plot(xs[:, k], ys[:, k], '-', label="{}".format(label),
+                    **kwargs)
+    else:
+        x = data.mean[xid].values * fx
+        y = data.mean[yid].values * fy
+        if len(data) > 1:
+            y_sd = data.std[yid].values * fy
+            y_min = data.min[yid].values * fy
+            y_max = data.max[yid].values * fy
+            ax.fill_between(x, y - y_sd, y + y_sd, color=color, alpha=0.4,
+                            label="__nolabel__")
+            ax.fill_between(x, y + y_sd, y_max, color=color, alpha=0.2,
+                            label="__nolabel__")
+            ax.fill_between(x, y - y_sd, y_min, color=color, alpha=0.2,
+                            label="__nolabel__")
+
+        ax.plot(x, y, '-', label="{}".format(label), **kwargs)
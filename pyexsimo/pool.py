@@ -0,0 +1,230 @@
+"""
+Pool of compiled roadrunner instances.
+
+Compiling the SBML model in roadrunner takes more than a second, restoring
+a compiled instance from the saved state of the model a fraction of it.
+The pool keeps compiled instances per model (SBML path or SBML string) and
+hands them out for simulations. Returned instances are reset to the origin
+of the model (initial values, parameters, time), the selections and the
+integrator settings are restored. The reset is verified against the state
+of the freshly compiled model, instances which differ are discarded.
+Templates of at most MAX_TEMPLATES models are kept, the least recently used
+model is removed with its idle instances, e.g. in sweeps over variants.
+
+    pool = get_pool()
+    with pool.simulator(sbml_path) as r:
+        s = r.simulate(0, 100, steps=100)
+"""
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# maximal number of models with templates in the pool
+MAX_TEMPLATES = 16
+
+
+def model_key(model) -> str:
+    """Key of model, i.e., path and modification time or hash of SBML."""
+    if isinstance(model, Path) or (isinstance(model, str)
+                                   and not model.lstrip().startswith("<")):
+        path = os.path.abspath(str(model))
+        return f"{path}:{os.stat(path).st_mtime_ns}"
+    return hashlib.sha256(model.encode("utf-8")).hexdigest()
+
+
+def _integrator_settings(r) -> tuple:
+    integrator = r.getIntegrator()
+    return (integrator.getName(),
+            tuple((key, integrator.getValue(key))
+                  for key in integrator.getSettings()))
+
+
+def fingerprint(r) -> tuple:
+    """State of roadrunner instance which is restored on reset.
+
+    Values are compared bitwise, i.e., NaN values are equal.
+    """
+    model = r.model
+    arrays = [
+        model.getFloatingSpeciesConcentrations(),
+        model.getFloatingSpeciesInitConcentrations(),
+        model.getBoundarySpeciesConcentrations(),
+        model.getGlobalParameterValues(),
+        model.getCompartmentVolumes(),
+    ]
+    return (
+        model.getTime(),
+        tuple(r.timeCourseSelections),
+        tuple(r.steadyStateSelections),
+        _integrator_settings(r),
+    ) + tuple(a.tobytes() for a in arrays)
+
+
+class _Template(object):
+    """Saved state of the compiled model."""
+
+    def __init__(self, r):
+        self.state = r.saveStateS()
+        self.selections = list(r.timeCourseSelections)
+        self.steady_state_selections = list(r.steadyStateSelections)
+        self.integrator = _integrator_settings(r)
+        self.fingerprint = fingerprint(r)
+
+
+class SimulatorPool(object):
+    """Compiled roadrunner instances per model."""
+
+    def __init__(self, max_idle: int = 2,
+                 max_templates: int = MAX_TEMPLATES):
+        """
+        :param max_idle: maximal number of idle instances per model
+        :param max_templates: maximal number of models, the least recently
+            used model is removed
+        """
+        self.max_idle = max_idle
+        self.max_templates = max_templates
+        self._templates = OrderedDict()
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._compile_lock = threading.Lock()
+        self._stats = {'compiled': 0, 'cloned': 0, 'reused': 0,
+                       'discarded': 0, 'evicted': 0}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+    def _count(self, key: str):
+        """Increase counter, instances are used from several threads."""
+        with self._lock:
+            self._stats[key] += 1
+
+    def _template(self, key: str, model):
+        """Template of model, compiles the model on first use.
+
+        :return: (template, instance) with the compiled instance if the
+            model was compiled
+        """
+        import roadrunner
+
+        with self._compile_lock:
+            with self._lock:
+                template = self._templates.get(key)
+                if template is not None:
+                    self._templates.move_to_end(key)
+                    return template, None
+            r = roadrunner.RoadRunner(str(model))
+            template = _Template(r)
+            with self._lock:
+                self._templates[key] = template
+                self._stats['compiled'] += 1
+                while len(self._templates) > self.max_templates:
+                    # least recently used model with its idle instances
+                    key_evicted, _ = self._templates.popitem(last=False)
+                    self._idle.pop(key_evicted, None)
+                    self._stats['evicted'] += 1
+            return template, r
+
+    def _clone(self, template: _Template, model):
+        """New instance from saved state, compiled if restore fails."""
+        import roadrunner
+
+        r = roadrunner.RoadRunner()
+        r.loadStateS(template.state)
+        if fingerprint(r) == template.fingerprint:
+            self._count('cloned')
+            return r
+        logger.warning("Restored roadrunner state differs from the "
+                       "compiled model, model is compiled")
+        self._count('compiled')
+        return roadrunner.RoadRunner(str(model))
+
+    def acquire(self, model):
+        """Compiled roadrunner instance of model at its origin.
+
+        The instance must be returned with release.
+
+        :param model: path of SBML model or SBML string
+        """
+        key = model_key(model)
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self._templates.move_to_end(key)
+                self._stats['reused'] += 1
+                return idle.pop()
+
+        template, r = self._template(key, model)
+        if r is None:
+            r = self._clone(template, model)
+        return r
+
+    def reset(self, r, template: _Template) -> bool:
+        """Reset instance to the template of the model.
+
+        :return: True if the reset state is identical to the template
+        """
+        r.resetToOrigin()
+        r.timeCourseSelections = template.selections
+        r.steadyStateSelections = template.steady_state_selections
+        name, settings = template.integrator
+        if r.getIntegrator().getName() != name:
+            r.setIntegrator(name)
+        for key, value in settings:
+            r.getIntegrator().setValue(key, value)
+        return fingerprint(r) == template.fingerprint
+
+    def release(self, model, r):
+        """Return instance of model to the pool."""
+        key = model_key(model)
+        with self._lock:
+            template = self._templates.get(key)
+        if template is None:
+            # model removed from the pool
+            return
+        try:
+            ok = self.reset(r, template)
+        except RuntimeError as err:
+            logger.warning(f"Reset of roadrunner instance failed: {err}")
+            ok = False
+        with self._lock:
+            if not ok:
+                self._stats['discarded'] += 1
+                logger.warning("Roadrunner instance differs from the model "
+                               "after reset and is discarded")
+                return
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append(r)
+
+    @contextmanager
+    def simulator(self, model):
+        """Context manager for compiled roadrunner instance of model."""
+        r = self.acquire(model)
+        try:
+            yield r
+        finally:
+            self.release(model, r)
+
+    def clear(self):
+        """Remove all instances and templates."""
+        with self._lock:
+            self._idle.clear()
+            self._templates.clear()
+
+
+_pools = {}
+
+
+def get_pool() -> SimulatorPool:
+    """Simulator pool of the process."""
+    pid = os.getpid()
+    if pid not in _pools:
+        _pools[pid] = SimulatorPool()
+    return _pools[pid]
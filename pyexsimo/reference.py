@@ -0,0 +1,226 @@
+"""
+Reference results for numerical regression tests.
+
+Selected outputs of the simulation and scan results of every experiment
+are stored as compressed numpy archive 'references/<exp_id>.npz'. The
+archive contains per result an array of shape (time points, outputs, scan
+points) and the ids of the outputs.
+
+The comparator computes the maximal absolute and relative errors per
+output over all time and scan points on the arrays at once and reports the
+location of the worst deviation, so that the results of all experiments
+can be checked on every build.
+
+    pyexsimo reference             # create references
+    pyexsimo reference --check     # compare results with references
+"""
+import logging
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from pyexsimo import BASE_PATH, MODEL_PATH, DATA_PATH
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_PATH = BASE_PATH / "tests" / "references"
+
+# outputs stored in the references (if in results)
+REFERENCE_SELECTION = [
+    'time', '[glc_ext]', '[glyglc]', 'HGP', 'GNG', 'GLY',
+    'glu', 'epi', 'ins', 'gamma',
+]
+
+# tolerances of comparison, |actual - reference| <= ATOL + RTOL * |reference|
+RTOL = 1E-6
+ATOL = 1E-9
+
+_COLUMNS_SUFFIX = "__columns"
+
+
+def _results(exp):
+    """Simulation and scan results of experiment by reference key."""
+    results = {}
+    for key, result in (exp._results or {}).items():
+        results[f"simulation_{key}"] = result
+    for key, result in (exp._scan_results or {}).items():
+        results[f"scan_{key}"] = result
+    return results
+
+
+def reference_arrays(exp, selection=None) -> Dict[str, np.ndarray]:
+    """Selected outputs of the results of a simulated experiment.
+
+    :param selection: ids of outputs, REFERENCE_SELECTION if None
+    :return: dictionary of result key and array (time points, outputs,
+        scan points), the output ids are stored with suffix '__columns'
+    """
+    if selection is None:
+        selection = REFERENCE_SELECTION
+    arrays = {}
+    for key, result in _results(exp).items():
+        columns = list(result.columns)
+        outputs = [sid for sid in selection if sid in columns]
+        arrays[key] = result.data[:, [columns.index(sid) for sid in outputs], :]
+        arrays[key + _COLUMNS_SUFFIX] = np.array(outputs)
+    return arrays
+
+
+def save_reference(exp, reference_path: Path = REFERENCE_PATH,
+                   selection=None) -> Path:
+    """Store reference of simulated experiment."""
+    reference_path = Path(reference_path)
+    reference_path.mkdir(parents=True, exist_ok=True)
+    path = reference_path / f"{exp.sid}.npz"
+    np.savez_compressed(str(path), **reference_arrays(exp, selection))
+    logger.info(f"Create reference '{path}'")
+    return path
+
+
+def load_reference(exp_id: str, reference_path: Path = REFERENCE_PATH):
+    """Load reference arrays of experiment."""
+    path = Path(reference_path) / f"{exp_id}.npz"
+    if not path.exists():
+        raise IOError(f"Reference of '{exp_id}' not found: '{path}', "
+                      f"create references with 'pyexsimo reference'.")
+    with np.load(str(path)) as npz:
+        return {key: npz[key] for key in npz.files}
+
+
+def compare_arrays(reference, actual, rtol: float = RTOL,
+                   atol: float = ATOL) -> Dict[str, np.ndarray]:
+    """Errors per output of arrays (time points, outputs, scan points).
+
+    NaN values at the same positions are equal.
+
+    :return: dictionary with per output 'max_abs', 'max_rel' and the
+        position ('row', 'point') of the worst deviation and 'ok'
+    """
+    reference = np.asarray(reference, dtype=float)
+    actual = np.asarray(actual, dtype=float)
+    if reference.shape != actual.shape:
+        raise ValueError(f"Shape of results {actual.shape} differs from "
+                         f"reference {reference.shape}")
+
+    both_nan = np.isnan(reference) & np.isnan(actual)
+    abs_err = np.where(both_nan, 0.0, np.abs(actual - reference))
+    abs_err = np.where(np.isnan(abs_err), np.inf, abs_err)
+    scale = np.abs(np.nan_to_num(reference))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rel_err = np.where(abs_err == 0, 0.0, abs_err / scale)
+    # normalized error, > 1 outside of tolerance
+    err = abs_err / (atol + rtol * scale)
+
+    n_rows, n_outputs, n_points = err.shape
+    # worst position per output
+    flat = np.moveaxis(err, 1, 0).reshape(n_outputs, -1)
+    worst = np.argmax(flat, axis=1)
+    rows, points = np.unravel_index(worst, (n_rows, n_points))
+    return {
+        'max_abs': abs_err.max(axis=(0, 2)),
+        'max_rel': rel_err.max(axis=(0, 2)),
+        'row': rows,
+        'point': points,
+        'ok': flat.max(axis=1) <= 1.0,
+    }
+
+
+def compare_experiment(exp, reference_path: Path = REFERENCE_PATH,
+                       rtol: float = RTOL, atol: float = ATOL) -> List[dict]:
+    """Compare results of simulated experiment with reference.
+
+    :return: list of dictionaries per result and output with the errors and
+        location of the worst deviation (time and scan point)
+    """
+    reference = load_reference(exp.sid, reference_path)
+    results = _results(exp)
+    diffs = []
+    for key in sorted(k for k in reference if not k.endswith(_COLUMNS_SUFFIX)):
+        if key not in results:
+            raise ValueError(f"Result '{key}' of reference not in "
+                             f"experiment '{exp.sid}'")
+        result = results[key]
+        outputs = list(reference[key + _COLUMNS_SUFFIX])
+        columns = list(result.columns)
+        missing = [sid for sid in outputs if sid not in columns]
+        if missing:
+            raise ValueError(f"Outputs {missing} of reference not in result "
+                             f"'{key}' of '{exp.sid}'")
+        actual = result.data[:, [columns.index(sid) for sid in outputs], :]
+        errors = compare_arrays(reference[key], actual, rtol=rtol, atol=atol)
+
+        time = result.data[:, columns.index('time'), 0] \
+            if 'time' in columns else None
+        for k, sid in enumerate(outputs):
+            row, point = int(errors['row'][k]), int(errors['point'][k])
+            diffs.append({
+                'exp_id': exp.sid,
+                'result': key,
+                'output': sid,
+                'max_abs': float(errors['max_abs'][k]),
+                'max_rel': float(errors['max_rel'][k]),
+                'row': row,
+                'time': float(time[row]) if time is not None else None,
+                'point': point,
+                'ok': bool(errors['ok'][k]),
+            })
+    return diffs
+
+
+def _simulated_experiment(exp_id: str, model_path: Path, cache=None):
+    from pyexsimo.experiments import EXPERIMENTS, load_experiment
+    from pyexsimo.runner import create_experiment, simulate_experiment
+
+    exp = create_experiment(load_experiment(exp_id),
+                            model_path=Path(model_path) / EXPERIMENTS[exp_id]['model'],
+                            data_path=DATA_PATH)
+    simulate_experiment(exp, cache=cache, analyses=False)
+    return exp
+
+
+def create_references(exp_ids=None, reference_path: Path = REFERENCE_PATH,
+                      model_path: Path = MODEL_PATH, cache=None) -> List[Path]:
+    """Simulate experiments and store the references.
+
+    :param exp_ids: ids of experiments, all experiments if None
+    :return: list of reference paths
+    """
+    from pyexsimo.experiments import EXPERIMENTS
+
+    if exp_ids is None:
+        exp_ids = list(EXPERIMENTS.keys())
+    return [save_reference(_simulated_experiment(exp_id, model_path, cache),
+                           reference_path)
+            for exp_id in exp_ids]
+
+
+def check_references(exp_ids=None, reference_path: Path = REFERENCE_PATH,
+                     model_path: Path = MODEL_PATH, cache=None,
+                     rtol: float = RTOL, atol: float = ATOL) -> List[dict]:
+    """Simulate experiments and compare with the references.
+
+    :return: list of differences per experiment, result and output
+    """
+    from pyexsimo.experiments import EXPERIMENTS
+
+    if exp_ids is None:
+        exp_ids = list(EXPERIMENTS.keys())
+    diffs = []
+    for exp_id in exp_ids:
+        exp = _simulated_experiment(exp_id, model_path, cache)
+        diffs.extend(compare_experiment(exp, reference_path,
+                                        rtol=rtol, atol=atol))
+    return diffs
+
+
+def format_diffs(diffs: List[dict]) -> str:
+    """Table of differences."""
+    lines = [f"{'experiment':<24} {'result':<18} {'output':<10} "
+             f"{'max_abs':>10} {'max_rel':>10} {'time':>10} {'point':>6}  ok"]
+    for d in diffs:
+        time = f"{d['time']:10.4g}" if d['time'] is not None else f"{'-':>10}"
+        lines.append(f"{d['exp_id']:<24} {d['result']:<18} {d['output']:<10} "
+                     f"{d['max_abs']:10.3g} {d['max_rel']:10.3g} {time} "
+                     f"{d['point']:6d}  {'ok' if d['ok'] else 'FAIL'}")
+    return "\n".join(lines)
@@ -0,0 +1,195 @@
+"""
+Render figures from stored simulation results.
+
+The figures of headless experiment runs are rendered from the results in
+'output_path/sbmlsim' with the non-interactive agg backend, experiments are
+rendered in parallel on a process pool. The hash of the inputs of the
+figures (results, datasets, package source and render settings) is stored
+in a manifest, figures with unchanged inputs are not rendered again.
+"""
+import os
+import json
+import hashlib
+import logging
+from pathlib import Path
+
+from pyexsimo import MODEL_PATH, DATA_PATH, BASE_PATH
+from pyexsimo.experiments import EXPERIMENTS, load_experiment
+from pyexsimo.utils import file_hash, source_hash, write_atomic
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = "figures.json"
+
+# source of the figures, i.e., experiments and shared plotting modules
+SOURCE_PATH = BASE_PATH
+
+
+def load_manifest(output_path: Path) -> dict:
+    """Load render manifest from 'output_path/sbmlsim'."""
+    path = Path(output_path) / "sbmlsim" / MANIFEST_FILENAME
+    if not path.exists():
+        return {}
+    with open(path, "r") as f_json:
+        return json.load(f_json)
+
+
+def save_manifest(manifest: dict, output_path: Path):
+    """Store render manifest in 'output_path/sbmlsim'."""
+    path = Path(output_path) / "sbmlsim" / MANIFEST_FILENAME
+    write_atomic(path, json.dumps(manifest, indent=2, sort_keys=True))
+
+
+def figure_source_hash() -> str:
+    """Hash of the source of the figures.
+
+    The figures import shared code (plotting, units, analysis plots) besides
+    the experiment module, so every module of the package is hashed.
+    """
+    return source_hash(SOURCE_PATH)
+
+
+def input_hash(exp_id, output_path: Path, figure_format: str,
+               rasterize: bool, source: str = None) -> str:
+    """Hash of the inputs of the figures of the experiment.
+
+    Inputs are the stored results and datasets, the package source and the
+    render settings. The experiment is not imported.
+
+    :param source: hash of the package source, calculated if None
+    """
+    import matplotlib
+
+    path_results = Path(output_path) / "sbmlsim"
+    paths = []
+    for pattern in ["simulation_*.npz", "scan_*.npz", "analysis_*.tsv",
+                    "data_*.tsv"]:
+        paths += sorted(path_results.glob(f"{exp_id}_{pattern}"))
+
+    d = {
+        'files': [[path.name, file_hash(path)] for path in paths],
+        'source': source or figure_source_hash(),
+        'figure_format': figure_format,
+        'rasterize': rasterize,
+        'matplotlib': matplotlib.__version__,
+    }
+    content = json.dumps(d, sort_keys=True)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def is_up_to_date(exp_id, output_path: Path, ihash: str, previous: dict,
+                  figure_format: str) -> bool:
+    """Check if figures of previous rendering exist for unchanged inputs.
+
+    :param previous: manifest entry of the previous rendering
+    """
+    if not previous or previous['input_hash'] != ihash:
+        return False
+    fig_keys = previous['figures']
+    return bool(fig_keys) and all(
+        (Path(output_path) / f"{exp_id}_{fkey}.{figure_format}").exists()
+        for fkey in fig_keys)
+
+
+def render_experiment(exp_id, output_path, model_path=MODEL_PATH,
+                      data_path=DATA_PATH, figure_format="svg",
+                      rasterize=False):
+    """Render figures of experiment from stored results.
+
+    :param model_path: directory of the SBML models
+    :return: list of figure keys
+    """
+    import matplotlib
+    matplotlib.use("agg")
+    from pyexsimo.runner import create_experiment, load_results, save_figures
+
+    output_path = Path(output_path)
+    exp = create_experiment(load_experiment(exp_id),
+                            model_path=Path(model_path) / EXPERIMENTS[exp_id]['model'],
+                            data_path=data_path)
+    load_results(exp, output_path / "sbmlsim")
+    fig_keys = save_figures(exp, output_path, figure_format=figure_format,
+                            rasterize=rasterize)
+    logger.info(f"Render figures of '{exp_id}': {fig_keys}")
+    return fig_keys
+
+
+def render_figures(output_path, exp_ids=None, model_path=MODEL_PATH,
+                   data_path=DATA_PATH, jobs=1, figure_format="svg",
+                   rasterize=False, force=False):
+    """Render figures of experiments from stored results.
+
+    The figures are added to the experiment summaries in
+    'output_path/sbmlsim'.
+
+    :param exp_ids: ids of experiments to render, all experiments if None
+    :param jobs: number of worker processes
+    :param figure_format: 'svg' or compressed 'svgz'
+    :param rasterize: rasterize dense layers of the figures
+    :param force: render figures with unchanged inputs
+    :return: list of updated experiment summaries
+    """
+    from pyexsimo.runner import load_summary, save_summary
+
+    if figure_format not in ["svg", "svgz"]:
+        raise ValueError(f"Unsupported figure format: '{figure_format}'")
+    if exp_ids is None:
+        exp_ids = list(EXPERIMENTS.keys())
+
+    output_path = Path(output_path)
+    manifest = load_manifest(output_path)
+    kwargs = {
+        'output_path': output_path,
+        'model_path': model_path,
+        'data_path': data_path,
+        'figure_format': figure_format,
+        'rasterize': rasterize,
+    }
+
+    hashes = {}
+    figures = {}
+    source = figure_source_hash()
+    for exp_id in exp_ids:
+        hashes[exp_id] = input_hash(exp_id, output_path,
+                                    figure_format=figure_format,
+                                    rasterize=rasterize, source=source)
+        previous = manifest.get(exp_id)
+        if not force and is_up_to_date(exp_id, output_path, hashes[exp_id],
+                                       previous, figure_format):
+            logger.info(f"Figures of '{exp_id}' are up to date")
+            figures[exp_id] = previous['figures']
+    exp_ids_render = [exp_id for exp_id in exp_ids if exp_id not in figures]
+
+    if jobs <= 1 or len(exp_ids_render) <= 1:
+        for exp_id in exp_ids_render:
+            figures[exp_id] = render_experiment(exp_id, **kwargs)
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        os.environ.setdefault("MPLBACKEND", "agg")
+        # import experiments once, forked workers share the loaded modules
+        for exp_id in exp_ids_render:
+            load_experiment(exp_id)
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {exp_id: executor.submit(render_experiment, exp_id,
+                                               **kwargs)
+                       for exp_id in exp_ids_render}
+            for exp_id, future in futures.items():
+                figures[exp_id] = future.result()
+
+    summaries = []
+    for exp_id in exp_ids:
+        manifest[exp_id] = {
+            'input_hash': hashes[exp_id],
+            'figure_format': figure_format,
+            'figures': figures[exp_id],
+        }
+        summary = load_summary(exp_id, output_path=output_path)
+        summary['figures'] = figures[exp_id]
+        summary['figure_format'] = figure_format
+        save_summary(summary, output_path)
+        summaries.append(summary)
+    save_manifest(manifest, output_path)
+
+    logger.info(f"Rendered figures: {len(exp_ids_render)} experiments, "
+                f"{len(exp_ids) - len(exp_ids_render)} up to date")
+    return summaries
@@ -1,71 +1,161 @@
 """
 Create markdown report of simulation experiments.
+
+The report is built incrementally: the hash of the inputs of every page
+(template, context and code of the experiment) is stored in a manifest,
+pages with unchanged inputs are not rendered again.
 """
-import sys
 import os
+import json
+import hashlib
 import logging
-import jinja2
+import importlib.util
+from functools import lru_cache
+from pathlib import Path
 
 from pyexsimo import TEMPLATE_PATH, BASE_PATH
 from pyexsimo import __version__
+from pyexsimo.runner import experiment_summary
+from pyexsimo.utils import file_hash, write_atomic
 
 logger = logging.getLogger(__name__)
 
+MANIFEST_FILENAME = "report.json"
+
+
+@lru_cache(maxsize=None)
+def _environment():
+    """Jinja2 environment for the report templates."""
+    import jinja2
+
+    return jinja2.Environment(loader=jinja2.FileSystemLoader(str(TEMPLATE_PATH)),
+                              extensions=['jinja2.ext.autoescape'],
+                              trim_blocks=True,
+                              lstrip_blocks=True)
+
+
+@lru_cache(maxsize=None)
+def _read_code(code_path: str, mtime: float) -> str:
+    """Source code of file, cached by path and modification time."""
+    with open(code_path, "r") as f_code:
+        return f_code.read()
+
+
+@lru_cache(maxsize=None)
+def _template_hash(template: str, mtime: float) -> str:
+    return file_hash(TEMPLATE_PATH / template)
+
+
+def page_hash(template: str, context: dict) -> str:
+    """Hash of the inputs of a report page."""
+    d = {
+        'template': _template_hash(
+            template, os.path.getmtime(str(TEMPLATE_PATH / template))),
+        'context': context,
+    }
+    content = json.dumps(d, sort_keys=True)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def experiment_context(summary: dict, output_path: Path) -> dict:
+    """Context of the experiment page."""
+    # relative paths to output path
+    model_path = os.path.relpath(summary['model_path'], str(output_path))
+    report_path = f"{model_path[:-4]}.html"
+    data_path = os.path.relpath(summary['data_path'], str(output_path))
+
+    # source of experiment module (without importing the module)
+    code_path = importlib.util.find_spec(summary['module']).origin
+    code = _read_code(code_path, os.path.getmtime(code_path))
+    code_path = os.path.relpath(code_path, BASE_PATH.parent)
+    code_path = "https:/" + os.path.join("/github.com/matthiaskoenig/exsimo/tree/master/", code_path)
+    logger.debug(code_path)
+
+    return {
+        'exp_id': summary['exp_id'],
+        'model_path': model_path,
+        'report_path': report_path,
+        'data_path': data_path,
+        'datasets': summary['datasets'],
+        'simulations': summary['simulations'],
+        'scans': summary['scans'],
+        'figures': summary['figures'],
+        'figure_format': summary.get('figure_format', "svg"),
+        'code_path': code_path,
+        'code': code,
+    }
+
+
+def load_manifest(output_path: Path) -> dict:
+    """Load report manifest from 'output_path/sbmlsim'."""
+    path = Path(output_path) / "sbmlsim" / MANIFEST_FILENAME
+    if not path.exists():
+        return {}
+    with open(path, "r") as f_json:
+        return json.load(f_json)
+
+
+def save_manifest(manifest: dict, output_path: Path):
+    """Store report manifest in 'output_path/sbmlsim'."""
+    path = Path(output_path) / "sbmlsim" / MANIFEST_FILENAME
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_atomic(path, json.dumps(manifest, indent=2, sort_keys=True))
+
+
+def render_page(template: str, context: dict, md_file: Path):
+    """Render page and write markdown file."""
+    md = _environment().get_template(template).render(context)
+    write_atomic(md_file, md)
+    logger.info(f"Create '{md_file}'")
+
+
+def create_report(results, output_path, jobs=4, force=False):
+    """ Creates markdown files results.
 
-def create_report(results, output_path):
-    """ Creates markdown files results."""
-    env = jinja2.Environment(loader=jinja2.FileSystemLoader(str(TEMPLATE_PATH)),
-                             extensions=['jinja2.ext.autoescape'],
-                             trim_blocks=True,
-                             lstrip_blocks=True)
+    :param results: experiment info dictionaries or experiment summaries
+    :param output_path: path of the report
+    :param jobs: number of threads for rendering pages
+    :param force: render pages with unchanged inputs
+    :return: list of rendered markdown files
+    """
+    from concurrent.futures import ThreadPoolExecutor
 
+    output_path = Path(output_path)
+    pages = []
     exp_ids = []
     for item in results:
-        exp = item['experiment']
-        exp_id = exp.sid
-        exp_ids.append(exp_id)
-
-        # relative paths to output path
-        model_path = os.path.relpath(str(item['model_path']), output_path)
-        report_path = f"{model_path[:-4]}.html"
-        data_path = os.path.relpath(str(item['data_path']), output_path)
-
-        code_path = sys.modules[exp.__module__].__file__
-        with open(code_path, "r") as f_code:
-            code = f_code.read()
-        code_path = os.path.relpath(code_path, BASE_PATH.parent)
-        code_path = "https:/" + os.path.join("/github.com/matthiaskoenig/exsimo/tree/master/", code_path)
-        print(code_path)
-
-        context = {
-            'exp_id': exp_id,
-            'model_path': model_path,
-            'report_path': report_path,
-            'data_path': data_path,
-            'datasets': sorted(exp.datasets.keys()),
-            'simulations': sorted(exp.simulations.keys()),
-            'scans': sorted(exp.simulations.keys()),
-            'figures': sorted(exp.figures.keys()),
-            'code_path': code_path,
-            'code': code,
-        }
-        template = env.get_template('experiment.md')
-        md = template.render(context)
-        md_file = output_path / f'{exp_id}.md'
-        with open(md_file, "w") as f_index:
-            f_index.write(md)
-            logger.info(f"Create '{md_file}'")
+        summary = experiment_summary(item)
+        exp_ids.append(summary['exp_id'])
+        pages.append((f"{summary['exp_id']}.md", 'experiment.md',
+                      experiment_context(summary, output_path)))
 
     context = {
         'version': __version__,
         'exp_ids': exp_ids,
     }
-    template = env.get_template('index.md')
-    md = template.render(context)
-    md_file = output_path / 'index.md'
-    with open(md_file, "w") as f_index:
-        f_index.write(md)
-        logger.info(f"Create '{md_file}'")
+    pages.append(('index.md', 'index.md', context))
+
+    manifest = load_manifest(output_path)
+    pages_render = []
+    for filename, template, context in pages:
+        phash = page_hash(template, context)
+        if (not force and manifest.get(filename) == phash
+                and (output_path / filename).exists()):
+            logger.debug(f"'{filename}' is up to date")
+            continue
+        manifest[filename] = phash
+        pages_render.append((template, context, output_path / filename))
+
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+        futures = [executor.submit(render_page, *page)
+                   for page in pages_render]
+        for future in futures:
+            future.result()
+    save_manifest(manifest, output_path)
+
+    logger.info(f"Report: {len(pages_render)} pages rendered, "
+                f"{len(pages) - len(pages_render)} up to date")
+    return [md_file for _, _, md_file in pages_render]
 
 
 if __name__ == "__main__":
@@ -73,7 +163,7 @@ if __name__ == "__main__":
     from pyexsimo.experiments.glycogen import GlycogenExperiment
     from pyexsimo import RESULT_PATH, MODEL_PATH, DATA_PATH
 
-    from sbmlsim.experiment import run_experiment
+    from pyexsimo.runner import run_experiment
 
     results = []
     info = run_experiment(GlycogenExperiment,
@@ -0,0 +1,287 @@
+"""
+Residuals between simulations and experimental data.
+
+An experiment declares which simulated columns are compared with which
+data columns via DataFit definitions in its 'fits' property. The simulated
+lines (all lines of a scan) are interpolated at the x values of the data
+points and converted to the data units. Residuals, weighted residuals
+(residual divided by SD or SE of the data) and chi-square metrics per line
+and per reference are computed on the NumPy arrays of all lines and data
+points at once.
+
+The residual tables are stored next to the datasets as
+'sbmlsim/<exp_id>_residuals_<fit>.tsv', the metrics as
+'sbmlsim/<exp_id>_metrics.tsv'.
+"""
+import logging
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from pyexsimo.units import conversion_factor
+
+logger = logging.getLogger(__name__)
+
+# group of the metrics over all data points
+ALL = "all"
+
+
+class DataFit(object):
+    """Comparison of a simulated column with a data column."""
+
+    def __init__(self, dataset: str, result: str, xid: str, yid: str,
+                 xid_sim: str, yid_sim: str, yid_sd: str = None,
+                 yid_se: str = None, across_scan: bool = False,
+                 groups=("reference",)):
+        """
+        :param dataset: key of the dataset of the experiment
+        :param result: key of the simulation or scan of the experiment
+        :param xid: x column of the data, e.g., 'time'
+        :param yid: y column of the data
+        :param xid_sim: x column of the simulation
+        :param yid_sim: y column of the simulation
+        :param yid_sd: standard deviation column of the data
+        :param yid_se: standard error column of the data
+        :param across_scan: the simulated line runs across the scan, i.e.,
+            the values at the first time point of all scan lines (e.g.
+            dose-response curves)
+        :param groups: data columns for the metrics breakdown
+        """
+        self.dataset = dataset
+        self.result = result
+        self.xid = xid
+        self.yid = yid
+        self.xid_sim = xid_sim
+        self.yid_sim = yid_sim
+        self.yid_sd = yid_sd
+        self.yid_se = yid_se
+        self.across_scan = across_scan
+        self.groups = list(groups)
+
+    def __repr__(self):
+        return (f"DataFit({self.dataset}.{self.yid} ~ "
+                f"{self.result}.{self.yid_sim})")
+
+
+def simulated_lines(result, fit: DataFit):
+    """x and y values of the simulated lines.
+
+    :return: (xs, ys) arrays of shape (points, lines) in model units
+    """
+    columns = list(result.columns)
+    kx = columns.index(fit.xid_sim)
+    ky = columns.index(fit.yid_sim)
+    if fit.across_scan:
+        return result.data[0, kx, :][:, None], result.data[0, ky, :][:, None]
+    return result.data[:, kx, :], result.data[:, ky, :]
+
+
+def interpolate(xs, ys, x):
+    """Linear interpolation of all lines at x.
+
+    :param xs: x values of lines (points, lines)
+    :param ys: y values of lines (points, lines)
+    :param x: x values of interpolation (m, )
+    :return: interpolated values (m, lines), NaN outside of the x range of
+        the line
+    """
+    xs = np.asarray(xs, dtype=float)
+    ys = np.asarray(ys, dtype=float)
+    x = np.asarray(x, dtype=float)
+    if xs.shape[0] < 2:
+        raise ValueError("At least two points required for interpolation")
+
+    if not np.all(xs == xs[:, :1]):
+        # lines with different x values
+        return np.column_stack([
+            np.interp(x, xs[:, k], ys[:, k], left=np.nan, right=np.nan)
+            for k in range(xs.shape[1])
+        ])
+
+    # shared x values, interpolation weights for all lines at once
+    order = np.argsort(xs[:, 0], kind="stable")
+    x0 = xs[order, 0]
+    y0 = ys[order, :]
+    i = np.clip(np.searchsorted(x0, x, side="right"), 1, len(x0) - 1)
+    dx = x0[i] - x0[i - 1]
+    w = np.where(dx > 0, (x - x0[i - 1]) / np.where(dx > 0, dx, 1.0), 1.0)
+    y = y0[i - 1] * (1.0 - w)[:, None] + y0[i] * w[:, None]
+    y[(x < x0[0]) | (x > x0[-1])] = np.nan
+    return y
+
+
+def _scan_values(result, lines: int) -> Dict[str, np.ndarray]:
+    """Scan values of the lines of the result."""
+    keys = getattr(result, 'keys', None)
+    if not keys or len(result.indices) != lines:
+        return {}
+    values = {}
+    for k, key in enumerate(keys):
+        vec = [getattr(v, 'magnitude', v) for v in result.vecs[k]]
+        values[key] = np.array([vec[index[k]] for index in result.indices],
+                               dtype=float)
+    return values
+
+
+def residual_table(exp, fit: DataFit, fit_id: str = None, datasets=None):
+    """Residuals of all simulated lines at the data points.
+
+    Every row is a pair of data point and simulated line. Values are in the
+    units of the data.
+
+    :param datasets: datasets of the experiment, loaded if None
+    :return: DataFrame
+    """
+    import pandas as pd
+
+    if datasets is None:
+        datasets = exp.datasets
+    dset = datasets[fit.dataset]
+    if fit.result in exp.scans:
+        result = exp.scan_results[fit.result]
+    else:
+        result = exp.results[fit.result]
+
+    xs, ys = simulated_lines(result, fit)
+    x_unit = dset.udict[fit.xid]
+    y_unit = dset.udict[fit.yid]
+    fx = conversion_factor(result.udict[fit.xid_sim], x_unit, ureg=result.ureg)
+    fy = conversion_factor(result.udict[fit.yid_sim], y_unit, ureg=result.ureg)
+
+    x = dset[fit.xid].values.astype(float)
+    y = dset[fit.yid].values.astype(float)
+    y_sim = interpolate(xs * fx, ys * fy, x)  # (points, lines)
+    n_points, n_lines = y_sim.shape
+
+    sigma = np.full(n_points, np.nan)
+    if fit.yid_sd:
+        sigma = dset[fit.yid_sd].values.astype(float)
+    elif fit.yid_se:
+        sigma = dset[fit.yid_se].values.astype(float)
+    sigma = np.where(sigma > 0, sigma, np.nan)
+
+    residual = y_sim - y[:, None]
+    weighted = residual / sigma[:, None]
+
+    # flatten to rows (line, point)
+    d = {
+        'fit': fit_id or fit.dataset,
+        'line': np.repeat(np.arange(n_lines), n_points),
+    }
+    for key, values in _scan_values(result, n_lines).items():
+        d[key] = np.repeat(values, n_points)
+    for column in fit.groups:
+        if column in dset.columns:
+            d[column] = np.tile(dset[column].values, n_lines)
+    d.update({
+        'x': np.tile(x, n_lines),
+        'x_unit': x_unit,
+        'y': np.tile(y, n_lines),
+        'y_sigma': np.tile(sigma, n_lines),
+        'y_sim': y_sim.T.ravel(),
+        'y_unit': y_unit,
+        'residual': residual.T.ravel(),
+        'weighted_residual': weighted.T.ravel(),
+    })
+    return pd.DataFrame(d)
+
+
+def fit_metrics(table, groups=("reference",)):
+    """Metrics of residual table per fit and line and per group.
+
+    * n: number of data points in the simulated range
+    * rmse: root mean square of residuals
+    * n_weighted: number of data points with SD or SE
+    * chi2: sum of squared weighted residuals
+    * chi2_red: chi2 / n_weighted
+
+    :param groups: columns of the table for the breakdown, e.g., reference;
+        metrics over all data points have the group 'all'
+    """
+    import pandas as pd
+
+    keys = ['fit', 'line']
+    groups = [c for c in groups if c in table.columns]
+    df = pd.DataFrame({
+        'fit': table['fit'],
+        'line': table['line'],
+        'n': table['residual'].notna().astype(int),
+        'r2': table['residual'] ** 2,
+        'n_weighted': table['weighted_residual'].notna().astype(int),
+        'chi2': table['weighted_residual'] ** 2,
+    })
+
+    def aggregate(by):
+        m = df.groupby(by, sort=True).agg(
+            {'n': 'sum', 'r2': 'sum', 'n_weighted': 'sum', 'chi2': 'sum'})
+        m['rmse'] = np.sqrt(m['r2'] / m['n'].where(m['n'] > 0))
+        m['chi2_red'] = m['chi2'] / m['n_weighted'].where(m['n_weighted'] > 0)
+        m.loc[m['n_weighted'] == 0, 'chi2'] = np.nan
+        return m.drop(columns='r2').reset_index()
+
+    metrics = aggregate(keys)
+    metrics.insert(2, 'group', ALL)
+    parts = [metrics]
+    for column in groups:
+        df[column] = table[column].astype(str).str.strip()
+        m = aggregate(keys + [column]).rename(columns={column: 'group'})
+        m['group'] = column + "=" + m['group']
+        parts.append(m)
+    metrics = pd.concat(parts, ignore_index=True, sort=False)
+    metrics = metrics.sort_values(['fit', 'line'], kind="stable")
+    return metrics[['fit', 'line', 'group', 'n', 'rmse', 'n_weighted',
+                    'chi2', 'chi2_red']].reset_index(drop=True)
+
+
+def residual_tables(exp) -> Dict[str, object]:
+    """Residual tables of all fits of the experiment."""
+    fits = getattr(exp, 'fits', {})
+    if not fits:
+        return {}
+    datasets = exp.datasets
+    return {fit_id: residual_table(exp, fit, fit_id=fit_id, datasets=datasets)
+            for fit_id, fit in fits.items()}
+
+
+def experiment_metrics(exp, tables: Dict[str, object] = None):
+    """Metrics of all fits of the experiment."""
+    import pandas as pd
+
+    if tables is None:
+        tables = residual_tables(exp)
+    if not tables:
+        return None
+    return pd.concat([fit_metrics(table, groups=exp.fits[fit_id].groups)
+                      for fit_id, table in tables.items()],
+                     ignore_index=True)
+
+
+def save_residuals(exp, results_path: Path) -> List[Path]:
+    """Store residual tables and metrics of experiment in results path.
+
+    :return: list of written paths
+    """
+    results_path = Path(results_path)
+    tables = residual_tables(exp)
+    if not tables:
+        return []
+
+    paths = []
+    for fit_id, table in tables.items():
+        path = results_path / f"{exp.sid}_residuals_{fit_id}.tsv"
+        table.to_csv(path, sep="\t", index=False)
+        paths.append(path)
+
+    metrics = experiment_metrics(exp, tables)
+    path = results_path / f"{exp.sid}_metrics.tsv"
+    metrics.to_csv(path, sep="\t", index=False)
+    paths.append(path)
+    return paths
+
+
+def load_metrics(exp_id: str, results_path: Path):
+    """Load metrics of experiment from results path."""
+    import pandas as pd
+    return pd.read_csv(Path(results_path) / f"{exp_id}_metrics.tsv",
+                       sep="\t")
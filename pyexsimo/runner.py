@@ -0,0 +1,420 @@
+"""
+Run simulation experiments.
+
+Runs the timecourse simulations and scans of an experiment, loading
+identical simulations from the result cache instead of re-simulating them.
+
+In headless mode (no figures) the figures of the experiments are never
+created and matplotlib is not imported by pyexsimo. The simulation results
+are stored next to the datasets in 'output_path/sbmlsim', so that figures
+can be rendered later from the stored results.
+"""
+import os
+import json
+import time
+import logging
+from pathlib import Path
+
+from pyexsimo.cache import (
+    ResultCache, simulation_key, analysis_key, save_result, load_result
+)
+from pyexsimo.residuals import save_residuals
+
+logger = logging.getLogger(__name__)
+
+# integrator settings of the simulation experiments
+INTEGRATOR_SETTINGS = {
+    'absolute_tolerance': 1E-12,
+    'relative_tolerance': 1E-12,
+}
+
+
+def set_integrator_settings(r, **integrator_settings):
+    """Set integrator settings of roadrunner instance.
+
+    The absolute tolerance is relative to the smallest compartment volume,
+    i.e., to the amounts (as in sbmlsim).
+    """
+    integrator = r.getIntegrator()
+    for key, value in integrator_settings.items():
+        if key == "absolute_tolerance":
+            value = value * min(r.model.getCompartmentVolumes())
+        integrator.setValue(key, value)
+    return integrator
+
+
+def create_experiment(exp_class, model_path, data_path):
+    """Create experiment without loading the model in roadrunner.
+
+    The model is only compiled by the simulator if simulations are not
+    in the cache. The units are read in the shared unit registry.
+    """
+    from pyexsimo.units import get_units
+
+    exp = exp_class(model_path=None, data_path=data_path)
+    exp._model_path = model_path
+    exp.udict, exp.ureg = get_units(model_path)
+    return exp
+
+
+def create_simulator(model, udict, ureg, Simulator=None, pool=None,
+                     **integrator_settings):
+    """Simulator with compiled model from the simulator pool.
+
+    The roadrunner instance must be returned to the pool after the
+    simulations with pool.release(model, simulator.r).
+
+    :param model: path of SBML model or SBML string
+    :param udict: units of the model
+    :param ureg: unit registry of the model
+    :param pool: SimulatorPool, the pool of the process if None
+    """
+    from sbmlsim.model import set_timecourse_selections
+    from pyexsimo.pool import get_pool
+
+    if Simulator is None:
+        from sbmlsim.simulation_serial import SimulatorSerial
+        Simulator = SimulatorSerial
+    if pool is None:
+        pool = get_pool()
+
+    simulator = Simulator(path=None)
+    simulator.r = pool.acquire(model)
+    set_timecourse_selections(simulator.r)
+    set_integrator_settings(simulator.r, **integrator_settings)
+    simulator.udict, simulator.ureg = udict, ureg
+    return simulator
+
+
+def simulate_experiment(exp, cache: ResultCache = None, Simulator=None,
+                        variant=None, pool=None, monitor=None,
+                        analyses=True, **integrator_settings):
+    """Run simulations, scans & analyses of experiment.
+
+    Results and analysis tables are looked up in the cache first. The
+    simulator is only created if at least one simulation is not cached, the
+    compiled model is taken from the simulator pool and returned after the
+    simulations.
+
+    :param variant: ModelVariant of the experiment model, simulated
+        in-memory without writing the SBML
+    :param pool: SimulatorPool, the pool of the process if None
+    :param monitor: InvariantMonitor checking the output of the simulations
+        and cached results
+    :param analyses: run the analyses of the experiment, callers which only
+        use the simulations skip them
+    """
+    from pyexsimo.designs import run_scan
+    from pyexsimo.pool import get_pool
+
+    if pool is None:
+        pool = get_pool()
+    settings = dict(INTEGRATOR_SETTINGS)
+    settings.update(integrator_settings)
+    simulator = None
+    simulation_keys = []
+    model = exp.model_path
+    if variant is not None:
+        from pyexsimo.variants import variant_sbml
+        model = variant_sbml(exp.model_path, variant)
+
+    def simulate(definition, key, run):
+        nonlocal simulator
+        definition.normalize(udict=exp.udict, ureg=exp.ureg)
+        if monitor is not None:
+            monitor.start(exp.sid, key)
+        cache_key = None
+        if cache is not None:
+            cache_key = simulation_key(model, definition,
+                                       udict=exp.udict,
+                                       integrator_settings=settings)
+            simulation_keys.append(cache_key)
+            result = cache.get(cache_key, udict=exp.udict, ureg=exp.ureg)
+            if result is not None:
+                if monitor is not None:
+                    monitor.check_result(result)
+                return result
+
+        logger.info(f"Simulate {key}")
+        if simulator is None:
+            simulator = create_simulator(model, udict=exp.udict,
+                                         ureg=exp.ureg, Simulator=Simulator,
+                                         pool=pool, **settings)
+            if monitor is not None:
+                simulator.timecourse = monitor.monitored(simulator.timecourse)
+        result = run(simulator, definition)
+        if cache is not None:
+            cache.put(cache_key, result)
+        return result
+
+    try:
+        exp._results = {}
+        for key, sim_def in exp.simulations.items():
+            exp._results[key] = simulate(
+                sim_def, key, lambda s, d: s.timecourses(d))
+
+        exp._scan_results = {}
+        for key, scan_def in exp.scans.items():
+            exp._scan_results[key] = simulate(
+                scan_def, key, run_scan)
+    finally:
+        if simulator is not None:
+            pool.release(model, simulator.r)
+
+    exp._analysis_results = {}
+    if not analyses or not exp.analyses:
+        return
+    source = None
+    if cache is not None:
+        from pyexsimo import BASE_PATH
+        from pyexsimo.utils import source_hash
+        source = source_hash(BASE_PATH)
+    for key, analysis in exp.analyses.items():
+        cache_key = None
+        table = None
+        if cache is not None:
+            cache_key = analysis_key(model, f"{exp.__class__.__name__}.{key}",
+                                     simulation_keys, source=source)
+            table = cache.get_table(cache_key)
+        if table is None:
+            logger.info(f"Analysis {key}")
+            table = analysis(model)
+            if cache is not None:
+                cache.put_table(cache_key, table)
+        exp._analysis_results[key] = table
+
+
+def result_paths(exp, results_path: Path) -> dict:
+    """Paths of the stored simulation and scan results of the experiment."""
+    results_path = Path(results_path)
+    paths = {}
+    for key in exp.simulations:
+        paths[('simulation', key)] = results_path / f"{exp.sid}_simulation_{key}.npz"
+    for key in exp.scans:
+        paths[('scan', key)] = results_path / f"{exp.sid}_scan_{key}.npz"
+    for key in exp.analyses:
+        paths[('analysis', key)] = results_path / f"{exp.sid}_analysis_{key}.tsv"
+    return paths
+
+
+def save_results(exp, results_path: Path):
+    """Store simulation, scan and analysis results of experiment in results
+    path.
+
+    :return: list of result paths
+    """
+    paths = result_paths(exp, results_path)
+    for (kind, key), path in paths.items():
+        if kind == 'simulation':
+            save_result(exp._results[key], path)
+        elif kind == 'scan':
+            save_result(exp._scan_results[key], path)
+        else:
+            exp._analysis_results[key].to_csv(path, sep="\t", index=False)
+    return sorted(paths.values())
+
+
+def load_results(exp, results_path: Path):
+    """Load stored simulation, scan and analysis results of experiment.
+
+    Figures of the experiment can be created from the loaded results
+    without running any simulation.
+    """
+    exp._results = {}
+    exp._scan_results = {}
+    exp._analysis_results = {}
+    for (kind, key), path in result_paths(exp, results_path).items():
+        if not path.exists():
+            raise IOError(f"Results of '{exp.sid}' not found: '{path}', "
+                          f"run the experiment first.")
+        if kind == 'analysis':
+            import pandas as pd
+            exp._analysis_results[key] = pd.read_csv(
+                path, sep="\t", float_precision="round_trip")
+            continue
+        result = load_result(path, udict=exp.udict, ureg=exp.ureg)
+        if kind == 'simulation':
+            exp._results[key] = result
+        else:
+            exp._scan_results[key] = result
+
+
+# lines and collections with more points are rasterized
+RASTERIZE_MIN_POINTS = 200
+
+# reproducible and compact SVG output
+SVG_RC_PARAMS = {
+    'svg.fonttype': 'none',
+    'svg.hashsalt': 'pyexsimo',
+}
+
+
+def rasterize_dense_layers(fig, min_points: int = RASTERIZE_MIN_POINTS):
+    """Rasterize dense layers of figure in vector output.
+
+    Lines, markers and collections (e.g. error bars, filled contours) with
+    more than min_points points are rasterized. Axes, ticks and labels stay
+    vector graphics.
+    """
+    for ax in fig.axes:
+        for line in ax.get_lines():
+            if len(line.get_xdata()) > min_points:
+                line.set_rasterized(True)
+        for collection in ax.collections:
+            n_points = sum(len(path.vertices)
+                           for path in collection.get_paths())
+            if n_points > min_points:
+                collection.set_rasterized(True)
+
+
+def save_figures(exp, output_path, close=True, figure_format="svg",
+                 rasterize=False):
+    """Create and save figures of experiment.
+
+    :param close: close figures after saving to free memory
+    :param figure_format: 'svg' or compressed 'svgz'
+    :param rasterize: rasterize dense layers of the figures
+    :return: list of figure keys
+    """
+    import matplotlib
+    from sbmlsim.plotting_matplotlib import plt
+
+    with matplotlib.rc_context(SVG_RC_PARAMS):
+        figures = exp.figures
+        for fkey, fig in figures.items():
+            if rasterize:
+                rasterize_dense_layers(fig)
+            path_fig = output_path / f"{exp.sid}_{fkey}.{figure_format}"
+            fig.savefig(path_fig, format=figure_format, dpi=150,
+                        bbox_inches="tight", metadata={'Date': None})
+            if close:
+                plt.close(fig)
+    return sorted(figures.keys())
+
+
+def run_experiment(exp_class, output_path, model_path, data_path,
+                   show_figures=False, cache: ResultCache = None,
+                   figures=True, results=None, variant=None, monitor=None):
+    """Run given experiment.
+
+    Figures are stored in the output path, datasets, residuals and the
+    experiment summary in 'output_path/sbmlsim'.
+    Returns info dictionary.
+
+    :param figures: create and save figures, without figures the experiment
+        runs headless, i.e. matplotlib is not used
+    :param results: store simulation results in 'output_path/sbmlsim',
+        by default results are stored if no figures are created
+    :param variant: ModelVariant of the model
+    :param monitor: InvariantMonitor of the simulations, violations are
+        stored in the summary
+    """
+    if results is None:
+        results = not figures
+
+    timings = {}
+    t_start = time.perf_counter()
+    exp = create_experiment(exp_class, model_path=model_path,
+                            data_path=data_path)
+    simulate_experiment(exp, cache=cache, variant=variant, monitor=monitor)
+    timings['simulate'] = time.perf_counter() - t_start
+
+    # create and save figures
+    fig_keys = []
+    if figures:
+        t_start = time.perf_counter()
+        fig_keys = save_figures(exp, output_path, close=not show_figures)
+        timings['figures'] = time.perf_counter() - t_start
+
+    # create and save data sets
+    t_start = time.perf_counter()
+    path_results = output_path / "sbmlsim"
+    path_results.mkdir(parents=True, exist_ok=True)
+    exp.save_datasets(path_results)
+    timings['datasets'] = time.perf_counter() - t_start
+
+    # residuals and metrics of simulations against datasets
+    t_start = time.perf_counter()
+    save_residuals(exp, path_results)
+    timings['residuals'] = time.perf_counter() - t_start
+
+    if results:
+        t_start = time.perf_counter()
+        save_results(exp, path_results)
+        timings['results'] = time.perf_counter() - t_start
+
+    if show_figures and figures:
+        from sbmlsim.plotting_matplotlib import plt
+        plt.show()
+
+    info = {
+        'experiment': exp,
+        'output_path': output_path,
+        'model_path': model_path,
+        'data_path': data_path,
+        'figures': fig_keys,
+        'timings': timings,
+    }
+    if monitor is not None:
+        info['violations'] = monitor.experiment_violations(exp.sid)
+    save_summary(experiment_summary(info), output_path)
+    return info
+
+
+def experiment_summary(info) -> dict:
+    """Summary of executed experiment.
+
+    The summary contains all information for the report and can be
+    serialized, i.e., passed between processes and stored as JSON.
+    """
+    if 'exp_id' in info:
+        # already a summary
+        return info
+
+    exp = info['experiment']
+    figures = info.get('figures')
+    if figures is None:
+        figures = exp.figures.keys()
+
+    return {
+        'exp_id': exp.sid,
+        'module': exp.__module__,
+        'output_path': str(info['output_path']),
+        'model_path': str(info['model_path']),
+        'data_path': str(info['data_path']),
+        'datasets': sorted(exp.datasets.keys()),
+        'simulations': sorted(exp.simulations.keys()),
+        'scans': sorted(exp.scans.keys()),
+        'figures': sorted(figures),
+        'figure_format': info.get('figure_format', "svg"),
+        'timings': info.get('timings', {}),
+        'violations': info.get('violations', []),
+    }
+
+
+def save_summary(summary: dict, output_path: Path):
+    """Store experiment summary as JSON in 'output_path/sbmlsim'.
+
+    Paths are stored relative to the output path, timings are not stored.
+    """
+    d = {key: value for key, value in summary.items()
+         if key not in ['output_path', 'timings']}
+    for key in ['model_path', 'data_path']:
+        d[key] = os.path.relpath(summary[key], str(output_path))
+
+    path = Path(output_path) / "sbmlsim" / f"{summary['exp_id']}.json"
+    with open(path, "w") as f_json:
+        json.dump(d, f_json, indent=2)
+
+
+def load_summary(exp_id: str, output_path: Path) -> dict:
+    """Load experiment summary from JSON in 'output_path/sbmlsim'."""
+    path = Path(output_path) / "sbmlsim" / f"{exp_id}.json"
+    with open(path, "r") as f_json:
+        summary = json.load(f_json)
+
+    summary['output_path'] = str(output_path)
+    for key in ['model_path', 'data_path']:
+        summary[key] = os.path.normpath(
+            os.path.join(str(output_path), summary[key]))
+    return summary
@@ -0,0 +1,271 @@
+"""
+Input schedules for long-horizon simulations.
+
+Timecourses change glc_ext only by changes at the start of a Timecourse, days
+of meals would need hundreds of segments, each restarting the integrator.
+An InputSchedule drives a model input (glc_ext, optionally the hormones ins,
+glu and epi) by a piecewise-linear, monotone cubic (pchip) or cubic spline
+time series inside a single integration:
+
+* the input gets an assignment rule of time, a balanced tree of piecewise
+  polynomials, i.e. the evaluation is logarithmic in the number of segments
+* every breakpoint is an event, so the integrator locates the kinks of the
+  input instead of stepping over them
+
+Schedules are part of model variants. Long-horizon simulations integrate in
+chunks (e.g. a day) and store only selected outputs at the output interval
+(thinning), so the memory of the integration does not grow with the horizon.
+
+    schedule = meal_schedule(days=7)
+    variant = ModelVariant(schedules=[schedule])
+    sbml = variant_sbml(MODEL_PATH / "liver_glucose.xml", variant)
+    df = simulate_schedule(sbml, end=7 * 1440, dt=10,
+                           selections=["time", "[glc_ext]", "[glyglc]"])
+"""
+import logging
+from typing import Dict, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+KINDS = ['linear', 'pchip', 'spline']
+
+# meals (hour of day, duration [min], peak glucose [mM])
+MEALS = [(7.5, 150, 8.0), (12.5, 180, 8.5), (19.0, 180, 9.0)]
+FASTING_GLUCOSE = 4.5  # [mM]
+DAY = 1440  # [min]
+
+
+def _number(value: float) -> str:
+    return f"{value:.17g}"
+
+
+class InputSchedule(object):
+    """Time series of a model input in model units (time in min)."""
+
+    def __init__(self, sid: str, times, values, kind: str = 'linear'):
+        """
+        :param sid: id of species (concentration) or parameter
+        :param times: increasing times of the breakpoints
+        :param values: values at the breakpoints, the first and last value
+            are kept before and after the schedule
+        :param kind: interpolation between the breakpoints, the natural
+            cubic 'spline' overshoots at steps of the values, e.g. meals
+        """
+        times = np.asarray(times, dtype=float)
+        values = np.asarray(values, dtype=float)
+        if kind not in KINDS:
+            raise ValueError(f"Unknown kind '{kind}', kinds are: {KINDS}")
+        if times.ndim != 1 or len(times) < 2 or len(times) != len(values):
+            raise ValueError("Schedule requires at least two times and values "
+                             "of the same length")
+        if np.any(np.diff(times) <= 0):
+            raise ValueError("Times of schedule must be increasing")
+        self.sid = sid
+        self.times = times
+        self.values = values
+        self.kind = kind
+        self.coefficients = self._coefficients()
+
+    def _coefficients(self) -> np.ndarray:
+        """Polynomial coefficients (degree + 1, segments) in time - t_i,
+        highest degree first."""
+        if self.kind == 'linear':
+            slopes = np.diff(self.values) / np.diff(self.times)
+            return np.vstack([slopes, self.values[:-1]])
+        from scipy import interpolate
+        if self.kind == 'pchip':
+            f = interpolate.PchipInterpolator(self.times, self.values)
+        else:
+            f = interpolate.CubicSpline(self.times, self.values,
+                                        bc_type='natural')
+        return f.c
+
+    def spec(self) -> dict:
+        return {
+            'sid': self.sid,
+            'kind': self.kind,
+            'times': [float(t) for t in self.times],
+            'values': [float(v) for v in self.values],
+        }
+
+    def __repr__(self):
+        return (f"InputSchedule('{self.sid}', {len(self.times)} breakpoints, "
+                f"'{self.kind}')")
+
+    def __call__(self, t) -> np.ndarray:
+        """Values of the input at times t."""
+        t = np.asarray(t, dtype=float)
+        i = np.clip(np.searchsorted(self.times, t, side="right") - 1,
+                    0, len(self.times) - 2)
+        dt = t - self.times[i]
+        y = np.zeros_like(dt)
+        for c in self.coefficients:
+            y = y * dt + c[i]
+        y = np.where(t < self.times[0], self.values[0], y)
+        return np.where(t >= self.times[-1], self.values[-1], y)
+
+    def _segment(self, i: int, time: str) -> str:
+        dt = f"({time} - {_number(self.times[i])})"
+        formula = _number(self.coefficients[0, i])
+        for c in self.coefficients[1:, i]:
+            formula = f"({formula}) * {dt} + {_number(c)}"
+        return formula
+
+    def formula(self, time: str = "time") -> str:
+        """SBML L3 formula of the schedule, balanced tree of piecewise."""
+        n = len(self.times) - 1
+
+        def node(lower: int, upper: int) -> str:
+            # segments lower <= i < upper, -1 and n are the constant values
+            # before and after the schedule
+            if upper - lower == 1:
+                if lower == -1:
+                    return _number(self.values[0])
+                if lower == n:
+                    return _number(self.values[-1])
+                return self._segment(lower, time)
+            middle = (lower + upper) // 2
+            return (f"piecewise({node(lower, middle)}, "
+                    f"{time} < {_number(self.times[middle])}, "
+                    f"{node(middle, upper)})")
+
+        return node(-1, n + 1)
+
+
+def apply_schedule(model, schedule: InputSchedule):
+    """Drive input of the SBML model by the schedule.
+
+    Species get a boundary condition, existing assignment rules (e.g. of
+    the hormones) are replaced. Every breakpoint is located by an event.
+
+    :param model: libsbml.Model
+    """
+    import libsbml
+
+    sid = schedule.sid
+    element = model.getSpecies(sid) or model.getParameter(sid)
+    if element is None:
+        raise ValueError(f"Species or parameter '{sid}' does not exist in "
+                         f"model '{model.getId()}'")
+    if isinstance(element, libsbml.Species):
+        element.setBoundaryCondition(True)
+    element.setConstant(False)
+    if model.getInitialAssignment(sid) is not None:
+        model.removeInitialAssignment(sid)
+
+    math = libsbml.parseL3Formula(schedule.formula())
+    if math is None:
+        raise ValueError(f"Invalid formula of schedule of '{sid}': "
+                         f"{libsbml.getLastParseL3Error()}")
+    rule = model.getRule(sid)
+    if rule is not None:
+        if not rule.isAssignment():
+            raise ValueError(f"'{sid}' is defined by a rate rule")
+        logger.info(f"Assignment rule of '{sid}' replaced by schedule")
+    else:
+        rule = model.createAssignmentRule()
+        rule.setVariable(sid)
+    rule.setMath(math)
+
+    # events at the breakpoints stop the integrator at the kinks, the
+    # events have no assignments
+    for k, t in enumerate(schedule.times):
+        event = model.createEvent()
+        event.setId(f"{sid}_breakpoint_{k}")
+        event.setUseValuesFromTriggerTime(True)
+        trigger = event.createTrigger()
+        trigger.setInitialValue(False)
+        trigger.setPersistent(True)
+        trigger.setMath(libsbml.parseL3Formula(f"time >= {_number(t)}"))
+
+
+def meal_schedule(days: int = 1, meals=MEALS,
+                  fasting: float = FASTING_GLUCOSE, rise: float = 30,
+                  sid: str = 'glc_ext', kind: str = 'pchip') -> InputSchedule:
+    """Glucose schedule of daily meals.
+
+    Glucose rises from the fasting level to the peak within rise [min] after
+    the start of a meal and returns to the fasting level at the end.
+
+    :param meals: list of (hour of day, duration [min], peak [mM])
+    """
+    times = [0.0]
+    values = [fasting]
+    for day in range(days):
+        for hour, duration, peak in meals:
+            start = day * DAY + hour * 60
+            times += [start, start + rise, start + duration]
+            values += [fasting, peak, fasting]
+    times.append(days * DAY)
+    values.append(fasting)
+    return InputSchedule(sid, times, values, kind=kind)
+
+
+def circadian_schedule(sid: str, mean: float, amplitude: float,
+                       days: int = 1, peak: float = 12.0,
+                       dt: float = 60) -> InputSchedule:
+    """Sinusoidal daily rhythm, e.g. of a hormone, as cubic spline.
+
+    :param peak: hour of day of the maximum
+    :param dt: interval [min] of the breakpoints
+    """
+    times = np.arange(0, days * DAY + dt / 2, dt)
+    values = mean + amplitude * np.cos(2 * np.pi * (times - peak * 60) / DAY)
+    return InputSchedule(sid, times, values, kind='spline')
+
+
+def simulate_schedule(model, end: float, dt: float = 10,
+                      selections: List[str] = None, chunk: float = DAY,
+                      changes: Dict[str, float] = None, pool=None,
+                      **integrator_settings):
+    """Long-horizon simulation with thinned output.
+
+    The simulation is integrated in chunks, outputs are only stored for the
+    selections at the output interval.
+
+    :param model: path of SBML model or SBML string, e.g. with schedules
+    :param end: end time [min]
+    :param dt: output interval [min], chunk must be a multiple of dt
+    :param selections: ids of the outputs, time and the floating species if
+        None
+    :param chunk: integration interval [min]
+    :param changes: changes at the start
+    :return: DataFrame of the outputs
+    """
+    import pandas as pd
+    from pyexsimo.pool import get_pool
+    from pyexsimo.runner import INTEGRATOR_SETTINGS, set_integrator_settings
+
+    steps = int(round(chunk / dt))
+    if steps < 1 or not np.isclose(steps * dt, chunk):
+        raise ValueError(f"Chunk {chunk} must be a multiple of dt {dt}")
+    if pool is None:
+        pool = get_pool()
+    settings = dict(INTEGRATOR_SETTINGS)
+    settings.update(integrator_settings)
+
+    n = int(np.ceil(end / dt - 1E-9)) + 1
+    with pool.simulator(model) as r:
+        if selections is None:
+            selections = ["time"] + [f"[{sid}]" for sid in
+                                     r.model.getFloatingSpeciesIds()]
+        r.timeCourseSelections = selections
+        set_integrator_settings(r, **settings)
+        for key, value in (changes or {}).items():
+            r[key] = value
+
+        data = np.empty((n, len(selections)))
+        k = 0
+        t = 0.0
+        while k < n - 1:
+            m = min(steps, n - 1 - k)
+            t_end = min(t + m * dt, end)
+            s = r.simulate(t, t_end, m + 1)
+            data[k:k + m + 1] = s
+            k += m
+            t = t_end
+        if n == 1:
+            data[0] = [r[sid] for sid in selections]
+    return pd.DataFrame(data, columns=selections)
@@ -0,0 +1,499 @@
+"""
+Local simulation service.
+
+Answers queries like "HGP at glc_ext=4 mM, glyglc=300 mM after 2 h" over
+HTTP on a TCP port or a Unix socket without installing the stack on the
+client side:
+
+    POST /simulate
+    {"model": "liver_glucose_const_glyglc",
+     "changes": {"[glc_ext]": 4, "[glyglc]": 300},
+     "end": 120, "outputs": ["HGP", "GNG", "GLY"]}
+
+    {"outputs": {"HGP": ..., "GNG": ..., "GLY": ...}, "end": 120,
+     "cached": false}
+
+The values are the outputs at time end [min] of a simulation from the origin
+of the model with the changes at t=0 (model units). GET /stats returns the
+counters of the service, GET /health the models.
+
+The service keeps a warm pool of compiled roadrunner instances per model.
+Identical concurrent requests are coalesced into one simulation, compatible
+requests (same model, end, outputs and changed ids) arriving within the
+batch window are simulated as one scan on a single instance, results are
+served from an LRU cache.
+
+    pyexsimo serve --port 8765
+    pyexsimo loadgen --port 8765 --requests 2000 --concurrency 16
+"""
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from pyexsimo import MODEL_PATH
+
+logger = logging.getLogger(__name__)
+
+HOST = "127.0.0.1"
+PORT = 8765
+
+# model id: SBML file
+MODELS = {
+    'liver_glucose': 'liver_glucose.xml',
+    'liver_glucose_const_glyglc': 'liver_glucose_const_glyglc.xml',
+}
+OUTPUTS = ['HGP', 'GNG', 'GLY']
+END = 1000  # [min], steady state
+
+BATCH_WINDOW = 0.002  # [s]
+MAX_BATCH = 64
+CACHE_SIZE = 10000
+MAX_BODY = 1024 ** 2  # [bytes]
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found",
+            405: "Method Not Allowed", 413: "Payload Too Large",
+            500: "Internal Server Error"}
+
+
+class ServiceError(ValueError):
+    """Invalid request."""
+
+
+class RequestError(Exception):
+    """Malformed HTTP request, answered with status and closed connection."""
+
+    def __init__(self, status: int, message: str):
+        super(RequestError, self).__init__(message)
+        self.status = status
+
+
+class SimulationService(object):
+    """Simulations of the liver models for requests."""
+
+    def __init__(self, model_path: Path = MODEL_PATH, models: Dict = None,
+                 workers: int = 2, batch_window: float = BATCH_WINDOW,
+                 max_batch: int = MAX_BATCH, cache_size: int = CACHE_SIZE,
+                 pool=None):
+        """
+        :param model_path: directory of the SBML models
+        :param models: dictionary of model id and SBML file, MODELS if None
+        :param workers: number of simulation threads and warm instances per
+            model
+        :param batch_window: time [s] compatible requests are collected
+        :param max_batch: maximal number of requests of a batch
+        :param cache_size: maximal number of cached results
+        """
+        from pyexsimo.pool import SimulatorPool
+
+        models = models or MODELS
+        self.models = {mid: Path(model_path) / filename
+                       for mid, filename in models.items()}
+        self.workers = workers
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.cache_size = cache_size
+        self.pool = pool if pool is not None else SimulatorPool(max_idle=workers)
+
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self._pending = {}
+        self._stats = {'requests': 0, 'cache_hits': 0, 'coalesced': 0,
+                       'batches': 0, 'simulations': 0, 'errors': 0}
+
+    def stats(self) -> dict:
+        stats = dict(self._stats)
+        stats['cached'] = len(self._cache)
+        stats['pool'] = self.pool.stats()
+        return stats
+
+    def warm(self):
+        """Compile the models and fill the pool with instances."""
+        for mid, path in self.models.items():
+            instances = [self.pool.acquire(path) for _ in range(self.workers)]
+            for r in instances:
+                self.pool.release(path, r)
+            logger.info(f"Warm pool: '{mid}' ({self.workers} instances)")
+
+    def parse(self, payload: Dict):
+        """Normalized request.
+
+        :return: (key, batch key, values of the changes)
+        """
+        if not isinstance(payload, dict):
+            raise ServiceError("Request must be a JSON object")
+        mid = payload.get('model', 'liver_glucose_const_glyglc')
+        if mid not in self.models:
+            raise ServiceError(f"Unknown model '{mid}', models are: "
+                               f"{sorted(self.models)}")
+        try:
+            end = float(payload.get('end', END))
+            changes = {str(key): float(value) for key, value
+                       in (payload.get('changes') or {}).items()}
+        except (TypeError, ValueError, AttributeError) as err:
+            raise ServiceError(f"Invalid end or changes: {err}")
+        if not end > 0:
+            raise ServiceError(f"End time must be positive: {end}")
+        outputs = payload.get('outputs', OUTPUTS)
+        if (not isinstance(outputs, list) or not outputs
+                or not all(isinstance(sid, str) for sid in outputs)):
+            raise ServiceError("Outputs must be a list of ids")
+
+        keys = sorted(changes)
+        batch_key = (mid, end, tuple(outputs), tuple(keys))
+        key = batch_key + (tuple(changes[k] for k in keys),)
+        return key, batch_key, [changes[k] for k in keys]
+
+    async def simulate(self, payload: Dict) -> Dict:
+        """Outputs for the request."""
+        self._stats['requests'] += 1
+        key, batch_key, values = self.parse(payload)
+        end, outputs = batch_key[1], batch_key[2]
+
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self._stats['cache_hits'] += 1
+            return _response(outputs, self._cache[key], end, cached=True)
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self._stats['coalesced'] += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[key] = future
+            self._submit(batch_key, key, values, future)
+        result = await asyncio.shield(future)
+        return _response(outputs, result, end, cached=False)
+
+    def _submit(self, batch_key, key, values, future):
+        loop = asyncio.get_running_loop()
+        pending = self._pending.setdefault(batch_key, [])
+        pending.append((key, values, future))
+        if len(pending) >= self.max_batch:
+            loop.create_task(self._flush(batch_key))
+        elif len(pending) == 1:
+            loop.call_later(self.batch_window,
+                            lambda: loop.create_task(self._flush(batch_key)))
+
+    async def _flush(self, batch_key):
+        """Simulate the pending requests of the batch."""
+        batch = self._pending.pop(batch_key, [])
+        if not batch:
+            return
+        try:
+            await self._simulate_batch(batch_key, batch)
+        finally:
+            # requests are never left pending, e.g. if the task is cancelled
+            for item in batch:
+                if not item[2].done():
+                    self._done(item, exception=RuntimeError(
+                        "Simulation was not completed"))
+
+    async def _simulate_batch(self, batch_key, batch):
+        """Simulate the requests of the batch as one scan.
+
+        If the scan fails, the requests are simulated individually, so that
+        only the failing requests get the error.
+        """
+        loop = asyncio.get_running_loop()
+        mid, end, outputs, keys = batch_key
+        self._stats['batches'] += 1
+        points = np.array([values for _, values, _ in batch]).reshape(
+            len(batch), len(keys))
+        try:
+            results = await loop.run_in_executor(
+                self._executor, self._run, mid, keys, outputs, end, points)
+        except Exception as err:
+            if len(batch) > 1:
+                for item in batch:
+                    await self._simulate_batch(batch_key, [item])
+                return
+            self._stats['errors'] += 1
+            if isinstance(err, RuntimeError):
+                # integration failures are errors of the request
+                err = ServiceError(str(err))
+            else:
+                logger.exception("Simulation failed")
+            self._done(batch[0], exception=err)
+            return
+        self._stats['simulations'] += len(batch)
+        for item, result in zip(batch, results):
+            self._done(item, result=result)
+
+    def _done(self, item, result=None, exception=None):
+        key, _, future = item
+        self._inflight.pop(key, None)
+        if future.done():
+            return
+        if exception is not None:
+            future.set_exception(exception)
+            return
+        self._cache[key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        future.set_result(result)
+
+    def _run(self, mid, keys, outputs, end, points) -> np.ndarray:
+        from pyexsimo.adaptive import steady_state_evaluator
+
+        evaluate = steady_state_evaluator(self.models[mid], list(keys),
+                                          list(outputs), end=end,
+                                          pool=self.pool)
+        return evaluate(points)
+
+    async def handle(self, reader, writer):
+        """HTTP/1.1 connection, requests are handled until the client closes
+        the connection."""
+        try:
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                status, content = await self._dispatch(method, target, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                _write_response(writer, status, content, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except RequestError as err:
+            # the rest of the stream cannot be parsed, connection is closed
+            try:
+                _write_response(writer, err.status, {'error': str(err)},
+                                keep_alive=False)
+                await writer.drain()
+            except ConnectionError:
+                pass
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method: str, target: str, body: bytes):
+        if target == "/simulate":
+            if method != "POST":
+                return 405, {'error': "Use POST"}
+            try:
+                return 200, await self.simulate(json.loads(body.decode("utf-8")))
+            except (ServiceError, ValueError) as err:
+                return 400, {'error': str(err)}
+            except Exception as err:
+                logger.exception("Simulation failed")
+                return 500, {'error': str(err)}
+        elif target == "/stats":
+            return 200, self.stats()
+        elif target == "/health":
+            return 200, {'status': "ok", 'models': sorted(self.models)}
+        return 404, {'error': f"Unknown path '{target}'"}
+
+    async def start(self, host: str = HOST, port: int = PORT,
+                    path: Path = None):
+        """Start server on TCP port or Unix socket path."""
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle, path=str(path))
+            logger.info(f"Simulation service on '{path}'")
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+            logger.info(f"Simulation service on http://{host}:{port}")
+        return server
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+def _response(outputs, values, end, cached: bool) -> Dict:
+    return {'outputs': {sid: float(v) for sid, v in zip(outputs, values)},
+            'end': end, 'cached': cached}
+
+
+async def _read_request(reader):
+    """Method, target, headers and body of HTTP request, None at EOF."""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise RequestError(400, "Invalid request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise RequestError(400, "Invalid Content-Length: "
+                                f"'{headers['content-length']}'")
+    if length > MAX_BODY:
+        raise RequestError(413, f"Request body too large, maximal size "
+                                f"is {MAX_BODY} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target, headers, body
+
+
+def _write_response(writer, status: int, content: Dict, keep_alive: bool):
+    body = json.dumps(content).encode("utf-8")
+    head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode("latin-1") + body)
+
+
+def serve(host: str = HOST, port: int = PORT, path: Path = None, **kwargs):
+    """Run the simulation service until interrupted.
+
+    :param path: Unix socket path, TCP port if None
+    :param kwargs: arguments of SimulationService
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    service = SimulationService(**kwargs)
+    service.warm()
+    server = loop.run_until_complete(service.start(host, port, path))
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+        service.close()
+        loop.close()
+
+
+async def _connect(host: str, port: int, path: Path = None):
+    if path is not None:
+        return await asyncio.open_unix_connection(str(path))
+    return await asyncio.open_connection(host, port)
+
+
+async def _http(reader, writer, method: str, target: str,
+                payload: Dict = None):
+    """Request on open connection, returns (status, content)."""
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    writer.write((f"{method} {target} HTTP/1.1\r\n"
+                  f"Host: pyexsimo\r\n"
+                  f"Content-Type: application/json\r\n"
+                  f"Content-Length: {len(body)}\r\n\r\n").encode("latin-1")
+                 + body)
+    await writer.drain()
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Connection closed by service")
+    status = int(status_line.split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    content = await reader.readexactly(length)
+    return status, json.loads(content.decode("utf-8"))
+
+
+async def request(payload: Dict = None, host: str = HOST, port: int = PORT,
+                  path: Path = None, target: str = "/simulate"):
+    """Single request to the service, returns (status, content).
+
+    :param payload: simulation request, GET of target if None
+    """
+    reader, writer = await _connect(host, port, path)
+    try:
+        method = "GET" if payload is None else "POST"
+        return await _http(reader, writer, method, target, payload)
+    finally:
+        writer.close()
+
+
+def query(payload: Dict, host: str = HOST, port: int = PORT,
+          path: Path = None) -> Dict:
+    """Outputs of simulation request to a running service."""
+    loop = asyncio.new_event_loop()
+    try:
+        status, content = loop.run_until_complete(
+            request(payload, host=host, port=port, path=path))
+    finally:
+        loop.close()
+    if status != 200:
+        raise ServiceError(content.get('error', status))
+    return content
+
+
+def random_payloads(n: int, model: str = 'liver_glucose_const_glyglc',
+                    end: float = 120, seed: int = 0) -> List[Dict]:
+    """Requests on a 1 mM x 25 mM grid of glucose and glycogen, i.e.
+    repeated points for large n."""
+    rng = np.random.RandomState(seed)
+    glc_ext = rng.randint(2, 15, size=n)
+    glyglc = 25 * rng.randint(0, 21, size=n)
+    return [{'model': model, 'end': end,
+             'changes': {'[glc_ext]': float(g), '[glyglc]': float(y)}}
+            for g, y in zip(glc_ext, glyglc)]
+
+
+async def load(payloads: List[Dict], n: int = None, concurrency: int = 8,
+               host: str = HOST, port: int = PORT, path: Path = None) -> Dict:
+    """Load generator with concurrent keep-alive connections.
+
+    :param payloads: requests, sent cyclically
+    :param n: number of requests, len(payloads) if None
+    :return: latencies [ms] (p50, p99, mean, max), throughput [1/s]
+    """
+    n = len(payloads) if n is None else n
+    latencies = []
+    errors = []
+    counter = iter(range(n))
+
+    async def worker():
+        reader, writer = await _connect(host, port, path)
+        try:
+            for k in counter:
+                t = time.perf_counter()
+                status, content = await _http(reader, writer, "POST",
+                                              "/simulate",
+                                              payloads[k % len(payloads)])
+                latencies.append(time.perf_counter() - t)
+                if status != 200:
+                    errors.append(content)
+        finally:
+            writer.close()
+
+    t_start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - t_start
+    ms = 1000 * np.array(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'concurrency': concurrency,
+        'time': elapsed,
+        'throughput': len(latencies) / elapsed,
+        'p50': float(np.percentile(ms, 50)),
+        'p99': float(np.percentile(ms, 99)),
+        'mean': float(ms.mean()),
+        'max': float(ms.max()),
+    }
+
+
+def load_test(payloads: List[Dict], **kwargs) -> Dict:
+    """Load test of a running service, see load."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(load(payloads, **kwargs))
+    finally:
+        loop.close()
@@ -0,0 +1,420 @@
+"""
+Surrogate models of scan outputs.
+
+Whole-body models query the hepatic HGP, GNG and GLY for arbitrary
+(glc_ext, glyglc) thousands of times per second, far too often for ODE
+simulations. Surrogates are trained on the outputs of scans (steady state or
+time point of timecourses) and answer vectorized queries:
+
+* 'grid': multilinear interpolation on the grid of a factorial scan
+* 'rbf': thin plate spline radial basis functions of scattered points
+* 'pce': polynomial chaos expansion, i.e. least squares fit of Legendre
+  polynomials of total degree
+
+The inputs are scaled to the unit cube of the training points. The errors
+against held-out simulations are stored with the surrogate in a compact
+npz file.
+
+    surrogate = fit_surrogate(result, outputs=['HGP', 'GNG', 'GLY'])
+    surrogate.validate(points, values)
+    surrogate.save("pathway_surrogate.npz")
+    surrogate = load_surrogate("pathway_surrogate.npz")
+    hgp = surrogate({'[glc_ext]': glc, '[glyglc]': gly})['HGP']
+"""
+import abc
+import json
+import logging
+from itertools import product
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+OUTPUTS = ['HGP', 'GNG', 'GLY']
+METHODS = ['grid', 'rbf', 'pce']
+
+# queries are evaluated in chunks to limit the memory of rbf distances
+CHUNK_SIZE = 4096
+
+
+class Surrogate(abc.ABC):
+    """Surrogate of outputs as function of the scan keys."""
+
+    method = None
+
+    def __init__(self, keys: List[str], outputs: List[str], lower, scale,
+                 validation: Dict = None):
+        self.keys = list(keys)
+        self.outputs = list(outputs)
+        self.lower = np.asarray(lower, dtype=float)
+        self.scale = np.asarray(scale, dtype=float)
+        self.validation = validation or {}
+
+    @abc.abstractmethod
+    def _arrays(self) -> Dict[str, np.ndarray]:
+        """Arrays of the fitted surrogate."""
+
+    @classmethod
+    @abc.abstractmethod
+    def _from_arrays(cls, meta: Dict, npz) -> 'Surrogate':
+        """Surrogate of the stored meta data and arrays."""
+
+    @abc.abstractmethod
+    def _predict(self, u: np.ndarray) -> np.ndarray:
+        """Outputs (n, len(outputs)) of points u in the unit cube."""
+
+    def predict(self, points) -> np.ndarray:
+        """Outputs of the points.
+
+        :param points: array (n, len(keys))
+        :return: array (n, len(outputs))
+        """
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        u = (points - self.lower) / self.scale
+        if len(u) <= CHUNK_SIZE:
+            return self._predict(u)
+        return np.concatenate([self._predict(u[k:k + CHUNK_SIZE])
+                               for k in range(0, len(u), CHUNK_SIZE)])
+
+    def __call__(self, inputs: Dict) -> Dict[str, np.ndarray]:
+        """Outputs of the inputs.
+
+        :param inputs: dictionary of key and values, the values are
+            broadcast, e.g. meshgrids
+        :return: dictionary of output and values of the broadcast shape
+        """
+        arrays = np.broadcast_arrays(*[np.asarray(inputs[key], dtype=float)
+                                       for key in self.keys])
+        shape = arrays[0].shape
+        y = self.predict(np.column_stack([a.ravel() for a in arrays]))
+        return {sid: y[:, k].reshape(shape)
+                for k, sid in enumerate(self.outputs)}
+
+    def validate(self, points, values) -> Dict[str, Dict[str, float]]:
+        """Errors of the surrogate against simulations.
+
+        The errors are stored with the surrogate.
+
+        :param points: inputs of held-out simulations (n, len(keys))
+        :param values: outputs of the simulations (n, len(outputs))
+        :return: dictionary of output and errors (RMSE, maximal absolute
+            error, both relative to the range of the output)
+        """
+        values = np.asarray(values, dtype=float)
+        error = self.predict(points) - values
+        self.validation = {'n': len(values)}
+        for k, sid in enumerate(self.outputs):
+            value_range = np.ptp(values[:, k]) or 1.0
+            rmse = float(np.sqrt(np.mean(error[:, k] ** 2)))
+            max_error = float(np.abs(error[:, k]).max())
+            self.validation[sid] = {
+                'rmse': rmse,
+                'max_error': max_error,
+                'nrmse': rmse / value_range,
+                'max_rel_error': max_error / value_range,
+            }
+        logger.info(f"Validation of {self.method} surrogate: "
+                    + ", ".join(f"{sid}: nrmse={self.validation[sid]['nrmse']:.2e}"
+                                for sid in self.outputs))
+        return self.validation
+
+    def save(self, path: Path):
+        """Store surrogate as compressed npz file."""
+        meta = {'method': self.method, 'keys': self.keys,
+                'outputs': self.outputs, 'validation': self.validation}
+        with open(str(path), "wb") as f:
+            np.savez_compressed(f, meta=np.array(json.dumps(meta)),
+                                lower=self.lower, scale=self.scale,
+                                **self._arrays())
+
+
+class GridSurrogate(Surrogate):
+    """Multilinear interpolation on a rectilinear grid.
+
+    Queries outside of the grid are clipped to the grid.
+    """
+
+    method = 'grid'
+
+    def __init__(self, keys, outputs, axes: List[np.ndarray],
+                 values: np.ndarray, **kwargs):
+        """
+        :param axes: sorted values of the keys
+        :param values: outputs on the grid (len(axis_0), ..., len(outputs))
+        """
+        lower = [axis[0] for axis in axes]
+        scale = [axis[-1] - axis[0] or 1.0 for axis in axes]
+        super(GridSurrogate, self).__init__(keys, outputs, lower, scale,
+                                            **kwargs)
+        self.axes = [np.asarray(axis, dtype=float) for axis in axes]
+        self.values = np.asarray(values, dtype=float)
+        self._u_axes = [(axis - l) / s for axis, l, s
+                        in zip(self.axes, self.lower, self.scale)]
+        self._interpolator = None
+
+    def _arrays(self):
+        arrays = {'values': self.values}
+        arrays.update({f'axis_{k}': axis for k, axis in enumerate(self.axes)})
+        return arrays
+
+    @classmethod
+    def _from_arrays(cls, meta, npz):
+        axes = [npz[f'axis_{k}'] for k in range(len(meta['keys']))]
+        return cls(meta['keys'], meta['outputs'], axes, npz['values'],
+                   validation=meta['validation'])
+
+    def _predict(self, u):
+        if self._interpolator is None:
+            from scipy import interpolate
+            self._interpolator = interpolate.RegularGridInterpolator(
+                self._u_axes, self.values, method='linear')
+        u = np.column_stack([np.clip(u[:, k], axis[0], axis[-1])
+                             for k, axis in enumerate(self._u_axes)])
+        return self._interpolator(u)
+
+
+class RBFSurrogate(Surrogate):
+    """Thin plate spline interpolation with linear polynomial.
+
+    The response surface of the scan points (pyexsimo.designs) of all
+    outputs. The points and values are stored, the interpolation is fitted
+    again on loading.
+    """
+
+    method = 'rbf'
+
+    def __init__(self, keys, outputs, lower, scale, centers: np.ndarray,
+                 values: np.ndarray, smoothing: float = 0.0, **kwargs):
+        """
+        :param centers: points in the unit cube (n, len(keys))
+        :param values: outputs of the points (n, len(outputs))
+        :param smoothing: regularization of the interpolation, 0 interpolates
+            the points
+        """
+        from pyexsimo.designs import ResponseSurface
+
+        super(RBFSurrogate, self).__init__(keys, outputs, lower, scale,
+                                           **kwargs)
+        self.centers = np.asarray(centers, dtype=float)
+        self.values = np.asarray(values, dtype=float)
+        self.smoothing = float(smoothing)
+        self._surface = ResponseSurface(self.keys, self.centers, self.values,
+                                        method='rbf', smoothing=self.smoothing)
+
+    @classmethod
+    def fit(cls, keys, outputs, points, values, smoothing: float = 0.0,
+            **kwargs):
+        lower, scale = _unit_scale(points)
+        return cls(keys, outputs, lower, scale, centers=(points - lower) / scale,
+                   values=values, smoothing=smoothing, **kwargs)
+
+    def _arrays(self):
+        return {'centers': self.centers, 'values': self.values,
+                'smoothing': np.array(self.smoothing)}
+
+    @classmethod
+    def _from_arrays(cls, meta, npz):
+        return cls(meta['keys'], meta['outputs'], npz['lower'], npz['scale'],
+                   centers=npz['centers'], values=npz['values'],
+                   smoothing=float(npz['smoothing']),
+                   validation=meta['validation'])
+
+    def _predict(self, u):
+        # centers span the unit cube, the surface does not rescale
+        return self._surface(u).reshape(len(u), len(self.outputs))
+
+
+def _legendre(x: np.ndarray, degree: int) -> np.ndarray:
+    """Orthonormal Legendre polynomials on [-1, 1] (len(x), degree + 1)."""
+    L = np.ones((len(x), degree + 1))
+    if degree > 0:
+        L[:, 1] = x
+    for n in range(1, degree):
+        L[:, n + 1] = ((2 * n + 1) * x * L[:, n] - n * L[:, n - 1]) / (n + 1)
+    return L * np.sqrt(2 * np.arange(degree + 1) + 1)
+
+
+class PCESurrogate(Surrogate):
+    """Polynomial chaos expansion with Legendre polynomials of total degree.
+
+    The inputs are uniform in the unit cube, the mean and variance of the
+    outputs follow from the coefficients.
+    """
+
+    method = 'pce'
+
+    def __init__(self, keys, outputs, lower, scale, exponents: np.ndarray,
+                 coefficients: np.ndarray, **kwargs):
+        super(PCESurrogate, self).__init__(keys, outputs, lower, scale,
+                                           **kwargs)
+        self.exponents = np.asarray(exponents, dtype=int)
+        self.coefficients = np.asarray(coefficients, dtype=float)
+
+    @staticmethod
+    def _basis(u, exponents) -> np.ndarray:
+        degree = int(exponents.max())
+        x = 2 * u - 1
+        B = np.ones((len(u), len(exponents)))
+        for k in range(u.shape[1]):
+            B *= _legendre(x[:, k], degree)[:, exponents[:, k]]
+        return B
+
+    @classmethod
+    def fit(cls, keys, outputs, points, values, degree: int = 6,
+            ridge: float = 0.0, **kwargs):
+        """
+        :param degree: total degree of the polynomials
+        :param ridge: Tikhonov regularization of the coefficients
+        """
+        lower, scale = _unit_scale(points)
+        u = (points - lower) / scale
+        exponents = np.array([e for e in product(range(degree + 1),
+                                                 repeat=u.shape[1])
+                              if sum(e) <= degree])
+        if len(exponents) > len(u):
+            logger.warning(f"PCE of degree {degree}: {len(exponents)} "
+                           f"coefficients for {len(u)} points")
+        B = cls._basis(u, exponents)
+        if ridge > 0:
+            coefficients = np.linalg.solve(
+                B.T @ B + ridge * np.eye(len(exponents)), B.T @ values)
+        else:
+            coefficients = np.linalg.lstsq(B, values, rcond=None)[0]
+        return cls(keys, outputs, lower, scale, exponents=exponents,
+                   coefficients=coefficients, **kwargs)
+
+    @property
+    def mean(self) -> np.ndarray:
+        """Mean of the outputs for uniform inputs."""
+        return self.coefficients[0]
+
+    @property
+    def variance(self) -> np.ndarray:
+        """Variance of the outputs for uniform inputs."""
+        return (self.coefficients[1:] ** 2).sum(axis=0)
+
+    def _arrays(self):
+        return {'exponents': self.exponents, 'coefficients': self.coefficients}
+
+    @classmethod
+    def _from_arrays(cls, meta, npz):
+        return cls(meta['keys'], meta['outputs'], npz['lower'], npz['scale'],
+                   exponents=npz['exponents'],
+                   coefficients=npz['coefficients'],
+                   validation=meta['validation'])
+
+    def _predict(self, u):
+        return self._basis(u, self.exponents) @ self.coefficients
+
+
+SURROGATES = {cls.method: cls for cls in [GridSurrogate, RBFSurrogate,
+                                          PCESurrogate]}
+
+
+def _unit_scale(points: np.ndarray):
+    lower = points.min(axis=0)
+    upper = points.max(axis=0)
+    return lower, np.where(upper > lower, upper - lower, 1.0)
+
+
+def load_surrogate(path: Path) -> Surrogate:
+    """Load surrogate from npz file."""
+    with np.load(str(path)) as npz:
+        meta = json.loads(str(npz['meta']))
+        return SURROGATES[meta['method']]._from_arrays(meta, npz)
+
+
+def scan_outputs(result, outputs: List[str], time_index: int = -1):
+    """Points and outputs of a scan result.
+
+    :return: (points (n, len(keys)), values (n, len(outputs)))
+    """
+    from pyexsimo.designs import scan_points
+
+    columns = list(result.columns)
+    points = scan_points(result).values
+    values = result.data[time_index, [columns.index(sid) for sid in outputs], :]
+    return points, values.T
+
+
+def fit_surrogate(result, outputs: List[str] = OUTPUTS, method: str = 'grid',
+                  time_index: int = -1, holdout: float = 0.0, seed: int = 0,
+                  **kwargs) -> Surrogate:
+    """Surrogate of the outputs of a scan result.
+
+    :param result: scan result, a factorial scan for 'grid'
+    :param time_index: time point of the outputs, the end of the simulations
+        (steady state) by default
+    :param holdout: fraction of the points held out for validation
+        ('rbf', 'pce')
+    :param kwargs: arguments of the fit ('smoothing' of rbf, 'degree' and
+        'ridge' of pce)
+    """
+    if method not in SURROGATES:
+        raise ValueError(f"Unknown method '{method}', methods are: {METHODS}")
+    keys = list(result.keys)
+    points, values = scan_outputs(result, outputs, time_index=time_index)
+
+    if method == 'grid':
+        if holdout:
+            raise ValueError("Grid surrogates use all points of the grid")
+        vecs = [np.array([getattr(v, 'magnitude', v) for v in vec], dtype=float)
+                for vec in result.vecs]
+        shape = tuple(len(vec) for vec in vecs)
+        if len(result.indices) != int(np.prod(shape)):
+            raise ValueError("Grid surrogates require a factorial scan")
+        grid = np.full(shape + (len(outputs),), np.nan)
+        for p, index in enumerate(result.indices):
+            grid[tuple(index)] = values[p]
+        # sorted axes
+        for k, vec in enumerate(vecs):
+            order = np.argsort(vec)
+            vecs[k] = vec[order]
+            grid = np.take(grid, order, axis=k)
+        return GridSurrogate(keys, outputs, vecs, grid)
+
+    test = np.zeros(len(points), dtype=bool)
+    if holdout:
+        rng = np.random.RandomState(seed)
+        test[rng.choice(len(points), int(round(holdout * len(points))),
+                        replace=False)] = True
+    surrogate = SURROGATES[method].fit(keys, outputs, points[~test],
+                                       values[~test], **kwargs)
+    if holdout:
+        surrogate.validate(points[test], values[test])
+    return surrogate
+
+
+def pathway_surrogate(results_path: Path, model_path: Path,
+                      method: str = 'grid', n_validation: int = 64,
+                      seed: int = 0, pool=None, **kwargs) -> Surrogate:
+    """Surrogate of HGP, GNG and GLY on the steady-state scan of the
+    PathwaySSExperiment.
+
+    Validated against steady-state simulations at Sobol points in the range
+    of the scan.
+
+    :param results_path: directory of the stored results
+    :param model_path: path of liver_glucose_const_glyglc.xml
+    """
+    from pyexsimo.adaptive import steady_state_evaluator
+    from pyexsimo.cache import load_result
+    from pyexsimo.designs import sobol
+
+    path = Path(results_path) / "PathwaySSExperiment_scan_ss_scan.npz"
+    if not path.exists():
+        raise IOError(f"Results of 'PathwaySSExperiment' not found: '{path}', "
+                      f"run the experiment first.")
+    result = load_result(path)
+    surrogate = fit_surrogate(result, outputs=OUTPUTS, method=method, **kwargs)
+
+    if n_validation:
+        lower = surrogate.lower
+        points = lower + surrogate.scale * sobol(n_validation, len(lower),
+                                                 seed=seed)
+        evaluate = steady_state_evaluator(model_path, surrogate.keys, OUTPUTS,
+                                          pool=pool)
+        surrogate.validate(points, evaluate(points))
+    return surrogate
@@ -0,0 +1,40 @@
+"""
+Shared fixtures for the tests.
+
+Tests marked 'benchmark' measure wall-clock times and only run with
+'pytest --run-benchmarks'.
+"""
+import pytest
+
+
+def pytest_addoption(parser):
+    parser.addoption("--run-benchmarks", action="store_true", default=False,
+                     help="run the wall-clock benchmarks")
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "benchmark: wall-clock benchmark (--run-benchmarks)")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--run-benchmarks"):
+        return
+    skip = pytest.mark.skip(reason="benchmark, run with --run-benchmarks")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture(scope="session")
+def result_cache(tmp_path_factory):
+    """Result cache shared by all tests of the session."""
+    from pyexsimo.cache import ResultCache
+    return ResultCache(tmp_path_factory.mktemp("cache"))
+
+
+@pytest.fixture(scope="session")
+def simulator_pool():
+    """Pool of compiled roadrunner instances of the process."""
+    from pyexsimo.pool import get_pool
+    return get_pool()
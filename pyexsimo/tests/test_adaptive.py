@@ -0,0 +1,77 @@
+"""
+Test adaptive refinement of two-dimensional scans.
+"""
+import numpy as np
+import pytest
+
+from pyexsimo import MODEL_PATH
+from pyexsimo.adaptive import adaptive_scan, steady_state_evaluator
+
+
+def _f(points):
+    """Circle with zero contour and smooth step."""
+    x, y = points[:, 0], points[:, 1]
+    return np.column_stack([np.hypot(x - 0.1, y + 0.2) - 0.6,
+                            np.tanh(5 * (x - y ** 2))])
+
+
+def _full(scan):
+    x, y = scan.axes()
+    X, Y = np.meshgrid(x, y, indexing="ij")
+    return _f(np.column_stack([X.ravel(), Y.ravel()]))
+
+
+def test_adaptive_scan():
+    scan = adaptive_scan(_f, {'x': (-1, 1), 'y': (-1, 1)}, outputs=['a', 'b'],
+                         base=4, levels=4)
+    x, y, grids = scan.grid()
+    assert scan.n_cells == 64
+    assert grids['a'].shape == (len(x), len(y)) == (65, 65)
+
+    # same zero contours as the full grid with fewer points
+    full = _full(scan)
+    assert len(scan) < 0.5 * len(full)
+    for k, sid in enumerate(scan.outputs):
+        assert np.array_equal(np.sign(grids[sid].ravel()), np.sign(full[:, k]))
+        assert np.abs(grids[sid].ravel() - full[:, k]).max() < 0.03
+
+    np.testing.assert_allclose(scan.values, _f(scan.points))
+    df = scan.to_df()
+    assert list(df.columns) == ['x', 'y', 'a', 'b']
+    assert len(df) == len(scan)
+
+
+def test_adaptive_scan_budget():
+    scan = adaptive_scan(_f, {'x': (-1, 1), 'y': (-1, 1)}, budget=200)
+    assert 25 < len(scan) <= 200
+    assert scan.outputs == ['y0', 'y1']
+    # no refinement of smooth linear function
+    scan = adaptive_scan(lambda p: p, {'x': (1, 2), 'y': (1, 2)}, base=2)
+    assert len(scan) == 5 * 5  # first refinement of the coarse cells
+
+
+def test_adaptive_scan_dimension():
+    with pytest.raises(ValueError):
+        adaptive_scan(_f, {'x': (0, 1)})
+
+
+def test_liver_adaptive_scan(simulator_pool):
+    sbml_path = MODEL_PATH / "liver_glucose_const_glyglc.xml"
+    keys = ['[glc_ext]', '[glyglc]']
+    outputs = ['HGP', 'GNG', 'GLY']
+    evaluate = steady_state_evaluator(sbml_path, keys, outputs,
+                                      pool=simulator_pool)
+    scan = adaptive_scan(evaluate, {'[glc_ext]': (2, 14), '[glyglc]': (0, 500)},
+                         outputs=outputs, base=2, levels=3)
+    x, y, grids = scan.grid()
+    assert len(scan) < len(x) * len(y)
+
+    # switch from glucose production to utilization
+    assert grids['HGP'][0, -1] > 0 > grids['HGP'][-1, -1]
+    with simulator_pool.simulator(sbml_path) as r:
+        r['[glc_ext]'] = 8.0
+        r['[glyglc]'] = 250
+        r.simulate(0, 1000, 2)
+        hgp = r['HGP']
+    k = scan.lattice.tolist().index([8, 8])
+    assert scan.values[k, 0] == pytest.approx(hgp, rel=1E-4)
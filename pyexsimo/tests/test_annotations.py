@@ -4,31 +4,31 @@ Check annotations of the model objects.
 import pytest
 import libsbml
 
-from pyexsimo.tests.utils import DOC, MODEL, species_ids, reaction_ids
+from pyexsimo.tests.utils import get_doc, get_model, species_ids, reaction_ids
 
 
 def test_document_has_sbo():
-    assert DOC.isSetSBOTerm()
-    assert DOC.getSBOTerm() == 293
+    assert get_doc().isSetSBOTerm()
+    assert get_doc().getSBOTerm() == 293
 
 
 @pytest.mark.parametrize("sid", species_ids())
 def test_specie_has_sbo(sid):
-    assert MODEL.getSpecies(sid).isSetSBOTerm()
+    assert get_model().getSpecies(sid).isSetSBOTerm()
 
 
 @pytest.mark.parametrize("sid", reaction_ids())
 def test_reaction_has_sbo(sid):
-    assert MODEL.getReaction(sid).isSetSBOTerm()
+    assert get_model().getReaction(sid).isSetSBOTerm()
 
 
 def test_model_has_cvterms():
-    assert MODEL.getNumCVTerms() > 0
+    assert get_model().getNumCVTerms() > 0
 
 
 @pytest.mark.parametrize("sid", species_ids())
 def test_specie_has_cvterms(sid):
-    assert MODEL.getSpecies(sid).getNumCVTerms() > 0
+    assert get_model().getSpecies(sid).getNumCVTerms() > 0
 
 
 @pytest.mark.parametrize("sid", reaction_ids())
@@ -37,7 +37,7 @@ def test_reaction_has_cvterms(sid):
         # pseudo-reactions do not need cvterms
         pass
     else:
-        assert MODEL.getReaction(sid).getNumCVTerms() > 0
+        assert get_model().getReaction(sid).getNumCVTerms() > 0
 
 
 def _check_annotation(sbase: libsbml.SBase, resource: str):
@@ -55,50 +55,50 @@ def _check_annotation(sbase: libsbml.SBase, resource: str):
 
 @pytest.mark.parametrize("sid", species_ids())
 def test_specie_has_chebi(sid):
-    _check_annotation(MODEL.getSpecies(sid), "chebi")
+    _check_annotation(get_model().getSpecies(sid), "chebi")
 
 
 @pytest.mark.parametrize("sid", species_ids())
 def test_specie_has_inchikey(sid):
     if sid not in ["glyglc"]:
-        _check_annotation(MODEL.getSpecies(sid), "inchikey")
+        _check_annotation(get_model().getSpecies(sid), "inchikey")
 
 
 @pytest.mark.parametrize("sid", species_ids())
 def test_specie_has_kegg_compound(sid):
-    _check_annotation(MODEL.getSpecies(sid), "kegg.compound")
+    _check_annotation(get_model().getSpecies(sid), "kegg.compound")
 
 
 @pytest.mark.parametrize("sid", reaction_ids())
 def test_reaction_has_uniprot(sid):
     if sid not in ["NDKGTP", "NDKUTP", "AK", "PYRTM", "PEPTM", "NDKGTPM", "OAAFLX", "ACOAFLX", "CITFLX"]:
         # many isoforms, transporters, pseudoreactions not annotated
-        _check_annotation(MODEL.getReaction(sid), "uniprot")
+        _check_annotation(get_model().getReaction(sid), "uniprot")
 
 
 @pytest.mark.parametrize("sid", reaction_ids())
 def test_reaction_has_go(sid):
     if sid not in ["OAAFLX", "ACOAFLX", "CITFLX"]:
         # pseudoreactions not annotated
-        _check_annotation(MODEL.getReaction(sid), "go")
+        _check_annotation(get_model().getReaction(sid), "go")
 
 
 @pytest.mark.parametrize("sid", reaction_ids())
 def test_reaction_has_ec(sid):
     if sid not in ["GLUT2", "LACT", "PYRTM", "PEPTM", "OAAFLX", "ACOAFLX", "CITFLX"]:
         # transporters, pseudoreactions not annotated
-        _check_annotation(MODEL.getReaction(sid), "ec-code")
+        _check_annotation(get_model().getReaction(sid), "ec-code")
 
 
 @pytest.mark.parametrize("sid", reaction_ids())
 def test_reaction_has_rhea(sid):
     if sid not in ["GLUT2", "LACT", "PYRTM", "PEPTM", "OAAFLX", "ACOAFLX", "CITFLX"]:
         # transporters, pseudoreactions not annotated
-        _check_annotation(MODEL.getReaction(sid), "rhea")
+        _check_annotation(get_model().getReaction(sid), "rhea")
 
 
 @pytest.mark.parametrize("sid", reaction_ids())
 def test_reaction_has_pr(sid):
     if sid not in ["NDKGTP", "NDKUTP", "AK", "PYRTM", "PEPTM", "NDKGTPM", "OAAFLX", "ACOAFLX", "CITFLX"]:
         # many isoforms, transporters, pseudoreactions not annotated
-        _check_annotation(MODEL.getReaction(sid), "pr/PR:")
+        _check_annotation(get_model().getReaction(sid), "pr/PR:")
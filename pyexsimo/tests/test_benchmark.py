@@ -0,0 +1,17 @@
+"""
+Test the import time budget of the lightweight modules.
+"""
+import pytest
+
+from pyexsimo.benchmark import import_time, LIGHT_MODULES, IMPORT_BUDGET
+
+
+@pytest.mark.parametrize("module", LIGHT_MODULES)
+def test_no_heavy_imports(module):
+    assert import_time(module, repeats=1)['heavy'] == []
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("module", LIGHT_MODULES)
+def test_import_budget(module):
+    assert import_time(module)['time'] < IMPORT_BUDGET
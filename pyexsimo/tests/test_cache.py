@@ -0,0 +1,151 @@
+"""
+Test the simulation result cache.
+"""
+import time
+import pytest
+import numpy as np
+import pandas as pd
+
+from sbmlsim.result import Result
+from sbmlsim.timecourse import Timecourse, TimecourseSim, TimecourseScan
+from sbmlsim.units import Units
+
+from pyexsimo import MODEL_PATH
+from pyexsimo.cache import ResultCache, simulation_key, analysis_key
+
+SBML_PATH = MODEL_PATH / "liver_glucose.xml"
+UDICT, UREG = Units.get_units_from_sbml(SBML_PATH)
+Q_ = UREG.Quantity
+
+
+def _scan(glyglc, glc_ext, steps=10):
+    return TimecourseScan(
+        tcsim=TimecourseSim([
+            Timecourse(start=0, end=100, steps=steps, changes={
+                '[glyglc]': glyglc
+            })
+        ]),
+        scan={'[glc_ext]': glc_ext},
+    )
+
+
+def _key(scan, **settings):
+    return simulation_key(SBML_PATH, scan, udict=UDICT,
+                          integrator_settings=settings)
+
+
+def test_key_identical():
+    scan = _scan(Q_(500, 'mM'), Q_(np.linspace(3, 5, num=3), 'mM'))
+    assert _key(scan) == _key(scan)
+
+
+def test_key_units_normalized():
+    scan1 = _scan(Q_(500, 'mM'), Q_(np.linspace(3, 5, num=3), 'mM'))
+    scan2 = _scan(Q_(0.5, 'M'), Q_(np.linspace(3000, 5000, num=3), 'µM'))
+    assert _key(scan1) == _key(scan2)
+
+
+def test_key_changes():
+    scan = _scan(Q_(500, 'mM'), Q_(np.linspace(3, 5, num=3), 'mM'))
+    assert _key(scan) != _key(
+        _scan(Q_(400, 'mM'), Q_(np.linspace(3, 5, num=3), 'mM')))
+    assert _key(scan) != _key(
+        _scan(Q_(500, 'mM'), Q_(np.linspace(3, 6, num=3), 'mM')))
+    assert _key(scan) != _key(
+        _scan(Q_(500, 'mM'), Q_(np.linspace(3, 5, num=3), 'mM'), steps=20))
+    assert _key(scan) != _key(scan, relative_tolerance=1E-6)
+
+
+def _result(n=3):
+    frames = [pd.DataFrame({'time': np.linspace(0, 10, 11),
+                            '[glc]': np.random.rand(11)}) for _ in range(n)]
+    result = Result(frames, udict=UDICT, ureg=UREG)
+    result.keys = ['[glc_ext]']
+    result.vecs = [list(Q_(np.linspace(3, 5, num=n), 'mM'))]
+    result.indices = [(k,) for k in range(n)]
+    return result
+
+
+def test_cache_roundtrip(tmp_path):
+    cache = ResultCache(tmp_path)
+    result = _result()
+    assert cache.get("key", udict=UDICT, ureg=UREG) is None
+    cache.put("key", result)
+    result2 = cache.get("key", udict=UDICT, ureg=UREG)
+
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+    assert np.allclose(result.data, result2.data)
+    assert list(result.columns) == list(result2.columns)
+    assert result2.keys == result.keys
+    assert result2.indices == result.indices
+    assert result2.vecs[0][1] == Q_(4, 'mM')
+
+
+def test_cache_table(tmp_path):
+    cache = ResultCache(tmp_path)
+    table = pd.DataFrame({'flux': ["GLUT2", "GK"],
+                          'value': np.random.rand(2)})
+    keys = [_key(_scan(Q_(500, 'mM'), Q_(np.linspace(3, 5, num=3), 'mM')))]
+    key = analysis_key(SBML_PATH, "Experiment.control", keys,
+                       source="source")
+    assert cache.get_table(key) is None
+    cache.put_table(key, table)
+    pd.testing.assert_frame_equal(cache.get_table(key), table)
+    assert cache.stats()['entries'] == 1
+
+    # tables are evicted as results
+    cache.max_bytes = 0
+    cache.put("key", _result())
+    assert cache.get_table(key) is None
+    # changed simulations, analysis or source
+    assert key != analysis_key(SBML_PATH, "Experiment.control", [],
+                               source="source")
+    assert key != analysis_key(SBML_PATH, "Experiment.flux", keys,
+                               source="source")
+    assert key != analysis_key(SBML_PATH, "Experiment.control", keys,
+                               source="changed")
+
+
+def test_cache_lru(tmp_path):
+    cache = ResultCache(tmp_path)
+    cache.put("key1", _result())
+    size = cache.size
+    cache.max_bytes = int(2.5 * size)
+    time.sleep(0.01)
+    cache.put("key2", _result())
+    time.sleep(0.01)
+    cache.get("key1")
+    time.sleep(0.01)
+    cache.put("key3", _result())
+
+    assert "key1" in cache
+    assert "key2" not in cache
+    assert "key3" in cache
+
+
+def test_cache_stats_parallel(tmp_path):
+    from pyexsimo.execute import run_experiments
+
+    cache = ResultCache(tmp_path / "cache")
+    for k in range(2):
+        run_experiments(output_path=tmp_path, cache=cache, jobs=2,
+                        exp_ids=["DoseResponseExperiment"], figures=False)
+    assert cache.misses > 0
+    assert cache.hits == cache.misses
+
+
+def test_cache_evict_removed(tmp_path, monkeypatch):
+    cache = ResultCache(tmp_path)
+    cache.put("key1", _result())
+    cache.put("key2", _result())
+    cache.max_bytes = 0
+    entries = cache.entries()
+    # entries removed by another process
+    for path in entries:
+        path.unlink()
+    monkeypatch.setattr(cache, "_stats", lambda: [
+        (path, type("Stat", (), {'st_size': 1, 'st_mtime': 0})())
+        for path in entries])
+    cache.evict()
+    assert "key1" not in cache
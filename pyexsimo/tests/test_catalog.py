@@ -0,0 +1,117 @@
+"""
+Test the data catalog.
+"""
+import json
+import shutil
+
+import pytest
+import pandas as pd
+
+from pyexsimo import DATA_PATH
+from pyexsimo.catalog import DataCatalog
+
+TABLE_IDS = [
+    "DoseResponse_TabEpinephrine",
+    "DoseResponse_TabGlucagon",
+    "DoseResponse_TabInsulin",
+    "Glycogen_TabMagnusson1992",
+    "Glycogen_TabRadziuk2001",
+    "Glycogen_TabRothman1991",
+    "Glycogen_TabTaylor1996",
+    "Nuttal2008_TabA",
+]
+
+
+def _read_tsv(data_path, table_id):
+    study = table_id.split("_")[0]
+    return pd.read_csv(data_path / study / f".{table_id}.tsv", sep="\t",
+                       comment="#")
+
+
+@pytest.fixture(scope="module")
+def catalog(tmp_path_factory):
+    db_path = tmp_path_factory.mktemp("catalog") / "data.sqlite"
+    return DataCatalog(DATA_PATH, db_path=db_path)
+
+
+def test_tables(catalog):
+    assert catalog.tables() == TABLE_IDS
+    assert catalog.tables(study="Nuttal2008") == ["Nuttal2008_TabA"]
+    assert catalog.studies() == {"DoseResponse": {}, "Glycogen": {},
+                                 "Nuttal2008": {}}
+
+
+@pytest.mark.parametrize("table_id", TABLE_IDS)
+def test_query(catalog, table_id):
+    df = _read_tsv(DATA_PATH, table_id)
+    pd.testing.assert_frame_equal(catalog.query(table_id), df)
+
+    df_normal = df[df.condition == "normal"].reset_index(drop=True)
+    pd.testing.assert_frame_equal(
+        catalog.query(table_id, condition="normal"), df_normal)
+
+
+def test_query_lists(catalog):
+    df = _read_tsv(DATA_PATH, "DoseResponse_TabInsulin")
+    references = ["Fery1993", "Basu2009"]
+    df = df[df.reference.isin(references)].reset_index(drop=True)
+    df_query = catalog.query("DoseResponse_TabInsulin", reference=references)
+    pd.testing.assert_frame_equal(df_query, df)
+
+    df_query = catalog.query("Glycogen_TabRothman1991", subject="P1")
+    assert set(df_query.subject) == {"P1"}
+
+
+def test_unit(catalog):
+    assert catalog.unit("Glycogen_TabRothman1991", "gly_unit") == "mM"
+    assert catalog.unit("DoseResponse_TabInsulin", "unit",
+                        condition="normal") == "pM"
+
+    # unit of the filtered rows
+    references = ["Fery1993", "Basu2009"]
+    df = _read_tsv(DATA_PATH, "DoseResponse_TabInsulin")
+    df = df[(df.condition == "normal") & df.reference.isin(references)]
+    assert catalog.unit("DoseResponse_TabInsulin", "glc_unit",
+                        condition="normal", reference=references) == \
+        df["glc_unit"].unique()[0]
+
+
+def test_invalid_query(catalog):
+    with pytest.raises(KeyError):
+        catalog.query("Unknown_TabA")
+    with pytest.raises(ValueError):
+        catalog.query("Nuttal2008_TabA", subject="P1")
+    with pytest.raises(ValueError):
+        catalog.unit("Nuttal2008_TabA", "unknown_unit")
+
+
+def test_update(tmp_path):
+    data_path = tmp_path / "data"
+    shutil.copytree(str(DATA_PATH / "Glycogen"), str(data_path / "Glycogen"))
+    db_path = tmp_path / "data.sqlite"
+
+    catalog = DataCatalog(data_path, db_path=db_path)
+    assert catalog.update() == []
+
+    # changed table and study metadata
+    tsv_path = data_path / "Glycogen" / ".Glycogen_TabTaylor1996.tsv"
+    df = _read_tsv(data_path, "Glycogen_TabTaylor1996")
+    df = df.iloc[:2]
+    df.to_csv(tsv_path, sep="\t", index=False)
+    with open(data_path / "Glycogen" / "study.json", "w") as f_json:
+        json.dump({"name": "Glycogen"}, f_json)
+    assert catalog.update() == ["Glycogen_TabTaylor1996"]
+    assert len(catalog.query("Glycogen_TabTaylor1996")) == 2
+    assert catalog.studies() == {"Glycogen": {"name": "Glycogen"}}
+
+    # sheet without TSV export is read from the workbook
+    tsv_path = data_path / "Glycogen" / ".Glycogen_TabMagnusson1992.tsv"
+    df = pd.read_csv(tsv_path, sep="\t")
+    tsv_path.unlink()
+    assert catalog.update() == ["Glycogen_TabMagnusson1992"]
+    df_xlsx = catalog.query("Glycogen_TabMagnusson1992")
+    assert list(df_xlsx.columns) == list(df.columns)
+    assert len(df_xlsx) == len(df)
+
+    # reopening an unchanged catalog ingests nothing
+    assert DataCatalog(data_path, db_path=db_path).update() == []
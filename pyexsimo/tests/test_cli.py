@@ -0,0 +1,71 @@
+"""
+Test the command line interface.
+"""
+from pathlib import Path
+
+import pytest
+
+from pyexsimo.cli import create_parser, main
+
+
+def test_parser_run():
+    args = create_parser().parse_args(
+        ["run", "-e", "GlycogenExperiment", "--jobs", "2", "--no-figures"])
+    assert args.experiments == ["GlycogenExperiment"]
+    assert args.jobs == 2
+    assert args.no_figures
+    assert not args.monitor
+
+
+def test_parser_monitor():
+    args = create_parser().parse_args(["run", "--abort-on-violation"])
+    assert args.abort_on_violation
+
+
+def test_parser_render():
+    args = create_parser().parse_args(["render", "--svgz", "--rasterize"])
+    assert args.experiments is None
+    assert args.svgz
+    assert args.rasterize
+    assert not args.force
+
+
+def test_parser_unknown_experiment():
+    with pytest.raises(SystemExit):
+        create_parser().parse_args(["run", "-e", "UnknownExperiment"])
+
+
+def test_run_and_report(tmp_path, result_cache):
+    main(["run", "-e", "DoseResponseExperiment", "-o", str(tmp_path),
+          "--cache", str(result_cache.cache_path)])
+    assert (tmp_path / "DoseResponseExperiment_fig1.svg").exists()
+    assert (tmp_path / "sbmlsim" / "DoseResponseExperiment.json").exists()
+
+    main(["report", "-e", "DoseResponseExperiment", "-o", str(tmp_path)])
+    assert (tmp_path / "DoseResponseExperiment.md").exists()
+    assert (tmp_path / "index.md").exists()
+
+
+def test_parser_reference():
+    args = create_parser().parse_args(["reference", "--check", "--rtol", "1E-4"])
+    assert args.check
+    assert args.rtol == 1E-4
+    assert not args.no_cache
+
+
+def test_parser_surrogate():
+    args = create_parser().parse_args(["surrogate", "--method", "rbf"])
+    assert args.method == "rbf"
+    assert args.validation == 64
+    assert args.path is None
+    with pytest.raises(SystemExit):
+        create_parser().parse_args(["surrogate", "--method", "kriging"])
+
+
+def test_parser_service():
+    args = create_parser().parse_args(["serve", "--unix", "/tmp/exsimo.sock",
+                                       "--workers", "4"])
+    assert args.unix == Path("/tmp/exsimo.sock")
+    assert args.workers == 4
+    args = create_parser().parse_args(["loadgen", "-n", "100", "-c", "4"])
+    assert (args.requests, args.concurrency, args.port) == (100, 4, 8765)
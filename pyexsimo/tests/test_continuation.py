@@ -0,0 +1,140 @@
+"""
+Test numerical continuation of steady states.
+"""
+import numpy as np
+import pytest
+import libsbml
+
+from pyexsimo import MODEL_PATH
+from pyexsimo.continuation import (continuation, plot_branches, branch_table,
+                                   table_branches, FOLD, HOPF)
+
+
+def _sbml(species, parameters, reactions) -> str:
+    """SBML of irreversible mass action like model in compartment of
+    volume 1."""
+    doc = libsbml.SBMLDocument(3, 1)
+    model = doc.createModel()
+    c = model.createCompartment()
+    c.setId("c")
+    c.setSize(1.0)
+    c.setConstant(True)
+    for sid, value in species.items():
+        s = model.createSpecies()
+        s.setId(sid)
+        s.setCompartment("c")
+        s.setInitialConcentration(value)
+        s.setBoundaryCondition(False)
+        s.setHasOnlySubstanceUnits(False)
+        s.setConstant(False)
+    for pid, value in parameters.items():
+        p = model.createParameter()
+        p.setId(pid)
+        p.setValue(value)
+        p.setConstant(True)
+    for rid, (reactants, products, formula) in reactions.items():
+        r = model.createReaction()
+        r.setId(rid)
+        r.setReversible(False)
+        for sid, stoichiometry in reactants.items():
+            ref = r.createReactant()
+            ref.setSpecies(sid)
+            ref.setStoichiometry(stoichiometry)
+            ref.setConstant(True)
+        for sid, stoichiometry in products.items():
+            ref = r.createProduct()
+            ref.setSpecies(sid)
+            ref.setStoichiometry(stoichiometry)
+            ref.setConstant(True)
+        r.createKineticLaw().setMath(libsbml.parseL3Formula(formula))
+    return libsbml.writeSBMLToString(doc)
+
+
+def test_folds(simulator_pool):
+    """Bistable switch dx/dt = p + x^2/(1 + x^2) - k x."""
+    sbml = _sbml({'x': 0}, {'p': 0, 'k': 0.55}, {
+        'v1': ({}, {'x': 1}, "p + x^2/(1 + x^2)"),
+        'v2': ({'x': 1}, {}, "k * x"),
+    })
+    branch = continuation(sbml, 'p', 0, 0.2, outputs=[], pool=simulator_pool)
+    df = branch.df
+    assert df['p'].iloc[-1] >= 0.2
+    assert [b['type'] for b in branch.bifurcations] == [FOLD, FOLD]
+
+    # folds of p(x) = k x - x^2/(1 + x^2)
+    x = np.linspace(0, 2, 200001)
+    p = 0.55 * x - x ** 2 / (1 + x ** 2)
+    k = np.flatnonzero(np.diff(np.sign(np.diff(p)))) + 1
+    for bifurcation, (x_fold, p_fold) in zip(branch.bifurcations,
+                                             zip(x[k], p[k])):
+        assert bifurcation['p'] == pytest.approx(p_fold, rel=1E-4)
+        assert bifurcation['[x]'] == pytest.approx(x_fold, rel=1E-3)
+
+    # middle branch between the folds is unstable
+    middle = df.iloc[branch.bifurcations[0]['index']:
+                     branch.bifurcations[1]['index']]
+    assert not middle.stable.any()
+    assert df.stable.iloc[0] and df.stable.iloc[-1]
+
+
+def test_branch_table(simulator_pool, tmp_path):
+    import pandas as pd
+
+    sbml = _sbml({'x': 0}, {'p': 0, 'k': 0.55}, {
+        'v1': ({}, {'x': 1}, "p + x^2/(1 + x^2)"),
+        'v2': ({'x': 1}, {}, "k * x"),
+    })
+    branch = continuation(sbml, 'p', 0, 0.2, outputs=['v2'],
+                          pool=simulator_pool)
+    path = tmp_path / "branches.tsv"
+    branch_table({'k 0.55': branch}).to_csv(path, sep="\t", index=False)
+    branches = table_branches(pd.read_csv(path, sep="\t",
+                                          float_precision="round_trip"))
+
+    branch2 = branches['k 0.55']
+    assert branch2.parameter == 'p'
+    assert branch2.species_ids == ['x']
+    assert branch2.outputs == ['v2']
+    pd.testing.assert_frame_equal(branch2.df, branch.df)
+    assert [b['type'] for b in branch2.bifurcations] == [FOLD, FOLD]
+    assert branch2.bifurcations[1]['index'] == branch.bifurcations[1]['index']
+    assert branch2.bifurcations[0]['p'] == branch.bifurcations[0]['p']
+
+
+def test_hopf(simulator_pool):
+    """Brusselator with Hopf point at b = 1 + a^2."""
+    sbml = _sbml({'x': 1, 'y': 1}, {'a': 1, 'b': 1}, {
+        'R1': ({}, {'x': 1}, "a"),
+        'R2': ({'x': 1}, {'y': 1}, "b * x"),
+        'R3': ({'x': 2, 'y': 1}, {'x': 3}, "x^2 * y"),
+        'R4': ({'x': 1}, {}, "x"),
+    })
+    branch = continuation(sbml, 'b', 1, 3, outputs=[], pool=simulator_pool)
+    assert [b['type'] for b in branch.bifurcations] == [HOPF]
+    assert branch.bifurcations[0]['b'] == pytest.approx(2.0, rel=1E-6)
+    df = branch.df
+    np.testing.assert_allclose(df['[y]'], df['b'], rtol=1E-6)
+
+
+def test_liver_branch(simulator_pool):
+    sbml_path = MODEL_PATH / "liver_glucose_const_glyglc.xml"
+    branch = continuation(sbml_path, '[glc_ext]', 2, 14,
+                          changes={'[glyglc]': 250}, pool=simulator_pool)
+    df = branch.df
+    assert df['[glc_ext]'].iloc[0] == 2
+    assert df['[glc_ext]'].iloc[-1] >= 14
+    assert df.stable.all()
+    # switch from glucose production to utilization
+    assert df.HGP.iloc[0] > 0 > df.HGP.iloc[-1]
+
+    with simulator_pool.simulator(sbml_path) as r:
+        r['[glyglc]'] = 250
+        r['[glc_ext]'] = 8.0
+        r.simulate(0, 1000, 2)
+        hgp = r['HGP']
+    assert np.interp(8.0, df['[glc_ext]'], df.HGP) == pytest.approx(hgp, rel=1E-3)
+
+    from matplotlib import pyplot as plt
+    f = plot_branches({'glycogen 250 mM': branch})
+    assert len(f.axes) == 3
+    plt.close(f)
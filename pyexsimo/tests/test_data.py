@@ -26,3 +26,63 @@ def test_datafile_exists(data_path):
 def test_datafile_parsable(data_path):
     df = pd.read_csv(data_path, skiprows=1, sep="\t")
     assert not df.empty
+
+
+@pytest.fixture
+def study_copy(tmp_path):
+    import shutil
+    shutil.copytree(str(DATA_PATH / "Glycogen"), str(tmp_path / "Glycogen"))
+    return tmp_path
+
+
+def test_build_data_unchanged(study_copy):
+    from pyexsimo.data import build_data
+
+    status = build_data(study_copy)
+    assert set(status["Glycogen"].values()) == {"unchanged"}
+    assert (study_copy / "Glycogen" / ".build.json").exists()
+
+
+def test_build_data_changed_sheet(study_copy):
+    import openpyxl
+    from pyexsimo.data import build_data
+
+    xlsx_path = study_copy / "Glycogen" / "Glycogen.xlsx"
+    workbook = openpyxl.load_workbook(str(xlsx_path))
+    workbook["TabTaylor1996"]["F3"] = 200.0
+    workbook.save(str(xlsx_path))
+
+    status = build_data(study_copy)
+    assert status["Glycogen"]["TabTaylor1996"] == "written"
+    assert status["Glycogen"]["TabRothman1991"] == "unchanged"
+    df = pd.read_csv(study_copy / "Glycogen" / ".Glycogen_TabTaylor1996.tsv",
+                     sep="\t")
+    assert df["gly"][0] == 200.0
+
+
+def test_build_data_invalid_schema(study_copy):
+    import openpyxl
+    from pyexsimo.data import build_data
+
+    xlsx_path = study_copy / "Glycogen" / "Glycogen.xlsx"
+    workbook = openpyxl.load_workbook(str(xlsx_path))
+    workbook["TabTaylor1996"]["H3"] = None
+    workbook.save(str(xlsx_path))
+
+    with pytest.raises(ValueError):
+        build_data(study_copy)
+
+
+def test_validate_sheet():
+    from pyexsimo.data import validate_sheet
+
+    df = pd.DataFrame({
+        "study": ["Glycogen", "Glycogen"],
+        "time": [1.0, 2.0],
+        "time_unit": ["hr", None],
+        "gly_unit": ["mM", "mM"],
+    })
+    errors = validate_sheet(df, study="Glycogen", sheet="TabA")
+    assert len(errors) == 2
+    assert validate_sheet(df.iloc[:1, :3], study="Glycogen",
+                          sheet="TabA") == []
@@ -0,0 +1,142 @@
+"""
+Test space-filling and sparse-grid scan designs.
+"""
+import numpy as np
+import pytest
+
+from pyexsimo import MODEL_PATH, DATA_PATH
+from pyexsimo.designs import (latin_hypercube, sobol, smolyak, smolyak_level,
+                              design_points, scan_points, ResponseSurface,
+                              response_surface, DesignScan)
+
+
+def test_latin_hypercube():
+    u = latin_hypercube(20, 3, seed=1)
+    assert u.shape == (20, 3)
+    # one point in each of the 20 intervals per dimension
+    for k in range(3):
+        assert sorted(np.floor(u[:, k] * 20).astype(int)) == list(range(20))
+
+
+def test_sobol():
+    u = sobol(64, 5, seed=1)
+    assert u.shape == (64, 5)
+    assert np.all((u >= 0) & (u < 1))
+    np.testing.assert_array_equal(u, sobol(64, 5, seed=1))
+
+
+def test_smolyak():
+    assert [len(smolyak(level, 2)) for level in range(5)] == [1, 5, 13, 29, 65]
+    assert [len(smolyak(level, 5)) for level in range(4)] == [1, 11, 61, 241]
+    u = smolyak(2, 3)
+    assert np.all((u >= 0) & (u <= 1))
+    assert len(np.unique(u, axis=0)) == len(u)
+    assert smolyak_level(240, 5) == 2
+    assert len(design_points('smolyak', 250, 5)) == 241
+    with pytest.raises(ValueError):
+        design_points('factorial', 10, 2)
+
+
+def test_design_scan_ranges():
+    scan = DesignScan.from_ranges(None, {'a': (2, 14), 'b': (0, 500)}, n=32,
+                                  design='lhs')
+    assert len(scan) == 32
+    assert scan.design == 'lhs'
+    assert np.all((scan.scan['a'] >= 2) & (scan.scan['a'] <= 14))
+    with pytest.raises(ValueError):
+        DesignScan(None, scan={'a': [1, 2], 'b': [1, 2, 3]})
+
+
+def _f(points):
+    x, y, z = points[:, 0], points[:, 1], points[:, 2]
+    return 1 + x + 0.5 * y ** 2 + x * z
+
+
+@pytest.mark.parametrize("method, design, tol", [
+    ('smolyak', 'smolyak', 1E-10),
+    ('rbf', 'sobol', 1E-2),
+    ('linear', 'sobol', 5E-2),
+])
+def test_response_surface(method, design, tol):
+    lower, upper = np.array([0, 1, -1]), np.array([1, 3, 1])
+    points = lower + (upper - lower) * design_points(design, 256, 3, seed=0)
+    surface = ResponseSurface(['x', 'y', 'z'], points, _f(points), method=method)
+    np.testing.assert_allclose(surface(points), _f(points), atol=1E-8)
+
+    test = lower + (upper - lower) * (0.1 + 0.8 * sobol(64, 3, seed=2))
+    error = np.abs(surface(test) - _f(test)).max()
+    assert error < tol * np.ptp(_f(points))
+
+    # broadcast of meshgrids
+    X, Y = np.meshgrid(np.linspace(0.2, 0.8, 5), np.linspace(1.5, 2.5, 4))
+    Z = surface({'x': X, 'y': Y, 'z': 0.0})
+    assert Z.shape == (4, 5)
+
+
+def test_smolyak_surface_points():
+    points = sobol(16, 2, seed=0)
+    with pytest.raises(ValueError):
+        ResponseSurface(['x', 'y'], points, points[:, 0], method='smolyak')
+
+
+def test_design_experiment(tmp_path, result_cache):
+    from sbmlsim.timecourse import Timecourse, TimecourseSim
+    from pyexsimo.runner import run_experiment
+    from pyexsimo.experiments.hgp_gng_ss import PathwaySSExperiment
+
+    class DesignExperiment(PathwaySSExperiment):
+        """Steady states of four inputs."""
+
+        @property
+        def scans(self):
+            Q_ = self.ureg.Quantity
+            return {"design_scan": DesignScan.from_ranges(
+                TimecourseSim([Timecourse(start=0, end=1000, steps=1)]),
+                ranges={
+                    '[glc_ext]': Q_([3, 12], 'mM'),
+                    '[glyglc]': Q_([50, 450], 'mM'),
+                    'bodyweight': Q_([50, 100], 'kg'),
+                    'scale': Q_([0.8, 1.2], 'dimensionless'),
+                }, n=16, design='sobol')}
+
+        @property
+        def analyses(self):
+            return {}
+
+        @property
+        def figures(self):
+            return {}
+
+    kwargs = dict(output_path=tmp_path,
+                  model_path=MODEL_PATH / "liver_glucose_const_glyglc.xml",
+                  data_path=DATA_PATH, cache=result_cache, figures=False)
+    info = run_experiment(DesignExperiment, **kwargs)
+    exp = info['experiment']
+    result = exp._scan_results['design_scan']
+    assert result.data.shape[2] == 16
+
+    points = scan_points(result)
+    assert list(points.columns) == ['[glc_ext]', '[glyglc]', 'bodyweight',
+                                    'scale']
+    design = exp.scans['design_scan']
+    np.testing.assert_allclose(points['bodyweight'],
+                               design.scan['bodyweight'].magnitude)
+
+    # HGP of point is flux per bodyweight
+    k = 5
+    glut2 = result.frames[k].GLUT2.values[-1]
+    assert result.frames[k].HGP.values[-1] == pytest.approx(
+        -glut2 * 1000 / points['bodyweight'][k])
+
+    # cached result with the same point order
+    misses = result_cache.misses
+    info = run_experiment(DesignExperiment, **kwargs)
+    assert result_cache.misses == misses
+    cached = info['experiment']._scan_results['design_scan']
+    np.testing.assert_array_equal(scan_points(cached).values, points.values)
+    np.testing.assert_array_equal(cached.data, result.data)
+
+    surface = response_surface(cached, 'HGP')
+    np.testing.assert_allclose(surface(points.values),
+                               result.data[-1, list(result.columns).index('HGP'), :],
+                               atol=1E-8)
@@ -5,9 +5,51 @@ import pytest
 from pyexsimo.execute import execute
 
 
-def test_execute(tmp_path):
+def test_execute(tmp_path, result_cache):
     """ Execute complete workflow.
 
     Writes results in tmp_path.
     """
-    execute(output_path=tmp_path, model_output_path=tmp_path)
+    execute(output_path=tmp_path, model_output_path=tmp_path,
+            cache=result_cache)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_run_experiments_summaries(tmp_path, result_cache, jobs):
+    """ Same summaries for single and multiple jobs, parallel workers
+    create the results folder. """
+    import json
+    from pyexsimo.execute import run_experiments
+
+    output_path = tmp_path / "results"
+    summaries = run_experiments(output_path=output_path, cache=result_cache,
+                                exp_ids=["DoseResponseExperiment",
+                                         "GlycogenExperiment"],
+                                jobs=jobs, figures=False)
+    assert [s['exp_id'] for s in summaries] == ["DoseResponseExperiment",
+                                                "GlycogenExperiment"]
+    json.dumps(summaries)
+    assert (output_path / "sbmlsim").is_dir()
+
+
+def test_execute_failed_stage(tmp_path, result_cache, monkeypatch):
+    """ Report workers are shut down if a stage fails. """
+    from pyexsimo import execute as execute_module
+    from pyexsimo.model_factory import ModelReports
+
+    closed = []
+    close = ModelReports.close
+
+    def spy_close(self):
+        close(self)
+        closed.append(self._executor)
+
+    def fail(**kwargs):
+        raise RuntimeError("failed experiment")
+
+    monkeypatch.setattr(ModelReports, "close", spy_close)
+    monkeypatch.setattr(execute_module, "run_experiments", fail)
+    with pytest.raises(RuntimeError):
+        execute(output_path=tmp_path, model_output_path=tmp_path,
+                cache=result_cache)
+    assert closed == [None]
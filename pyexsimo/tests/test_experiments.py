@@ -4,9 +4,8 @@ These tests reproduce the complete analysis.
 """
 import pytest
 
-from sbmlsim.experiment import run_experiment
-
 from pyexsimo import MODEL_PATH, DATA_PATH
+from pyexsimo.runner import run_experiment
 from pyexsimo.experiments.dose_response import DoseResponseExperiment
 from pyexsimo.experiments.hgp_gng import PathwayExperiment
 from pyexsimo.experiments.glycogen import GlycogenExperiment
@@ -16,22 +15,24 @@ SHOW_FIGURES = False
 
 
 @pytest.mark.parametrize("exp_class", [DoseResponseExperiment, PathwayExperiment, GlycogenExperiment])
-def test_experiments(exp_class, tmp_path):
+def test_experiments(exp_class, tmp_path, result_cache):
     run_experiment(
         exp_class,
         output_path=tmp_path,
         model_path=MODEL_PATH / "liver_glucose.xml",
         data_path=DATA_PATH,
-        show_figures=SHOW_FIGURES
+        show_figures=SHOW_FIGURES,
+        cache=result_cache
     )
 
 
 @pytest.mark.parametrize("exp_class", [PathwaySSExperiment])
-def test_experiments_const_glycogen(exp_class, tmp_path):
+def test_experiments_const_glycogen(exp_class, tmp_path, result_cache):
     run_experiment(
         exp_class,
         output_path=tmp_path,
         model_path=MODEL_PATH / "liver_glucose_const_glyglc.xml",
         data_path=DATA_PATH,
-        show_figures=SHOW_FIGURES
+        show_figures=SHOW_FIGURES,
+        cache=result_cache
     )
@@ -0,0 +1,119 @@
+"""
+Test metabolic control analysis of steady-state grids.
+"""
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyexsimo import MODEL_PATH
+from pyexsimo.mca import (link_matrix, grid_mca, control_table,
+                          control_grid, plot_control_coefficients)
+
+SBML_PATH = MODEL_PATH / "liver_glucose_const_glyglc.xml"
+
+
+def test_link_matrix():
+    # A <-> B, B <-> C: A + B + C conserved
+    N = np.array([[-1, 0], [1, -1], [0, 1]], dtype=float)
+    independent, L = link_matrix(N)
+    assert len(independent) == 2
+    np.testing.assert_allclose(L @ N[independent], N, atol=1E-12)
+
+
+class ScanResult(object):
+    """Steady-state scan with the attributes of sbmlsim Result."""
+
+    def __init__(self, r, scan):
+        model = r.model
+        self.columns = ["time"] + [
+            f"[{sid}]" for sid in (list(model.getFloatingSpeciesIds())
+                                   + list(model.getBoundarySpeciesIds()))
+        ] + list(model.getReactionIds())
+        self.keys = list(scan.keys())
+        self.vecs = list(scan.values())
+        self.indices = list(itertools.product(
+            *[range(len(vec)) for vec in self.vecs]))
+        r.timeCourseSelections = self.columns
+        frames = []
+        for index in self.indices:
+            r.resetToOrigin()
+            for k, key in enumerate(self.keys):
+                r[key] = self.vecs[k][index[k]]
+            frames.append(np.array(r.simulate(0, 1000, 2)))
+        self.data = np.stack(frames, axis=2)
+
+
+@pytest.fixture(scope="module")
+def scan(simulator_pool):
+    with simulator_pool.simulator(SBML_PATH) as r:
+        return ScanResult(r, {'[glc_ext]': np.array([4.0, 8.0, 12.0]),
+                              '[glyglc]': np.array([100.0, 400.0])})
+
+
+@pytest.fixture(scope="module")
+def mca(scan, simulator_pool):
+    return grid_mca(scan, SBML_PATH, pool=simulator_pool)
+
+
+def test_grid_mca(scan, mca):
+    assert mca.shape == (3, 2)
+    columns = [scan.columns.index(rid) for rid in mca.reaction_ids]
+    np.testing.assert_allclose(mca.rates, scan.data[-1, columns, :].T)
+
+    # summation theorems
+    v = mca.rates
+    CJ = mca.flux_control_unscaled
+    np.testing.assert_allclose(np.einsum('pjk,pk->pj', CJ, v), v,
+                               atol=1E-5 * np.abs(v).max())
+    Cs = mca.concentration_control_unscaled
+    np.testing.assert_allclose(np.einsum('pik,pk->pi', Cs, v), 0, atol=1E-4)
+
+
+def test_flux_control_perturbation(mca, simulator_pool):
+    """Control coefficient of GK on HGP agrees with a Vmax perturbation."""
+    i, j = 1, 0
+    glc_ext, glyglc = mca.vecs[0][i], mca.vecs[1][j]
+
+    def hgp(f):
+        with simulator_pool.simulator(SBML_PATH) as r:
+            r['[glc_ext]'] = glc_ext
+            r['[glyglc]'] = glyglc
+            r['GK_Vmax'] = r['GK_Vmax'] * f
+            r.simulate(0, 5000, 2)
+            return r['GLUT2']
+
+    control = (hgp(1.001) / hgp(1.0) - 1) / 0.001
+    assert mca.flux_control_grid('HGP', 'GK')[i, j] == pytest.approx(
+        control, rel=1E-2)
+
+
+def test_control_table(mca):
+    df = control_table(mca, fluxes=['HGP', 'GLY'], reactions=['GK', 'GS'])
+    assert len(df) == 6 * 2 * 2
+    assert list(df.columns) == ['[glc_ext]', '[glyglc]', 'point', 'flux',
+                                'reaction', 'control']
+    row = df[(df.point == 3) & (df.flux == 'GLY') & (df.reaction == 'GS')]
+    index = mca.indices[3]
+    assert row.control.values[0] == pytest.approx(
+        mca.flux_control_grid('GLY', 'GS')[index])
+
+
+def test_control_grid(mca, tmp_path):
+    # control table stored with the results
+    path = tmp_path / "control.tsv"
+    control_table(mca).to_csv(path, sep="\t", index=False)
+    table = pd.read_csv(path, sep="\t")
+    x, y, C = control_grid(table, 'HGP', 'GK')
+    np.testing.assert_allclose(x, mca.vecs[0])
+    np.testing.assert_allclose(y, mca.vecs[1])
+    np.testing.assert_allclose(C, mca.flux_control_grid('HGP', 'GK'))
+
+
+def test_plot_control_coefficients(mca):
+    from matplotlib import pyplot as plt
+    f = plot_control_coefficients(control_table(mca), fluxes=['HGP'],
+                                  reactions=['GK', 'GP'])
+    assert len(f.axes) == 3  # including color bar
+    plt.close(f)
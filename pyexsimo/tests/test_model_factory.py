@@ -0,0 +1,87 @@
+"""
+Test the model factory.
+"""
+import json
+import shutil
+
+from pyexsimo import MODEL_PATH
+from pyexsimo.model_factory import ModelReports, REPORT_MANIFEST_FILENAME
+from pyexsimo.utils import sbml_hash
+
+
+def test_model_reports_outdated(tmp_path):
+    sbml_path = tmp_path / "liver_glucose.xml"
+    shutil.copy(str(MODEL_PATH / "liver_glucose.xml"), str(sbml_path))
+    reports = ModelReports([sbml_path], report_dir=tmp_path)
+
+    # missing report
+    assert reports.outdated() == [sbml_path]
+
+    # report of unchanged model
+    (tmp_path / "liver_glucose.html").write_text("<html></html>")
+    with open(tmp_path / REPORT_MANIFEST_FILENAME, "w") as f_json:
+        json.dump({"liver_glucose.xml": sbml_hash(sbml_path)}, f_json)
+    assert reports.outdated() == []
+    assert ModelReports([sbml_path], report_dir=tmp_path,
+                        force=True).outdated() == [sbml_path]
+
+    # changed model
+    sbml = sbml_path.read_text().replace('id="GLUT2"', 'id="GLUT2b"')
+    sbml_path.write_text(sbml)
+    assert reports.outdated() == [sbml_path]
+
+
+def test_model_reports_up_to_date(tmp_path):
+    sbml_path = MODEL_PATH / "liver_glucose.xml"
+    (tmp_path / "liver_glucose.html").write_text("<html></html>")
+    with open(tmp_path / REPORT_MANIFEST_FILENAME, "w") as f_json:
+        json.dump({"liver_glucose.xml": sbml_hash(sbml_path)}, f_json)
+
+    reports = ModelReports([sbml_path], report_dir=tmp_path).start()
+    assert reports.join() == []
+
+
+def test_model_reports_close(tmp_path):
+    sbml_path = MODEL_PATH / "liver_glucose.xml"
+    reports = ModelReports([sbml_path], report_dir=tmp_path).start()
+    assert reports._executor is not None
+
+    reports.close()
+    assert reports._executor is None
+    assert not (tmp_path / REPORT_MANIFEST_FILENAME).exists()
+    assert reports.join() == []
+
+
+def test_cached_annotations(tmp_path):
+    import pandas as pd
+    from pyexsimo.model_factory import cached_annotations, ANNOTATIONS_PATH
+
+    tsv_path = cached_annotations(ANNOTATIONS_PATH, cache_path=tmp_path)
+    assert tsv_path.suffix == ".tsv"
+    mtime = tsv_path.stat().st_mtime
+
+    # cached conversion
+    assert cached_annotations(ANNOTATIONS_PATH, cache_path=tmp_path) == tsv_path
+    assert tsv_path.stat().st_mtime == mtime
+
+    df_xlsx = pd.read_excel(str(ANNOTATIONS_PATH), comment="#")
+    df_xlsx.dropna(axis='index', inplace=True, how="all")
+    df_tsv = pd.read_csv(tsv_path, sep="\t", comment="#",
+                         skip_blank_lines=True)
+    assert list(df_tsv.columns) == list(df_xlsx.columns)
+    assert len(df_tsv) == len(df_xlsx)
+    assert list(df_tsv['pattern'].fillna("")) == list(df_xlsx['pattern'].fillna(""))
+
+
+def test_model_report_keeps_model(tmp_path):
+    """ The SBML of the model is not rewritten by the report. """
+    from pyexsimo.model_factory import create_model_report
+
+    sbml_path = tmp_path / "liver_glucose.xml"
+    shutil.copy(str(MODEL_PATH / "liver_glucose.xml"), str(sbml_path))
+    mtime = sbml_path.stat().st_mtime_ns
+    create_model_report(sbml_path, report_dir=tmp_path)
+    assert (tmp_path / "liver_glucose.html").exists()
+    assert sbml_path.stat().st_mtime_ns == mtime
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "liver_glucose.html", "liver_glucose.xml"]
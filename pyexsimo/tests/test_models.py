@@ -6,12 +6,11 @@ Model related tests.
 import os
 import pytest
 import libsbml
-import cobra
-from cobra.io import read_sbml_model
 from sbmlutils.validation import check_sbml
 
 from pyexsimo.model_factory import create_liver_glucose, create_liver_glucose_const_glycogen
-from pyexsimo.tests.utils import get_sbml_files, DOC, MODEL, reaction_ids, species_ids
+from pyexsimo.validation import mass_balance, imbalanced_reactions, PSEUDO_REACTIONS
+from pyexsimo.tests.utils import get_sbml_files, get_model, reaction_ids, species_ids
 
 
 def test_create_models(tmp_path):
@@ -40,6 +39,37 @@ def test_model_exists(sbml_path):
     model = doc.getModel()  # type: libsbml.Model
     assert model
 
+
+def test_create_model_cached_annotations(tmp_path):
+    """ Testing that the model created with the cached TSV annotations is
+    identical to the model created with the xlsx annotations. """
+    import re
+    from sbmlutils.modelcreator import creator
+    from pyexsimo.model_factory import cached_annotations, ANNOTATIONS_PATH
+
+    def create(annotations, target_dir):
+        creator.create_model(modules=['pyexsimo.models.liver_glucose'],
+                             filename="liver_glucose.xml",
+                             target_dir=target_dir,
+                             annotations=str(annotations),
+                             create_report=False)
+        sbml = (target_dir / "liver_glucose.xml").read_text()
+        # metaids and creation dates differ between runs
+        sbml = re.sub(r"meta_[0-9a-f]{32}", "meta", sbml)
+        return re.sub(r"\d{4}-\d{2}-\d{2}T[\d:]+Z", "date", sbml)
+
+    tsv_path = cached_annotations(ANNOTATIONS_PATH,
+                                  cache_path=tmp_path / "annotations")
+    sbml_tsv = create(tsv_path, tmp_path / "tsv")
+    sbml_xlsx = create(ANNOTATIONS_PATH, tmp_path / "xlsx")
+    assert sbml_tsv == sbml_xlsx
+
+    doc = libsbml.readSBMLFromString(sbml_tsv)  # type: libsbml.SBMLDocument
+    s = doc.getModel().getSpecies("adp")  # type: libsbml.Species
+    assert s.getNumCVTerms() > 0
+    assert s.getPlugin("fbc").getCharge() == -3
+
+
 @pytest.mark.parametrize("sbml_path", get_sbml_files())
 def test_model_is_valid(sbml_path):
     """ Testing that all models in the repository are valid, i.e. no
@@ -60,28 +90,29 @@ def test_model_no_warnings(sbml_path):
 
 @pytest.mark.parametrize("sid", species_ids())
 def test_specie_has_formula(sid):
-    specie = MODEL.getSpecies(sid)  # type: libsbml.Species
+    specie = get_model().getSpecies(sid)  # type: libsbml.Species
     fbc_specie = specie.getPlugin("fbc")  # type: libsbml.FbcSpeciesPlugin
     assert fbc_specie.getChemicalFormula()
 
 
 @pytest.mark.parametrize("sid", species_ids())
 def test_specie_has_charge(sid):
-    specie = MODEL.getSpecies(sid)  # type: libsbml.Species
+    specie = get_model().getSpecies(sid)  # type: libsbml.Species
     fbc_specie = specie.getPlugin("fbc")  # type: libsbml.FbcSpeciesPlugin
     assert fbc_specie.getCharge() is not None
 
 
-COBRA_MODEL = read_sbml_model(libsbml.writeSBMLToString(DOC))
+@pytest.fixture(scope="module")
+def imbalanced():
+    return imbalanced_reactions(mass_balance(get_model()))
 
 
 @pytest.mark.parametrize("sid", reaction_ids())
-def test_reaction_mass_balance(sid):
-    """Test mass balance of all reactions."""
-    if sid not in ['OAAFLX', 'CITFLX', 'ACOAFLX']:
+def test_reaction_mass_balance(sid, imbalanced):
+    """Test mass and charge balance of all reactions."""
+    if sid not in PSEUDO_REACTIONS:
         # don't check pseudoreactions
-        reaction = COBRA_MODEL.reactions.get_by_id(sid)
-        balance = reaction.check_mass_balance()
+        balance = imbalanced.get(sid, {})
         if len(balance) > 0:
-            print(reaction, balance)
+            print(sid, balance)
         assert len(balance) == 0
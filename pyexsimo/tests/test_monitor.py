@@ -0,0 +1,72 @@
+"""
+Test the runtime monitor of model invariants.
+"""
+import numpy as np
+import pytest
+
+from pyexsimo.monitor import (InvariantMonitor, InvariantViolation,
+                              NONNEGATIVE, CONSERVED)
+
+COLUMNS = ['time', '[a]', '[b]', 'a_tot']
+
+
+def _values(a, b):
+    time = np.arange(len(a), dtype=float)
+    return np.column_stack([time, a, b, np.add(a, b)])
+
+
+def test_no_violation():
+    monitor = InvariantMonitor(totals=['a_tot'])
+    monitor.start("exp", "sim")
+    values = _values([1.0, 0.5, 0.0], [0.0, 0.5, 1.0])
+    assert monitor.check_array(values, COLUMNS, point=0) == []
+    assert monitor.violations == []
+
+
+def test_violations():
+    monitor = InvariantMonitor(totals=['a_tot'])
+    monitor.start("exp", "scan")
+    values = _values([1.0, 0.5, -0.1, -0.2], [0.0, 0.5, 0.5, 0.5])
+    violations = monitor.check_array(values, COLUMNS, point=3)
+    assert [v['check'] for v in violations] == [NONNEGATIVE, CONSERVED]
+    negative, conserved = violations
+    assert negative['sid'] == '[a]'
+    assert negative['point'] == 3
+    assert negative['time'] == 2.0
+    assert negative['value'] == -0.1
+    assert conserved['sid'] == 'a_tot'
+    assert conserved['time'] == 2.0
+    assert conserved['reference'] == 1.0
+    assert monitor.experiment_violations("exp") == violations
+    assert monitor.experiment_violations("other") == []
+
+
+def test_abort():
+    monitor = InvariantMonitor(totals=['a_tot'], abort=True)
+    monitor.start("exp", "sim")
+    with pytest.raises(InvariantViolation) as err:
+        monitor.check_array(_values([1.0, -1.0], [0.0, 0.0]), COLUMNS, 0)
+    assert err.value.violation['sid'] == '[a]'
+
+
+def test_tolerance():
+    monitor = InvariantMonitor(totals=['a_tot'], atol=1E-8, rtol=1E-6)
+    values = _values([1.0, 1.0 + 1E-7, -1E-9], [0.0, 0.0, 1.0])
+    assert monitor.check_array(values, COLUMNS, 0) == []
+
+
+def test_monitored_experiment(simulator_pool):
+    from pyexsimo import MODEL_PATH, DATA_PATH
+    from pyexsimo.runner import create_experiment, simulate_experiment
+    from pyexsimo.experiments.dose_response import DoseResponseExperiment
+
+    exp = create_experiment(DoseResponseExperiment,
+                            model_path=MODEL_PATH / "liver_glucose.xml",
+                            data_path=DATA_PATH)
+    monitor = InvariantMonitor(abort=True)
+    simulate_experiment(exp, pool=simulator_pool, monitor=monitor,
+                        analyses=False)
+    assert monitor.violations == []
+    # all scan points are checked
+    scan = list(exp.scans.keys())[-1]
+    assert monitor.point == exp.scan_results[scan].data.shape[2]
@@ -0,0 +1,125 @@
+"""
+Test stoichiometric network and structural analysis.
+"""
+import numpy as np
+import pytest
+import libsbml
+
+from pyexsimo import MODEL_PATH
+from pyexsimo.network import Network, get_network, left_null_space
+
+
+def _model():
+    """A <-> B -> C with boundary S -> A, modifier E and rule f = B."""
+    doc = libsbml.SBMLDocument(3, 1)
+    model = doc.createModel()
+    c = model.createCompartment()
+    c.setId("c")
+    for sid, boundary in [('S', True), ('A', False), ('B', False),
+                          ('C', False), ('E', False)]:
+        s = model.createSpecies()
+        s.setId(sid)
+        s.setCompartment("c")
+        s.setBoundaryCondition(boundary)
+    p = model.createParameter()
+    p.setId("f")
+    p.setConstant(False)
+    rule = model.createAssignmentRule()
+    rule.setVariable("f")
+    rule.setMath(libsbml.parseL3Formula("B"))
+
+    for rid, reactants, products, reversible, formula in [
+        ('v0', ['S'], ['A'], False, "S"),
+        ('v1', ['A'], ['B'], True, "A - B"),
+        ('v2', ['B'], ['C'], False, "E * f"),
+    ]:
+        r = model.createReaction()
+        r.setId(rid)
+        r.setReversible(reversible)
+        for sid in reactants:
+            ref = r.createReactant()
+            ref.setSpecies(sid)
+            ref.setStoichiometry(1)
+        for sid in products:
+            ref = r.createProduct()
+            ref.setSpecies(sid)
+            ref.setStoichiometry(1)
+        if rid == 'v2':
+            r.createModifier().setSpecies("E")
+        r.createKineticLaw().setMath(libsbml.parseL3Formula(formula))
+    return doc, model
+
+
+def test_stoichiometric_matrix():
+    doc, model = _model()
+    network = Network(model)
+    assert network.species() == ['S', 'A', 'B', 'C', 'E']
+    assert network.species(boundary=False) == ['A', 'B', 'C', 'E']
+    np.testing.assert_array_equal(network.stoichiometric_matrix().toarray(), [
+        [-1, 0, 0], [1, -1, 0], [0, 1, -1], [0, 0, 1], [0, 0, 0]])
+    assert network.stoichiometric_matrix(boundary=False).shape == (4, 3)
+
+
+def test_structure():
+    doc, model = _model()
+    network = Network(model)
+    assert network.connectivity() == {'S': 1, 'A': 2, 'B': 2, 'C': 1, 'E': 0}
+    assert network.dead_ends() == ['C', 'E']
+    assert network.conservation_laws() == {'E': {'E': 1.0}}
+    laws = network.conservation_laws(boundary=True)
+    assert laws['S'] == {'S': 1.0, 'A': 1.0, 'B': 1.0, 'C': 1.0}
+
+    graph = network.dependency_graph()
+    assert graph['v1'] == {'reactants': ['A'], 'products': ['B'],
+                           'modifiers': [], 'rate': ['A', 'B']}
+    # rate depends on B via assignment rule
+    assert graph['v2']['rate'] == ['B', 'E']
+    assert graph['v2']['modifiers'] == ['E']
+
+    J = network.jacobian_sparsity().toarray()
+    # d(dC/dt)/dB and d(dC/dt)/dE, C does not affect any rate
+    np.testing.assert_array_equal(J[2], [False, True, False, True])
+    assert not J[:, 2].any()
+
+
+def test_left_null_space():
+    N = np.array([[-1, 0], [1, -1], [0, 1], [0, 0]])
+    L = left_null_space(N)
+    assert L.shape == (2, 4)
+    np.testing.assert_allclose(L @ N, 0, atol=1E-12)
+
+
+@pytest.fixture(scope="module")
+def network():
+    return get_network(MODEL_PATH / "liver_glucose.xml")
+
+
+def test_network_cached(network):
+    assert get_network(MODEL_PATH / "liver_glucose.xml") is network
+    with open(str(MODEL_PATH / "liver_glucose.xml")) as f:
+        assert get_network(f.read()) is network
+
+
+def test_conserved_moieties(network):
+    laws = network.conservation_laws()
+    assert laws['utp'] == {'utp': 1.0, 'udp': 1.0, 'udpglc': 1.0}
+    assert laws['gtp'] == {'gtp': 1.0, 'gdp': 1.0}
+    N = network.stoichiometric_matrix(boundary=False).toarray()
+    species = network.species(boundary=False)
+    for law in laws.values():
+        v = np.array([law.get(sid, 0.0) for sid in species])
+        np.testing.assert_allclose(v @ N, 0, atol=1E-10)
+
+    laws = network.conservation_laws(boundary=True)
+    assert laws['atp_mito'] == {'atp_mito': 1.0, 'adp_mito': 1.0}
+    assert laws['nadh_mito'] == {'nadh_mito': 1.0, 'nad_mito': 1.0}
+
+
+def test_jacobian_sparsity(network):
+    J = network.jacobian_sparsity()
+    n = len(network.species(boundary=False))
+    assert J.shape == (n, n)
+    species = network.species(boundary=False)
+    k = species.index('glc')
+    # glucose transport and phosphorylation depend on glucose
+    assert J[k, k]
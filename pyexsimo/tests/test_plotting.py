@@ -0,0 +1,60 @@
+"""
+Test plotting of simulation results.
+"""
+import numpy as np
+import pandas as pd
+from sbmlsim.result import Result
+
+from pyexsimo.plotting import add_line, plt
+from pyexsimo.units import get_ureg
+
+
+def _result(nframes=3):
+    frames = [
+        pd.DataFrame({'time': np.linspace(0, 10, 11),
+                      '[glc]': np.linspace(0, 10, 11) + k})
+        for k in range(nframes)
+    ]
+    return Result(frames, udict={'time': "min", '[glc]': "mM"},
+                  ureg=get_ureg())
+
+
+def test_add_line_colors():
+    result = _result()
+    f, ax = plt.subplots()
+    add_line(ax, result, xid="time", yid="[glc]", label="mean")
+    add_line(ax, result, xid="time", yid="[glc]", color="black")
+    add_line(ax, result, xid="time", yid="[glc]", xunit="s", yunit="µM")
+    plt.close(f)
+
+    cycle = plt.rcParams['axes.prop_cycle'].by_key()['color']
+    colors = [line.get_color() for line in ax.get_lines()]
+    assert colors[0] == cycle[0]
+    assert colors[1] == "black"
+    assert colors[2] in cycle[1:]
+    # sd band and two range bands per line
+    assert len(ax.collections) == 9
+    np.testing.assert_allclose(ax.get_lines()[2].get_xdata(),
+                               np.linspace(0, 600, 11))
+
+
+def test_add_line_all_lines():
+    result = _result()
+    f, ax = plt.subplots()
+    add_line(ax, result, xid="time", yid="[glc]", all_lines=True)
+    plt.close(f)
+
+    assert len(ax.get_lines()) == 3
+    assert len({line.get_color() for line in ax.get_lines()}) == 1
+
+
+def test_add_line_range():
+    result = _result()
+    f, ax = plt.subplots()
+    add_line(ax, result, xid="time", yid="[glc]", yunit="µM")
+    plt.close(f)
+
+    # upper range band from mean + sd to max
+    upper = ax.collections[1].get_paths()[0].vertices[:, 1]
+    y_max = 1000 * result.max["[glc]"].values
+    assert np.isclose(upper.max(), y_max.max())
@@ -0,0 +1,110 @@
+"""
+Test the pool of compiled roadrunner instances.
+"""
+import numpy as np
+
+from pyexsimo import MODEL_PATH
+from pyexsimo.pool import SimulatorPool, fingerprint, model_key
+
+SBML_PATH = MODEL_PATH / "liver_glucose.xml"
+
+
+def test_reuse_and_reset():
+    pool = SimulatorPool()
+    r = pool.acquire(SBML_PATH)
+    s_ref = r.simulate(0, 100, steps=10)
+    pool.release(SBML_PATH, r)
+
+    r2 = pool.acquire(SBML_PATH)
+    assert r2 is r
+    # change state, parameters, selections and integrator
+    pid = r2.model.getGlobalParameterIds()[0]
+    r2[pid] = 2 * r2[pid] + 1.0
+    r2.timeCourseSelections = ["time", "atp_tot"]
+    r2.getIntegrator().setValue("relative_tolerance", 1E-10)
+    r2.simulate(0, 50, steps=10)
+    pool.release(SBML_PATH, r2)
+
+    r3 = pool.acquire(SBML_PATH)
+    assert r3 is r
+    assert fingerprint(r3) == pool._templates[
+        list(pool._templates)[0]].fingerprint
+    s = r3.simulate(0, 100, steps=10)
+    np.testing.assert_array_equal(s, s_ref)
+    assert pool.stats()['compiled'] == 1
+    assert pool.stats()['reused'] == 2
+
+
+def test_clone():
+    pool = SimulatorPool()
+    r1 = pool.acquire(SBML_PATH)
+    r2 = pool.acquire(SBML_PATH)
+    assert r1 is not r2
+    assert pool.stats()['compiled'] == 1
+    assert pool.stats()['cloned'] == 1
+    s1 = r1.simulate(0, 100, steps=10)
+    s2 = r2.simulate(0, 100, steps=10)
+    np.testing.assert_array_equal(s1, s2)
+    assert list(s1.colnames) == list(s2.colnames)
+
+
+def test_sbml_string():
+    from pyexsimo.variants import ModelVariant, variant_sbml
+
+    pool = SimulatorPool()
+    sbml = variant_sbml(SBML_PATH, ModelVariant(parameters={"scale": 2.0}))
+    with pool.simulator(sbml) as r:
+        assert r["scale"] == 2.0
+    with pool.simulator(sbml) as r:
+        assert r["scale"] == 2.0
+    assert pool.stats()['reused'] == 1
+
+
+def test_threads():
+    from concurrent.futures import ThreadPoolExecutor
+
+    pool = SimulatorPool(max_idle=4)
+
+    def simulate(k):
+        with pool.simulator(SBML_PATH) as r:
+            r.simulate(0, 10, steps=2)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(simulate, range(40)))
+    stats = pool.stats()
+    assert stats['compiled'] + stats['cloned'] + stats['reused'] == 40
+    assert stats['discarded'] == 0
+
+
+def test_max_templates():
+    from pyexsimo.variants import ModelVariant, variant_sbml
+
+    pool = SimulatorPool(max_templates=2)
+    sbml1, sbml2, sbml3 = [
+        variant_sbml(SBML_PATH, ModelVariant(parameters={"scale": scale}))
+        for scale in [1.0, 2.0, 3.0]]
+    with pool.simulator(sbml1):
+        pass
+    with pool.simulator(sbml2):
+        pass
+    # sbml1 most recently used, sbml2 is removed with its idle instance
+    with pool.simulator(sbml1):
+        pass
+    r3 = pool.acquire(sbml3)
+    stats = pool.stats()
+    assert stats['compiled'] == 3
+    assert stats['evicted'] == 1
+    assert len(pool._templates) == 2
+    assert sum(len(idle) for idle in pool._idle.values()) == 1
+
+    with pool.simulator(sbml1) as r:
+        assert r["scale"] == 1.0
+    assert pool.stats()['reused'] == 2
+
+    # sbml3 is removed, its instance is not returned to the pool
+    with pool.simulator(sbml2):
+        pass
+    pool.release(sbml3, r3)
+    assert pool.stats()['evicted'] == 2
+    assert model_key(sbml3) not in pool._templates
+    assert model_key(sbml3) not in pool._idle
@@ -0,0 +1,50 @@
+"""
+Test the reference results and the comparator.
+"""
+import numpy as np
+import pytest
+
+from pyexsimo import MODEL_PATH, DATA_PATH
+from pyexsimo.experiments import EXPERIMENTS, load_experiment
+from pyexsimo.reference import compare_arrays, compare_experiment, format_diffs
+
+
+def test_compare_arrays():
+    reference = np.ones(shape=(5, 2, 3))
+    actual = reference.copy()
+    actual[3, 1, 2] = 1.1
+    errors = compare_arrays(reference, actual)
+    assert list(errors['ok']) == [True, False]
+    assert errors['max_abs'][1] == pytest.approx(0.1)
+    assert errors['max_rel'][1] == pytest.approx(0.1)
+    assert errors['row'][1] == 3
+    assert errors['point'][1] == 2
+
+
+def test_compare_arrays_nan():
+    reference = np.array([[[np.nan, 0.0]]])
+    errors = compare_arrays(reference, reference.copy())
+    assert errors['ok'][0]
+    assert errors['max_abs'][0] == 0.0
+
+    errors = compare_arrays(reference, np.array([[[1.0, 0.0]]]))
+    assert not errors['ok'][0]
+
+
+def test_compare_arrays_shape():
+    with pytest.raises(ValueError):
+        compare_arrays(np.ones((2, 2, 2)), np.ones((2, 2, 3)))
+
+
+@pytest.mark.parametrize("exp_id", list(EXPERIMENTS.keys()))
+def test_reference(exp_id, result_cache):
+    from pyexsimo.runner import create_experiment, simulate_experiment
+
+    exp = create_experiment(load_experiment(exp_id),
+                            model_path=MODEL_PATH / EXPERIMENTS[exp_id]['model'],
+                            data_path=DATA_PATH)
+    simulate_experiment(exp, cache=result_cache, analyses=False)
+    diffs = compare_experiment(exp)
+    assert diffs
+    failed = [d for d in diffs if not d['ok']]
+    assert not failed, format_diffs(failed)
@@ -0,0 +1,78 @@
+"""
+Test rendering of figures from stored results.
+"""
+import pytest
+
+from pyexsimo import MODEL_PATH
+from pyexsimo.execute import run_experiments
+from pyexsimo.render import render_figures, load_manifest
+from pyexsimo.runner import load_summary
+
+
+@pytest.fixture
+def headless_results(tmp_path, result_cache):
+    run_experiments(output_path=tmp_path, cache=result_cache,
+                    exp_ids=["DoseResponseExperiment"], figures=False)
+    return tmp_path
+
+
+def test_render_figures(headless_results):
+    output_path = headless_results
+    summaries = render_figures(output_path, exp_ids=["DoseResponseExperiment"])
+    assert summaries[0]['figures'] == ["fig1"]
+    assert (output_path / "DoseResponseExperiment_fig1.svg").exists()
+
+    summary = load_summary("DoseResponseExperiment", output_path)
+    assert summary['figures'] == ["fig1"]
+    manifest = load_manifest(output_path)
+    assert "DoseResponseExperiment" in manifest
+
+
+def test_render_skip_unchanged(headless_results):
+    output_path = headless_results
+    render_figures(output_path, exp_ids=["DoseResponseExperiment"])
+    path_fig = output_path / "DoseResponseExperiment_fig1.svg"
+    mtime = path_fig.stat().st_mtime
+
+    render_figures(output_path, exp_ids=["DoseResponseExperiment"])
+    assert path_fig.stat().st_mtime == mtime
+
+    render_figures(output_path, exp_ids=["DoseResponseExperiment"],
+                   force=True)
+    assert path_fig.stat().st_mtime != mtime
+
+
+def test_render_changed_source(headless_results, tmp_path, monkeypatch):
+    import shutil
+    from pyexsimo import BASE_PATH
+    from pyexsimo import render
+
+    source_path = tmp_path / "pyexsimo"
+    shutil.copytree(str(BASE_PATH), str(source_path),
+                    ignore=shutil.ignore_patterns("tests", "__pycache__"))
+    monkeypatch.setattr(render, "SOURCE_PATH", source_path)
+
+    output_path = headless_results
+    render_figures(output_path, exp_ids=["DoseResponseExperiment"])
+    path_fig = output_path / "DoseResponseExperiment_fig1.svg"
+    mtime = path_fig.stat().st_mtime
+
+    # shared plotting module changed
+    with open(source_path / "plotting.py", "a") as f:
+        f.write("\n# changed\n")
+    render_figures(output_path, exp_ids=["DoseResponseExperiment"])
+    assert path_fig.stat().st_mtime != mtime
+
+
+def test_render_svgz_parallel(headless_results):
+    output_path = headless_results
+    summaries = render_figures(output_path,
+                               exp_ids=["DoseResponseExperiment"],
+                               figure_format="svgz", jobs=2)
+    assert summaries[0]['figure_format'] == "svgz"
+    assert (output_path / "DoseResponseExperiment_fig1.svgz").exists()
+
+
+def test_render_unsupported_format(tmp_path):
+    with pytest.raises(ValueError):
+        render_figures(tmp_path, figure_format="png")
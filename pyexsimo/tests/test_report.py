@@ -1,21 +1,57 @@
 import pytest
 import os
-from sbmlsim.experiment import run_experiment
-
+from pyexsimo.runner import run_experiment
 from pyexsimo.report import create_report
 from pyexsimo.experiments.glycogen import GlycogenExperiment
 from pyexsimo import MODEL_PATH, DATA_PATH
 
 
-def test_report(tmp_path):
+def test_report(tmp_path, result_cache):
     results = []
     info = run_experiment(GlycogenExperiment,
                           output_path=tmp_path,
                           model_path=MODEL_PATH / "liver_glucose.xml",
                           data_path=DATA_PATH,
-                          show_figures=False)
+                          show_figures=False,
+                          cache=result_cache)
     results.append(info)
 
     create_report(results, tmp_path)
     assert os.path.exists(tmp_path / "index.md")
     assert os.path.exists(tmp_path / f"{info['experiment'].sid}.md")
+
+
+def _summary(exp_id, module, output_path, figures):
+    return {
+        'exp_id': exp_id,
+        'module': module,
+        'output_path': str(output_path),
+        'model_path': str(MODEL_PATH / "liver_glucose.xml"),
+        'data_path': str(DATA_PATH),
+        'datasets': [],
+        'simulations': [],
+        'scans': ['scan1'],
+        'figures': figures,
+    }
+
+
+def test_report_incremental(tmp_path):
+    summaries = [
+        _summary("GlycogenExperiment", "pyexsimo.experiments.glycogen",
+                 tmp_path, ["fig1"]),
+        _summary("PathwayExperiment", "pyexsimo.experiments.hgp_gng",
+                 tmp_path, ["fig1"]),
+    ]
+    md_files = create_report(summaries, tmp_path)
+    assert len(md_files) == 3
+    assert (tmp_path / "sbmlsim" / "report.json").exists()
+
+    # unchanged pages are not rendered
+    assert create_report(summaries, tmp_path) == []
+
+    summaries[1]['figures'] = ["fig1", "fig2"]
+    assert create_report(summaries, tmp_path) == [tmp_path / "PathwayExperiment.md"]
+    with open(tmp_path / "PathwayExperiment.md") as f_md:
+        assert "PathwayExperiment_fig2.svg" in f_md.read()
+
+    assert len(create_report(summaries, tmp_path, force=True)) == 3
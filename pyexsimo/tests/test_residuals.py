@@ -0,0 +1,69 @@
+"""
+Test residuals of simulations against datasets.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyexsimo.residuals import interpolate, fit_metrics
+
+
+def test_interpolate_shared_x():
+    t = np.linspace(0, 10, num=11)
+    xs = np.tile(t[:, None], (1, 3))
+    ys = np.column_stack([t, 2 * t, t ** 2])
+    x = np.array([-1.0, 0.0, 2.5, 10.0, 11.0])
+    y = interpolate(xs, ys, x)
+    assert y.shape == (5, 3)
+    for k in range(3):
+        expected = np.interp(x, t, ys[:, k], left=np.nan, right=np.nan)
+        np.testing.assert_allclose(y[:, k], expected)
+    assert np.all(np.isnan(y[[0, 4], :]))
+
+
+def test_interpolate_different_x():
+    xs = np.array([[0.0, 1.0], [1.0, 2.0], [2.0, 3.0]])
+    ys = np.array([[0.0, 0.0], [1.0, 1.0], [2.0, 2.0]])
+    y = interpolate(xs, ys, np.array([0.5, 2.5]))
+    np.testing.assert_allclose(y, [[0.5, np.nan], [np.nan, 1.5]])
+
+
+def test_fit_metrics():
+    table = pd.DataFrame({
+        'fit': "test",
+        'line': [0, 0, 0, 1, 1, 1],
+        'reference': ["A", "A", "B"] * 2,
+        'residual': [1.0, -1.0, 2.0, 0.0, 0.0, np.nan],
+        'weighted_residual': [0.5, -0.5, np.nan, 0.0, 0.0, np.nan],
+    })
+    metrics = fit_metrics(table, groups=["reference"])
+    m = metrics.set_index(['line', 'group'])
+    assert m.loc[(0, "all"), 'n'] == 3
+    assert m.loc[(0, "all"), 'rmse'] == pytest.approx(np.sqrt(2.0))
+    assert m.loc[(0, "all"), 'chi2'] == pytest.approx(0.5)
+    assert m.loc[(0, "all"), 'chi2_red'] == pytest.approx(0.25)
+    assert m.loc[(0, "reference=B"), 'n_weighted'] == 0
+    assert np.isnan(m.loc[(0, "reference=B"), 'chi2'])
+    assert m.loc[(1, "all"), 'n'] == 2
+    assert m.loc[(1, "all"), 'rmse'] == 0.0
+
+
+def test_experiment_residuals(tmp_path, result_cache):
+    from pyexsimo import MODEL_PATH, DATA_PATH
+    from pyexsimo.runner import run_experiment
+    from pyexsimo.residuals import load_metrics
+    from pyexsimo.experiments.dose_response import DoseResponseExperiment
+
+    run_experiment(DoseResponseExperiment, output_path=tmp_path,
+                   model_path=MODEL_PATH / "liver_glucose.xml",
+                   data_path=DATA_PATH, cache=result_cache, figures=False)
+    path_results = tmp_path / "sbmlsim"
+    for key in ["glucagon", "epinephrine", "insulin"]:
+        path = path_results / f"DoseResponseExperiment_residuals_{key}.tsv"
+        df = pd.read_csv(path, sep="\t")
+        assert set(df.y_unit) == {"pM"}
+        assert df.residual.notna().any()
+
+    metrics = load_metrics("DoseResponseExperiment", path_results)
+    assert set(metrics.fit) == {"glucagon", "epinephrine", "insulin"}
+    assert (metrics[metrics.group == "all"].n > 0).all()
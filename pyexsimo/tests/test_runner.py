@@ -0,0 +1,156 @@
+"""
+Test the experiment runner.
+"""
+import numpy as np
+
+from pyexsimo import MODEL_PATH, DATA_PATH
+from pyexsimo.runner import (
+    run_experiment, create_experiment, simulate_experiment, load_results,
+    save_figures
+)
+from pyexsimo.experiments.dose_response import DoseResponseExperiment
+
+
+class HeadlessExperiment(DoseResponseExperiment):
+    """Experiment failing on figure creation."""
+
+    @property
+    def figures(self):
+        raise AssertionError("figures created in headless run")
+
+
+def test_headless(tmp_path, result_cache):
+    info = run_experiment(HeadlessExperiment,
+                          output_path=tmp_path,
+                          model_path=MODEL_PATH / "liver_glucose.xml",
+                          data_path=DATA_PATH,
+                          cache=result_cache,
+                          figures=False)
+    assert info['figures'] == []
+    assert 'figures' not in info['timings']
+
+    path_results = tmp_path / "sbmlsim"
+    assert (path_results / "HeadlessExperiment.json").exists()
+    assert list(tmp_path.glob("*.svg")) == []
+    for key in info['experiment'].scans:
+        assert (path_results / f"HeadlessExperiment_scan_{key}.npz").exists()
+
+
+def test_render_from_results(tmp_path, result_cache):
+    info = run_experiment(DoseResponseExperiment,
+                          output_path=tmp_path,
+                          model_path=MODEL_PATH / "liver_glucose.xml",
+                          data_path=DATA_PATH,
+                          cache=result_cache,
+                          figures=False)
+    exp_run = info['experiment']
+
+    exp = create_experiment(DoseResponseExperiment,
+                            model_path=MODEL_PATH / "liver_glucose.xml",
+                            data_path=DATA_PATH)
+    load_results(exp, tmp_path / "sbmlsim")
+    for key, result in exp_run._scan_results.items():
+        np.testing.assert_array_equal(result.data, exp._scan_results[key].data)
+
+    fig_keys = save_figures(exp, tmp_path)
+    assert fig_keys
+    for fkey in fig_keys:
+        assert (tmp_path / f"DoseResponseExperiment_{fkey}.svg").exists()
+
+
+def test_rasterize_dense_layers():
+    import matplotlib
+    matplotlib.use("agg")
+    from matplotlib import pyplot as plt
+    from pyexsimo.runner import rasterize_dense_layers
+
+    fig, ax = plt.subplots()
+    dense, = ax.plot(np.linspace(0, 1, 1000), np.random.rand(1000))
+    sparse, = ax.plot([0, 1], [0, 1])
+    rasterize_dense_layers(fig, min_points=200)
+    assert dense.get_rasterized()
+    assert not sparse.get_rasterized()
+    plt.close(fig)
+
+
+def test_simulate_variant(result_cache):
+    from pyexsimo.runner import simulate_experiment
+    from pyexsimo.variants import ModelVariant
+
+    exp = create_experiment(DoseResponseExperiment,
+                            model_path=MODEL_PATH / "liver_glucose.xml",
+                            data_path=DATA_PATH)
+    variant = ModelVariant(knockouts=["GLUT2"])
+    simulate_experiment(exp, cache=result_cache, variant=variant)
+    for result in exp._scan_results.values():
+        assert np.all(result.data[:, list(result.columns).index("GLUT2"), :] == 0.0)
+
+
+class AnalysisExperiment(DoseResponseExperiment):
+    """Experiment with analysis of the scan results."""
+
+    @property
+    def analyses(self):
+        return {'glut2': self.glut2}
+
+    def glut2(self, model):
+        import pandas as pd
+        result = list(self.scan_results.values())[0]
+        return pd.DataFrame({'GLUT2': result.data[-1, list(
+            result.columns).index("GLUT2"), :]})
+
+
+def test_analysis_results(tmp_path, result_cache):
+    info = run_experiment(AnalysisExperiment,
+                          output_path=tmp_path,
+                          model_path=MODEL_PATH / "liver_glucose.xml",
+                          data_path=DATA_PATH,
+                          cache=result_cache,
+                          figures=False)
+    table = info['experiment'].analysis_results['glut2']
+    path = tmp_path / "sbmlsim" / "AnalysisExperiment_analysis_glut2.tsv"
+    assert path.exists()
+
+    exp = create_experiment(AnalysisExperiment,
+                            model_path=MODEL_PATH / "liver_glucose.xml",
+                            data_path=DATA_PATH)
+    load_results(exp, tmp_path / "sbmlsim")
+    np.testing.assert_allclose(exp.analysis_results['glut2'].GLUT2,
+                               table.GLUT2)
+
+
+class CountingAnalysisExperiment(AnalysisExperiment):
+    """Experiment counting the calls of the analysis."""
+    calls = 0
+
+    def glut2(self, model):
+        CountingAnalysisExperiment.calls += 1
+        return super(CountingAnalysisExperiment, self).glut2(model)
+
+
+def test_analysis_cached(result_cache):
+    tables = []
+    for k in range(2):
+        exp = create_experiment(CountingAnalysisExperiment,
+                                model_path=MODEL_PATH / "liver_glucose.xml",
+                                data_path=DATA_PATH)
+        simulate_experiment(exp, cache=result_cache)
+        tables.append(exp.analysis_results['glut2'])
+    assert CountingAnalysisExperiment.calls == 1
+    np.testing.assert_array_equal(tables[0].GLUT2, tables[1].GLUT2)
+
+    # analyses skipped
+    simulate_experiment(exp, cache=result_cache, analyses=False)
+    assert exp.analysis_results == {}
+    assert CountingAnalysisExperiment.calls == 1
+
+
+def test_set_integrator_settings(simulator_pool):
+    from pyexsimo.runner import set_integrator_settings
+
+    with simulator_pool.simulator(MODEL_PATH / "liver_glucose.xml") as r:
+        integrator = set_integrator_settings(r, absolute_tolerance=1E-10,
+                                             relative_tolerance=1E-8)
+        volume = min(r.model.getCompartmentVolumes())
+        assert integrator.getValue("absolute_tolerance") == 1E-10 * volume
+        assert integrator.getValue("relative_tolerance") == 1E-8
@@ -0,0 +1,92 @@
+"""
+Test input schedules of long-horizon simulations.
+"""
+import numpy as np
+import pytest
+
+from pyexsimo import MODEL_PATH
+from pyexsimo.schedules import (InputSchedule, meal_schedule,
+                                circadian_schedule, simulate_schedule, DAY)
+from pyexsimo.variants import ModelVariant, variant_sbml
+
+SBML_PATH = MODEL_PATH / "liver_glucose.xml"
+
+
+def test_schedule_values():
+    times, values = [0, 60, 90, 240], [4.5, 8.0, 6.0, 4.5]
+    schedule = InputSchedule('glc_ext', times, values)
+    t = np.linspace(-10, 300, 311)
+    np.testing.assert_allclose(schedule(t), np.interp(t, times, values))
+
+    from scipy import interpolate
+    schedule = InputSchedule('glc_ext', times, values, kind='pchip')
+    t = np.linspace(0, 240, 241)
+    np.testing.assert_allclose(
+        schedule(t), interpolate.PchipInterpolator(times, values)(t))
+    assert schedule(-5) == 4.5 and schedule(1000) == 4.5
+
+    with pytest.raises(ValueError):
+        InputSchedule('glc_ext', [0, 60, 30], [1, 2, 3])
+    with pytest.raises(ValueError):
+        InputSchedule('glc_ext', [0, 60], [1, 2], kind='akima')
+
+
+def test_meal_schedule():
+    schedule = meal_schedule(days=2)
+    assert schedule.times[-1] == 2 * DAY
+    assert len(schedule.times) == 2 + 2 * 3 * 3
+    assert schedule(12.5 * 60 + 30) == pytest.approx(8.5)
+    assert schedule(3 * 60) == pytest.approx(4.5)
+
+
+def test_variant_key():
+    variant = ModelVariant(parameters={'GK_Vmax': 1.0})
+    assert 'schedules' not in variant.spec()
+    scheduled = ModelVariant(parameters={'GK_Vmax': 1.0},
+                             schedules=[meal_schedule()])
+    assert scheduled.key != variant.key
+    assert scheduled == ModelVariant(parameters={'GK_Vmax': 1.0},
+                                     schedules=[meal_schedule()])
+
+
+@pytest.mark.parametrize("kind", ['linear', 'pchip', 'spline'])
+def test_scheduled_input(kind, simulator_pool):
+    if kind == 'spline':
+        schedule = circadian_schedule('glc_ext', mean=6.0, amplitude=2.5,
+                                      peak=9.0)
+    else:
+        meals = meal_schedule(days=1)
+        schedule = InputSchedule('glc_ext', meals.times, meals.values,
+                                 kind=kind)
+    sbml = variant_sbml(SBML_PATH, ModelVariant(schedules=[schedule]))
+    df = simulate_schedule(sbml, end=DAY, dt=5, pool=simulator_pool,
+                           selections=["time", "[glc_ext]", "[glyglc]"])
+    assert len(df) == DAY // 5 + 1
+    np.testing.assert_allclose(df.time, np.arange(0, DAY + 1, 5))
+    np.testing.assert_allclose(df['[glc_ext]'], schedule(df.time), atol=1E-10)
+    # glycogen synthesis at high glucose
+    assert df['[glyglc]'].iloc[9 * 12] > df['[glyglc]'].iloc[7 * 12]
+
+
+def test_hormone_schedule(simulator_pool):
+    schedule = circadian_schedule('ins', mean=100, amplitude=50, days=1)
+    sbml = variant_sbml(SBML_PATH, ModelVariant(schedules=[schedule]))
+    df = simulate_schedule(sbml, end=DAY, dt=60, pool=simulator_pool,
+                           selections=["time", "ins", "glu"])
+    np.testing.assert_allclose(df.ins, schedule(df.time), rtol=1E-10)
+    assert df.ins.iloc[12] == pytest.approx(150)
+    # glucagon follows the constant glucose
+    assert np.ptp(df.glu) == pytest.approx(0, abs=1E-10)
+
+
+def test_chunks(simulator_pool):
+    sbml = variant_sbml(SBML_PATH, ModelVariant(schedules=[meal_schedule(2)]))
+    selections = ["time", "[glyglc]", "HGP"]
+    df = simulate_schedule(sbml, end=2 * DAY, dt=30, chunk=DAY,
+                           selections=selections, pool=simulator_pool)
+    df_chunks = simulate_schedule(sbml, end=2 * DAY, dt=30, chunk=6 * 60,
+                                  selections=selections, pool=simulator_pool)
+    assert df.shape == df_chunks.shape == (2 * 48 + 1, 3)
+    np.testing.assert_allclose(df.values, df_chunks.values, rtol=1E-6)
+    with pytest.raises(ValueError):
+        simulate_schedule(sbml, end=DAY, dt=7, chunk=DAY)
@@ -0,0 +1,191 @@
+"""
+Test the local simulation service.
+"""
+import asyncio
+
+import pytest
+
+from pyexsimo import MODEL_PATH
+from pyexsimo.service import (SimulationService, ServiceError, request, load,
+                              random_payloads)
+
+PAYLOAD = {
+    'model': 'liver_glucose_const_glyglc',
+    'changes': {'[glc_ext]': 4, '[glyglc]': 300},
+    'end': 120,
+}
+
+
+@pytest.fixture(scope="module")
+def service(simulator_pool):
+    service = SimulationService(workers=2, batch_window=0.01,
+                                pool=simulator_pool)
+    service.warm()
+    yield service
+    service.close()
+
+
+def _run(service, coroutine_function, path=None):
+    """Run coroutine against the service on an ephemeral port."""
+    loop = asyncio.new_event_loop()
+    try:
+        server = loop.run_until_complete(service.start(port=0, path=path))
+        port = None if path else server.sockets[0].getsockname()[1]
+        try:
+            return loop.run_until_complete(coroutine_function(port))
+        finally:
+            server.close()
+            loop.run_until_complete(server.wait_closed())
+    finally:
+        loop.close()
+
+
+def test_simulate(service, simulator_pool):
+    status, content = _run(service, lambda port: request(PAYLOAD, port=port))
+    assert status == 200
+    assert sorted(content['outputs']) == ['GLY', 'GNG', 'HGP']
+
+    with simulator_pool.simulator(
+            MODEL_PATH / "liver_glucose_const_glyglc.xml") as r:
+        r['[glc_ext]'] = 4
+        r['[glyglc]'] = 300
+        r.simulate(0, 120, 2)
+        hgp = r['HGP']
+    assert content['outputs']['HGP'] == pytest.approx(hgp, rel=1E-6)
+
+    # served from cache
+    status, content = _run(service, lambda port: request(PAYLOAD, port=port))
+    assert content['cached']
+
+
+def test_coalesce_and_batch(simulator_pool):
+    service = SimulationService(workers=1, batch_window=0.05,
+                                pool=simulator_pool)
+    payloads = [dict(PAYLOAD, changes={'[glc_ext]': 4 + k % 4,
+                                       '[glyglc]': 300}) for k in range(12)]
+
+    async def requests(port):
+        return await asyncio.gather(*[request(p, port=port) for p in payloads])
+
+    responses = _run(service, requests)
+    service.close()
+    assert all(status == 200 for status, _ in responses)
+    stats = service.stats()
+    assert stats['requests'] == 12
+    assert stats['simulations'] == 4
+    assert stats['coalesced'] == 8
+    assert stats['batches'] == 1
+    hgp = [content['outputs']['HGP'] for _, content in responses]
+    assert hgp[0] == hgp[4] == hgp[8]
+    assert hgp[0] > hgp[3]
+
+
+def test_errors(service):
+    async def requests(port):
+        return await asyncio.gather(
+            request(dict(PAYLOAD, model='unknown'), port=port),
+            request(dict(PAYLOAD, changes={'[unknown]': 1}), port=port),
+            request(dict(PAYLOAD, end=-1), port=port),
+            request(None, port=port, target="/unknown"),
+            # valid request, not in the batch of the invalid id
+            request(dict(PAYLOAD, changes={'[glc_ext]': 5}), port=port),
+        )
+
+    responses = _run(service, requests)
+    assert [status for status, _ in responses] == [400, 400, 400, 404, 200]
+    assert "unknown" in responses[0][1]['error']
+    with pytest.raises(ServiceError):
+        service.parse({'outputs': 'HGP'})
+
+
+def test_malformed_requests(service):
+    from pyexsimo.service import HOST, MAX_BODY
+
+    async def raw(port, content_length):
+        reader, writer = await asyncio.open_connection(HOST, port)
+        try:
+            writer.write((f"POST /simulate HTTP/1.1\r\n"
+                          f"Content-Length: {content_length}\r\n\r\n"
+                          ).encode("latin-1"))
+            await writer.drain()
+            status = int((await reader.readline()).split()[1])
+            # response with closed connection
+            response = await reader.read()
+            return status, b'"error"' in response
+        finally:
+            writer.close()
+
+    async def requests(port):
+        return await asyncio.gather(
+            raw(port, "abc"), raw(port, "-1"), raw(port, MAX_BODY + 1),
+            request(PAYLOAD, port=port),
+        )
+
+    responses = _run(service, requests)
+    assert [status for status, _ in responses] == [400, 400, 413, 200]
+    assert all(has_error for _, has_error in responses[:3])
+
+
+def test_unix_socket(service, tmp_path):
+    path = tmp_path / "pyexsimo.sock"
+
+    async def requests(port):
+        health = await request(None, path=path, target="/health")
+        return health, await request(PAYLOAD, path=path)
+
+    (status, health), (status2, content) = _run(service, requests, path=path)
+    assert status == status2 == 200
+    assert health['models'] == ['liver_glucose', 'liver_glucose_const_glyglc']
+    assert 'HGP' in content['outputs']
+
+
+def test_load(service):
+    payloads = random_payloads(50, seed=1)
+    stats = _run(service, lambda port: load(payloads, n=100, concurrency=8,
+                                            port=port))
+    assert stats['requests'] == 100
+    assert stats['errors'] == 0
+    assert 0 < stats['p50'] <= stats['p99'] <= stats['max']
+    assert stats['throughput'] > 0
+
+
+def test_failed_batch(simulator_pool):
+    service = SimulationService(workers=1, batch_window=0.05,
+                                pool=simulator_pool)
+    # integration fails for NaN, the other requests of the batch succeed
+    values = [4.0, 5.0, float('nan'), 6.0]
+    payloads = [dict(PAYLOAD, changes={'[glc_ext]': value, '[glyglc]': 300})
+                for value in values]
+
+    async def requests(port):
+        return await asyncio.gather(*[request(p, port=port) for p in payloads])
+
+    responses = _run(service, requests)
+    service.close()
+    assert [status for status, _ in responses] == [200, 200, 400, 200]
+    assert "CVODE" in responses[2][1]['error']
+    stats = service.stats()
+    assert stats['simulations'] == 3
+    assert stats['errors'] == 1
+
+
+def test_unexpected_error(simulator_pool):
+    service = SimulationService(workers=1, batch_window=0.05,
+                                pool=simulator_pool)
+
+    def run(*args):
+        raise KeyError("unexpected")
+
+    service._run = run
+    payloads = [dict(PAYLOAD, changes={'[glc_ext]': 4 + k % 2})
+                for k in range(4)]
+
+    async def requests(port):
+        return await asyncio.wait_for(asyncio.gather(
+            *[request(p, port=port) for p in payloads]), timeout=10)
+
+    responses = _run(service, requests)
+    service.close()
+    assert [status for status, _ in responses] == [500] * 4
+    assert not service._inflight
+    assert service.stats()['simulations'] == 0
@@ -1,44 +1,43 @@
 """
 Check that all models are simulatable.
+
+The compiled models are shared between the tests via the simulator pool.
 """
 import pytest
 from pytest import approx
-import roadrunner
 import pandas as pd
-import libsbml
 
-from pyexsimo.tests.utils import get_sbml_files, DOC
+from pyexsimo import MODEL_PATH
+from pyexsimo.tests.utils import get_sbml_files
 
 
 @pytest.mark.parametrize("sbml_path", get_sbml_files())
-def test_simulate_timecourse(sbml_path):
+def test_simulate_timecourse(sbml_path, simulator_pool):
     """ Test that all models allow timecourse simulations."""
-
-    r = roadrunner.RoadRunner(sbml_path)
-    s = r.simulate(0, 100, steps=100)
+    with simulator_pool.simulator(sbml_path) as r:
+        s = r.simulate(0, 100, steps=100)
     df = pd.DataFrame(s, columns=s.colnames)
     assert not df.empty
 
 
 @pytest.mark.parametrize("sbml_path", get_sbml_files())
-def test_species_nonnegative(sbml_path):
+def test_species_nonnegative(sbml_path, simulator_pool):
     """ Test that all model species are non-negative."""
-
-    r = roadrunner.RoadRunner(sbml_path)  # type: roadrunner.RoadRunner
-    s = r.simulate(0, 100, steps=100)
+    with simulator_pool.simulator(sbml_path) as r:
+        s = r.simulate(0, 100, steps=100)
+        species_ids = r.model.getFloatingSpeciesIds()
     df = pd.DataFrame(s, columns=s.colnames)
-    model = r.model  # type: roadrunner.ExecutableModel
-    for sid in model.getFloatingSpeciesIds():
+    for sid in species_ids:
         # check that no negative values in timecourse for species
         assert sum(df[f'[{sid}]'] < 0.0) == 0
 
 
 @pytest.mark.parametrize("sid_tot", ['nadh_tot', 'atp_tot', 'utp_tot', 'gtp_tot', 'nadh_mito_tot', 'atp_mito_tot', 'gtp_mito_tot'])
-def test_cofactor_bilances(sid_tot):
+def test_cofactor_bilances(sid_tot, simulator_pool):
     """ Test that main cofactors are bilanced during timecourse simulation."""
-    r = roadrunner.RoadRunner(libsbml.writeSBMLToString(DOC))  # type: roadrunner.RoadRunner
-    r.timeCourseSelections = ["time", sid_tot]
-    s = r.simulate(0, 100, steps=100)
+    with simulator_pool.simulator(MODEL_PATH / "liver_glucose.xml") as r:
+        r.timeCourseSelections = ["time", sid_tot]
+        s = r.simulate(0, 100, steps=100)
     df = pd.DataFrame(s, columns=s.colnames)
 
     assert df[sid_tot].values == approx(df[sid_tot].values[0])
@@ -0,0 +1,146 @@
+"""
+Test surrogate models of scan outputs.
+"""
+import itertools
+import time
+
+import numpy as np
+import pytest
+
+from pyexsimo import MODEL_PATH
+from pyexsimo.designs import sobol
+from pyexsimo.surrogate import (fit_surrogate, load_surrogate, pathway_surrogate,
+                                OUTPUTS)
+
+
+def _f(points):
+    """Smooth outputs with a zero contour."""
+    x, y = points[:, 0], points[:, 1]
+    return np.column_stack([np.tanh((x - 8) / 3) - y / 1000,
+                            np.sin(x / 4) * np.cos(y / 300),
+                            x * y / 7000])
+
+
+class ScanResult(object):
+    """Factorial or point scan with the attributes of sbmlsim Result."""
+
+    def __init__(self, vecs, indices):
+        self.keys = ['[glc_ext]', '[glyglc]']
+        self.vecs = [list(vec) for vec in vecs]
+        self.indices = indices
+        self.columns = ['time'] + OUTPUTS
+        points = np.array([[vecs[k][index[k]] for k in range(2)]
+                           for index in indices])
+        values = np.column_stack([np.full(len(points), 1000.0), _f(points)])
+        self.data = values.T[None, :, :]
+
+
+def _factorial(n0, n1):
+    vecs = [np.linspace(2, 14, n0), np.linspace(0, 500, n1)]
+    return ScanResult(vecs, list(itertools.product(range(n0), range(n1))))
+
+
+def _design(n):
+    points = np.array([2, 0]) + np.array([12, 500]) * sobol(n, 2, seed=1)
+    return ScanResult([points[:, 0], points[:, 1]], [(p, p) for p in range(n)])
+
+
+def _test_points():
+    return np.array([2, 0]) + np.array([12, 500]) * sobol(256, 2, seed=7)
+
+
+@pytest.mark.parametrize("method, result, kwargs, tol", [
+    ('grid', _factorial(40, 40), {}, 1E-2),
+    ('rbf', _design(256), {}, 1E-2),
+    ('pce', _design(256), {'degree': 8}, 1E-2),
+])
+def test_surrogate(method, result, kwargs, tol, tmp_path):
+    surrogate = fit_surrogate(result, method=method, **kwargs)
+    assert surrogate.method == method
+    assert surrogate.keys == ['[glc_ext]', '[glyglc]']
+    points = _test_points()
+    validation = surrogate.validate(points, _f(points))
+    assert validation['n'] == 256
+    for sid in OUTPUTS:
+        assert validation[sid]['max_rel_error'] < tol
+
+    path = tmp_path / f"{method}.npz"
+    surrogate.save(path)
+    loaded = load_surrogate(path)
+    np.testing.assert_array_equal(loaded.predict(points),
+                                  surrogate.predict(points))
+    assert loaded.validation == validation
+
+    # broadcast queries
+    X, Y = np.meshgrid(np.linspace(3, 13, 7), np.linspace(10, 490, 5))
+    values = loaded({'[glc_ext]': X, '[glyglc]': Y})
+    assert values['HGP'].shape == (5, 7)
+
+
+def test_grid_surrogate_exact():
+    result = _factorial(5, 7)
+    surrogate = fit_surrogate(result, method='grid')
+    points = np.array([[result.vecs[0][i], result.vecs[1][j]]
+                       for i, j in result.indices])
+    np.testing.assert_allclose(surrogate.predict(points), _f(points),
+                               atol=1E-12)
+    # clipped outside of the grid
+    np.testing.assert_allclose(surrogate.predict([[0, -100]]),
+                               surrogate.predict([[2, 0]]))
+    with pytest.raises(ValueError):
+        fit_surrogate(_design(16), method='grid')
+
+
+def test_holdout():
+    surrogate = fit_surrogate(_design(128), method='rbf', holdout=0.25)
+    assert surrogate.validation['n'] == 32
+    assert surrogate.validation['HGP']['nrmse'] < 1E-2
+
+
+def test_pce_moments():
+    surrogate = fit_surrogate(_design(256), method='pce', degree=8)
+    u = sobol(2 ** 14, 2, seed=3)
+    # uniform inputs in the box of the training points
+    values = _f(surrogate.lower + surrogate.scale * u)
+    np.testing.assert_allclose(surrogate.mean, values.mean(axis=0), atol=1E-4)
+    np.testing.assert_allclose(surrogate.variance, values.var(axis=0),
+                               rtol=1E-2, atol=1E-4)
+
+
+@pytest.mark.benchmark
+def test_query_time():
+    surrogate = fit_surrogate(_factorial(40, 40), method='grid')
+    points = _test_points().repeat(40, axis=0)
+    t = time.perf_counter()
+    surrogate.predict(points)
+    assert (time.perf_counter() - t) / len(points) < 1E-5
+
+
+def test_pathway_surrogate(tmp_path, simulator_pool):
+    from pyexsimo.cache import save_result
+
+    sbml_path = MODEL_PATH / "liver_glucose_const_glyglc.xml"
+    with pytest.raises(IOError):
+        pathway_surrogate(tmp_path, sbml_path)
+
+    result = _factorial(13, 6)
+    with simulator_pool.simulator(sbml_path) as r:
+        r.timeCourseSelections = result.columns
+        for p, (i, j) in enumerate(result.indices):
+            r.resetToOrigin()
+            r['[glc_ext]'] = result.vecs[0][i]
+            r['[glyglc]'] = result.vecs[1][j]
+            result.data[:, :, p] = r.simulate(0, 1000, 2)[-1:]
+    save_result(result, tmp_path / "PathwaySSExperiment_scan_ss_scan.npz")
+
+    surrogate = pathway_surrogate(tmp_path, sbml_path, n_validation=8,
+                                  pool=simulator_pool)
+    assert surrogate.validation['n'] == 8
+    for sid in OUTPUTS:
+        assert surrogate.validation[sid]['nrmse'] < 0.05
+
+
+def test_abstract_surrogate():
+    from pyexsimo.surrogate import Surrogate
+    with pytest.raises(TypeError):
+        Surrogate(['[glc_ext]'], OUTPUTS, lower=[0], scale=[1])
@@ -6,22 +6,48 @@ i.e., complete unit checking of all math.
 import pytest
 import libsbml
 
-from pyexsimo.tests.utils import MODEL, compartment_ids, species_ids, parameter_ids
+from pyexsimo.tests.utils import get_model, compartment_ids, species_ids, parameter_ids
 
 
 @pytest.mark.parametrize("sid", species_ids())
 def test_specie_has_substance_units(sid):
-    specie = MODEL.getSpecies(sid)  # type: libsbml.Species
+    specie = get_model().getSpecies(sid)  # type: libsbml.Species
     assert specie.getSubstanceUnits()
 
 
 @pytest.mark.parametrize("sid", compartment_ids())
 def test_compartment_has_units(sid):
-    compartment = MODEL.getCompartment(sid)  # type: libsbml.Compartment
+    compartment = get_model().getCompartment(sid)  # type: libsbml.Compartment
     assert compartment.getUnits()
 
 
 @pytest.mark.parametrize("sid", parameter_ids())
 def test_parameter_has_units(sid):
-    parameter = MODEL.getParameter(sid)  # type: libsbml.Parameter
+    parameter = get_model().getParameter(sid)  # type: libsbml.Parameter
     assert parameter.getUnits()
+
+
+def test_shared_unit_registry():
+    from pyexsimo import MODEL_PATH
+    from pyexsimo.units import get_units, get_ureg
+
+    udict, ureg = get_units(MODEL_PATH / "liver_glucose.xml")
+    assert ureg is get_ureg()
+    assert udict['time'] == "min"
+    udict2, ureg2 = get_units(MODEL_PATH / "liver_glucose.xml")
+    assert ureg2 is ureg
+    assert udict2 == udict
+
+
+def test_convert():
+    import numpy as np
+    from pyexsimo.units import convert, conversion_factor
+
+    assert conversion_factor("min", "hr") == pytest.approx(1/60)
+    assert conversion_factor("mM", "mM") == 1.0
+    values = np.array([30.0, 60.0, 90.0])
+    np.testing.assert_allclose(convert(values, "min", "hr"), [0.5, 1.0, 1.5])
+    np.testing.assert_array_equal(convert(values, "min", None), values)
+
+    with pytest.raises(ValueError):
+        conversion_factor("degC", "K")
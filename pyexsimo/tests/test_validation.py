@@ -0,0 +1,82 @@
+"""
+Test mass and charge balance of reactions.
+"""
+import numpy as np
+import pytest
+import libsbml
+
+from pyexsimo.validation import (parse_formula, element_matrix, mass_balance,
+                                 imbalanced_reactions)
+
+
+def test_parse_formula():
+    assert parse_formula("C6H12O6") == {'C': 6, 'H': 12, 'O': 6}
+    assert parse_formula("H2O") == {'H': 2, 'O': 1}
+    assert parse_formula("CoCl2") == {'Co': 1, 'Cl': 2}
+    assert parse_formula("") == {}
+
+
+@pytest.mark.parametrize("formula", ["C6H12O6+", "c6", "C6 H12", "(CH2)2"])
+def test_parse_formula_invalid(formula):
+    with pytest.raises(ValueError):
+        parse_formula(formula)
+
+
+def test_element_matrix():
+    elements, matrix = element_matrix(["H2O", "CO2", None])
+    assert elements == ['C', 'H', 'O']
+    np.testing.assert_array_equal(matrix, [[0, 2, 1], [1, 0, 2], [0, 0, 0]])
+
+
+def _model(species, reactions):
+    """Model with fbc species {sid: (formula, charge)} and reactions
+    {rid: (reactants, products)}."""
+    doc = libsbml.SBMLDocument(3, 1)
+    doc.enablePackage(libsbml.FbcExtension.getXmlnsL3V1V2(), "fbc", True)
+    model = doc.createModel()
+    c = model.createCompartment()
+    c.setId("c")
+    for sid, (formula, charge) in species.items():
+        s = model.createSpecies()
+        s.setId(sid)
+        s.setCompartment("c")
+        fbc = s.getPlugin("fbc")
+        if formula:
+            fbc.setChemicalFormula(formula)
+        if charge is not None:
+            fbc.setCharge(charge)
+    for rid, (reactants, products) in reactions.items():
+        r = model.createReaction()
+        r.setId(rid)
+        for sid, stoichiometry in reactants.items():
+            ref = r.createReactant()
+            ref.setSpecies(sid)
+            ref.setStoichiometry(stoichiometry)
+        for sid, stoichiometry in products.items():
+            ref = r.createProduct()
+            ref.setSpecies(sid)
+            ref.setStoichiometry(stoichiometry)
+    return doc, model
+
+
+def test_mass_balance():
+    doc, model = _model(
+        species={
+            'h2': ("H2", 0), 'o2': ("O2", 0), 'h2o': ("H2O", 0),
+            'h': ("H", 1), 'x': (None, None),
+        },
+        reactions={
+            'R1': ({'h2': 2, 'o2': 1}, {'h2o': 2}),  # balanced
+            'R2': ({'h2': 1, 'o2': 1}, {'h2o': 1}),  # O imbalance
+            'R3': ({'h2': 1}, {'h': 2}),  # charge imbalance
+            'R4': ({'h2o': 1}, {'x': 1}),  # unknown formula
+            'EX': ({}, {'h2o': 1}),  # pseudo reaction
+        })
+    balance = mass_balance(model, exclude=["EX"])
+    assert list(balance.index) == ['R1', 'R2', 'R3', 'R4']
+    imbalanced = imbalanced_reactions(balance)
+    assert 'R1' not in imbalanced
+    assert imbalanced['R2'] == {'O': -1.0}
+    assert imbalanced['R3'] == {'charge': 2.0}
+    assert set(imbalanced['R4']) == {'H', 'O', 'charge'}
+    assert np.isnan(imbalanced['R4']['charge'])
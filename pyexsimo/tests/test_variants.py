@@ -0,0 +1,92 @@
+"""
+Test in-memory model variants.
+"""
+import pytest
+import libsbml
+
+from pyexsimo import MODEL_PATH
+from pyexsimo.variants import ModelVariant, variant_sbml, write_variant
+from pyexsimo.model_factory import CONST_GLYCOGEN
+
+SBML_PATH = MODEL_PATH / "liver_glucose.xml"
+
+
+def test_variant_key():
+    v1 = ModelVariant(clamp=["glc_ext", "glyglc"], parameters={"scale": 1})
+    v2 = ModelVariant(clamp=["glyglc", "glc_ext"], parameters={"scale": 1.0})
+    assert v1 == v2
+    assert v1.key == v2.key
+    assert v1 != ModelVariant(clamp=["glyglc"])
+    assert v1.suffix.startswith("_variant_")
+
+
+def test_variant_cached():
+    assert variant_sbml(SBML_PATH, CONST_GLYCOGEN) is variant_sbml(
+        SBML_PATH, ModelVariant(clamp=["glyglc"], suffix="_const_glyglc"))
+
+
+def test_variant_suffix():
+    variant_sbml(SBML_PATH, CONST_GLYCOGEN)
+    variant = ModelVariant(clamp=["glyglc"])
+    doc = libsbml.readSBMLFromString(variant_sbml(SBML_PATH, variant))
+    assert doc.getModel().getId().endswith(variant.suffix)
+
+
+def test_clamp():
+    doc = libsbml.readSBMLFromString(variant_sbml(SBML_PATH, CONST_GLYCOGEN))
+    model = doc.getModel()
+    assert model.getId().endswith("_const_glyglc")
+    assert model.getSpecies("glyglc").getBoundaryCondition()
+
+
+def test_parameters(simulator_pool):
+    variant = ModelVariant(parameters={"scale": 2.0})
+    with simulator_pool.simulator(variant_sbml(SBML_PATH, variant)) as r:
+        assert r["scale"] == 2.0
+
+
+def test_knockout(simulator_pool):
+    variant = ModelVariant(knockouts=["GLUT2"])
+    with simulator_pool.simulator(variant_sbml(SBML_PATH, variant)) as r:
+        r.simulate(0, 10, 11)
+        assert r["GLUT2"] == 0.0
+
+
+@pytest.mark.parametrize("variant", [
+    ModelVariant(clamp=["unknown"]),
+    ModelVariant(parameters={"unknown": 1.0}),
+    ModelVariant(parameters={"f_gly": 1.0}),
+    ModelVariant(knockouts=["unknown"]),
+])
+def test_invalid_variant(variant):
+    with pytest.raises(ValueError):
+        variant_sbml(SBML_PATH, variant)
+
+
+def test_knockout_without_kinetic_law():
+    from pyexsimo.variants import apply_variant
+
+    doc = libsbml.readSBMLFromFile(str(SBML_PATH))
+    doc.getModel().getReaction("GLUT2").unsetKineticLaw()
+    with pytest.raises(ValueError, match="no kinetic law"):
+        apply_variant(doc, ModelVariant(knockouts=["GLUT2"]))
+
+
+def test_write_variant(tmp_path):
+    path = write_variant(SBML_PATH, CONST_GLYCOGEN, target_dir=tmp_path)
+    assert path == str(tmp_path / "liver_glucose_const_glyglc.xml")
+    doc = libsbml.readSBMLFromFile(path)
+    assert doc.getModel().getSpecies("glyglc").getBoundaryCondition()
+
+
+def test_variant_simulator(simulator_pool):
+    from pyexsimo.pool import model_key
+    from pyexsimo.variants import variant_simulator
+
+    variant = ModelVariant(parameters={"scale": 3.0})
+    with variant_simulator(SBML_PATH, variant, pool=simulator_pool) as sim:
+        assert sim.r["scale"] == 3.0
+        r = sim.r
+    # instance returned to the pool
+    idle = simulator_pool._idle[model_key(variant_sbml(SBML_PATH, variant))]
+    assert r in idle
@@ -2,24 +2,34 @@
 Helper functions for testing.
 """
 import os
-import libsbml
+from functools import lru_cache
 
 from pyexsimo import MODEL_PATH
-DOC = libsbml.readSBMLFromFile(str(MODEL_PATH / "liver_glucose.xml"))  # type: libsbml.SBMLDocument
-MODEL = DOC.getModel()  # type: libsbml.Model
+
+
+@lru_cache(maxsize=None)
+def get_doc():
+    """SBMLDocument of the model, parsed on first use."""
+    import libsbml
+    return libsbml.readSBMLFromFile(str(MODEL_PATH / "liver_glucose.xml"))  # type: libsbml.SBMLDocument
+
+
+def get_model():
+    """SBML model, parsed on first use."""
+    return get_doc().getModel()  # type: libsbml.Model
 
 
 def compartment_ids():
-    return [sbase.getId() for sbase in MODEL.getListOfCompartments()]
+    return [sbase.getId() for sbase in get_model().getListOfCompartments()]
 
 def species_ids():
-    return [sbase.getId() for sbase in MODEL.getListOfSpecies()]
+    return [sbase.getId() for sbase in get_model().getListOfSpecies()]
 
 def parameter_ids():
-    return [sbase.getId() for sbase in MODEL.getListOfParameters()]
+    return [sbase.getId() for sbase in get_model().getListOfParameters()]
 
 def reaction_ids():
-    return [sbase.getId() for sbase in MODEL.getListOfReactions()]
+    return [sbase.getId() for sbase in get_model().getListOfReactions()]
 
 
 def get_sbml_files(model_dir=MODEL_PATH):
@@ -0,0 +1,129 @@
+"""
+Shared unit registry and precomputed unit conversions.
+
+All experiments, results and datasets of a process use a single pint
+UnitRegistry. Creating a registry and parsing unit strings is expensive,
+so the registry is created once and the unit definitions of the models are
+added to it. The units of a model are cached by model path and modification
+time.
+
+Conversion factors between pairs of units are computed once with pint and
+cached, conversions of values are a single multiplication of the NumPy
+arrays without Quantity wrappers.
+"""
+import os
+import logging
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_ureg = None
+_ureg_lock = threading.RLock()
+
+
+def get_ureg():
+    """Shared unit registry of the process."""
+    global _ureg
+    with _ureg_lock:
+        if _ureg is None:
+            from sbmlsim.units import Units
+            _ureg = Units.default_ureg()
+        return _ureg
+
+
+def register_sbml_units(doc):
+    """Add the unit definitions of the SBML document to the shared registry.
+
+    Units which already exist in the registry are not redefined, a
+    different definition in the model is logged as error.
+
+    :param doc: libsbml.SBMLDocument
+    :return: shared unit registry
+    """
+    from pint.errors import UndefinedUnitError
+    from sbmlsim.units import Units
+
+    model = doc.getModel()  # type: libsbml.Model
+    with _ureg_lock:
+        ureg = get_ureg()
+        for udef in model.getListOfUnitDefinitions():  # type: libsbml.UnitDefinition
+            uid = udef.getId()
+            udef_str = Units.unitDefinitionToString(udef)
+            try:
+                q1 = ureg(uid)
+                q2 = ureg(udef_str)
+                if q1 != q2:
+                    logger.error(f"SBML uid '{uid}' defined differently in "
+                                 f"UnitsRegistry: '{uid} = {q1} != {q2}")
+            except UndefinedUnitError:
+                ureg.define(f"{uid} = {udef_str}")
+    return ureg
+
+
+def _shared_units():
+    """Units class which reads the model units in the shared registry."""
+    from sbmlsim.units import Units
+
+    class SharedUnits(Units):
+        @classmethod
+        def ureg_from_sbml(cls, doc):
+            return register_sbml_units(doc)
+
+    return SharedUnits
+
+
+@lru_cache(maxsize=32)
+def _model_units(model_path: str, mtime: float):
+    return _shared_units().get_units_from_sbml(model_path)
+
+
+def get_units(model_path):
+    """Units dictionary and shared unit registry of the SBML model.
+
+    The units are read once per model path and modification time.
+
+    :param model_path: path of SBML model
+    :return: (udict, ureg)
+    """
+    model_path = str(model_path)
+    udict, ureg = _model_units(model_path, os.path.getmtime(model_path))
+    return dict(udict), ureg
+
+
+@lru_cache(maxsize=1024)
+def _conversion_factor(from_unit: str, to_unit: str, ureg) -> float:
+    q = ureg.Quantity(1.0, from_unit)
+    factor = float(q.to(to_unit).magnitude)
+    if ureg.Quantity(0.0, from_unit).to(to_unit).magnitude != 0.0:
+        raise ValueError(f"Conversion '{from_unit}' -> '{to_unit}' is not "
+                         f"multiplicative")
+    return factor
+
+
+def conversion_factor(from_unit: str, to_unit: str, ureg=None) -> float:
+    """Factor for conversion of values from unit to target unit.
+
+    Factors are cached per unit pair and registry.
+
+    :param ureg: unit registry, the shared registry if None
+    """
+    if ureg is None:
+        ureg = get_ureg()
+    if not to_unit or from_unit == to_unit:
+        return 1.0
+    return _conversion_factor(str(from_unit), str(to_unit), ureg)
+
+
+def convert(values, from_unit: str, to_unit: str, ureg=None) -> np.ndarray:
+    """Convert values to target unit.
+
+    :param values: array-like of values in from_unit
+    :param to_unit: target unit, no conversion if None
+    :return: NumPy array in to_unit
+    """
+    factor = conversion_factor(from_unit, to_unit, ureg=ureg)
+    values = np.asarray(values, dtype=float)
+    return values if factor == 1.0 else values * factor
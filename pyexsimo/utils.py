@@ -0,0 +1,69 @@
+"""
+Helper functions for hashing and writing of models and files.
+"""
+import os
+import re
+import json
+import hashlib
+import threading
+from pathlib import Path
+
+# content which changes with every model build (creation dates, uuid metaids)
+SBML_VOLATILE_PATTERNS = [
+    re.compile(r"<dcterms:W3CDTF>[^<]*</dcterms:W3CDTF>"),
+    re.compile(r"meta_[0-9a-f]{32}"),
+]
+
+
+def file_hash(path) -> str:
+    """SHA256 hex digest of the file content."""
+    sha = hashlib.sha256()
+    with open(str(path), "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def sbml_hash(sbml) -> str:
+    """SHA256 hex digest of the SBML content.
+
+    Creation dates and random metaids are removed before hashing, so that
+    rebuilding an unchanged model results in the same hash.
+
+    :param sbml: path to SBML file or SBML string
+    """
+    if isinstance(sbml, str) and sbml.lstrip().startswith("<"):
+        content = sbml
+    else:
+        with open(str(sbml), "r", encoding="utf-8") as f:
+            content = f.read()
+    for pattern in SBML_VOLATILE_PATTERNS:
+        content = pattern.sub("", content)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def source_hash(source_path) -> str:
+    """SHA256 hex digest of the Python source of the package (without tests).
+
+    :param source_path: directory of the package
+    """
+    source_path = Path(source_path)
+    paths = sorted(path for path in source_path.rglob("*.py")
+                   if "tests" not in path.relative_to(source_path).parts)
+    d = [[str(path.relative_to(source_path)), file_hash(path)]
+         for path in paths]
+    content = json.dumps(d)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def write_atomic(path, content: str):
+    """Write text file atomically.
+
+    The content is written to a temporary file which replaces the target,
+    so that concurrent readers never see partial files.
+    """
+    path = Path(path)
+    path_tmp = path.parent / f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(str(path_tmp), "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(str(path_tmp), str(path))
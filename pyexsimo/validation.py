@@ -0,0 +1,130 @@
+"""
+Mass and charge balance of the model reactions.
+
+The balances are computed directly from the fbc chemical formulas and
+charges of the species. The formulas are parsed in an element count
+matrix E (species x elements), the charges in a vector z. With the sparse
+stoichiometric matrix N (species x reactions) of 'pyexsimo.network' the
+imbalance of all reactions is
+
+    N^T [E | z]   (reactions x (elements + charge))
+
+computed in a single sparse matrix product.
+"""
+import re
+import logging
+from typing import Dict, List
+
+import numpy as np
+
+from pyexsimo.network import Network
+
+logger = logging.getLogger(__name__)
+
+# pseudo reactions exchanging mass with the environment
+PSEUDO_REACTIONS = ['OAAFLX', 'ACOAFLX', 'CITFLX']
+
+CHARGE = "charge"
+
+_ELEMENT_PATTERN = re.compile(r"([A-Z][a-z]*)(\d*)")
+
+
+def parse_formula(formula: str) -> Dict[str, int]:
+    """Element counts of chemical formula, e.g. 'C6H12O6'.
+
+    :raises ValueError: for formulas which are not a sequence of elements
+        with counts
+    """
+    formula = formula.strip()
+    counts = {}
+    position = 0
+    for match in _ELEMENT_PATTERN.finditer(formula):
+        if match.start() != position:
+            break
+        element, count = match.groups()
+        counts[element] = counts.get(element, 0) + (int(count) if count else 1)
+        position = match.end()
+    if position != len(formula):
+        raise ValueError(f"Invalid chemical formula: '{formula}'")
+    return counts
+
+
+def element_matrix(formulas: List[str]):
+    """Element count matrix of formulas.
+
+    Missing formulas (None or empty) have no elements.
+
+    :return: (elements, matrix (formulas x elements))
+    """
+    parsed = [parse_formula(f) if f else {} for f in formulas]
+    elements = sorted({e for counts in parsed for e in counts})
+    index = {e: k for k, e in enumerate(elements)}
+    matrix = np.zeros(shape=(len(formulas), len(elements)))
+    for i, counts in enumerate(parsed):
+        for element, count in counts.items():
+            matrix[i, index[element]] = count
+    return elements, matrix
+
+
+def _species_formulas(model):
+    """Chemical formulas and charges of species from fbc."""
+    formulas = []
+    charges = []
+    for k in range(model.getNumSpecies()):
+        fbc = model.getSpecies(k).getPlugin("fbc")
+        if fbc is None:
+            formulas.append(None)
+            charges.append(np.nan)
+            continue
+        formulas.append(fbc.getChemicalFormula() or None)
+        charges.append(fbc.getCharge() if fbc.isSetCharge() else np.nan)
+    return formulas, np.array(charges, dtype=float)
+
+
+def mass_balance(model, exclude=PSEUDO_REACTIONS):
+    """Element and charge imbalance of all reactions.
+
+    :param model: libsbml.Model
+    :param exclude: ids of reactions which are not checked
+    :return: DataFrame (reactions x (elements + charge)) of imbalances;
+        reactions with species without formula or charge have NaN in the
+        respective columns
+    """
+    import pandas as pd
+
+    network = Network(model)
+    N = network.stoichiometric_matrix()
+    formulas, charges = _species_formulas(model)
+    elements, E = element_matrix(formulas)
+
+    # species without formula are unknown in all elements
+    E[[f is None for f in formulas], :] = np.nan
+    A = np.column_stack([E, charges])
+    known = ~np.isnan(A)
+
+    balance = N.T @ np.where(known, A, 0.0)
+    # reactions with participating species of unknown formula or charge
+    unknown = (abs(N).T @ (~known).astype(float)) > 0
+    balance[unknown] = np.nan
+
+    df = pd.DataFrame(balance, index=network.reaction_ids,
+                      columns=elements + [CHARGE])
+    if exclude:
+        df = df.drop(index=[rid for rid in exclude if rid in df.index])
+    return df
+
+
+def imbalanced_reactions(balance, tol: float = 1E-10) -> Dict[str, Dict[str, float]]:
+    """Imbalanced reactions of the mass balance.
+
+    :param balance: result of mass_balance
+    :return: dictionary of reaction id and imbalances of elements and charge,
+        unknown imbalances (missing formulas or charges) are NaN
+    """
+    values = balance.values
+    mask = ~(np.abs(values) <= tol)  # True for imbalance or NaN
+    imbalanced = {}
+    for i, j in zip(*np.nonzero(mask)):
+        rid = balance.index[i]
+        imbalanced.setdefault(rid, {})[balance.columns[j]] = float(values[i, j])
+    return imbalanced
@@ -0,0 +1,212 @@
+"""
+In-memory model variants.
+
+A variant modifies a base SBML model by clamping species (boundary
+condition), overriding parameter values, knocking out reactions (kinetic
+law multiplied by zero) or driving inputs by schedules
+(pyexsimo.schedules). Variants are applied to the in-memory SBML document
+and cached by base model and variant specification. The SBML string of a
+variant is handed directly to the simulator, writing the SBML file and the
+HTML report is optional.
+"""
+import os
+import json
+import hashlib
+import logging
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class ModelVariant(object):
+    """Specification of a model variant."""
+
+    def __init__(self, clamp=None, parameters=None, knockouts=None,
+                 schedules=None, suffix=None):
+        """
+        :param clamp: ids of species with constant concentration
+        :param parameters: dictionary of parameter ids and values
+            (in model units)
+        :param knockouts: ids of reactions which are knocked out
+        :param schedules: list of InputSchedule of inputs
+        :param suffix: suffix of model id and filename, by default the
+            suffix is created from the variant key
+        """
+        self.clamp = sorted(clamp or [])
+        self.parameters = {pid: float(value)
+                           for pid, value in (parameters or {}).items()}
+        self.knockouts = sorted(knockouts or [])
+        self.schedules = list(schedules or [])
+        self._suffix = suffix
+
+    def spec(self) -> dict:
+        """Normalized specification of the variant."""
+        spec = {
+            'clamp': self.clamp,
+            'parameters': self.parameters,
+            'knockouts': self.knockouts,
+        }
+        if self.schedules:
+            spec['schedules'] = [schedule.spec()
+                                 for schedule in self.schedules]
+        return spec
+
+    @property
+    def key(self) -> str:
+        """SHA256 hex digest of the variant specification."""
+        content = json.dumps(self.spec(), sort_keys=True)
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    @property
+    def suffix(self) -> str:
+        if self._suffix is not None:
+            return self._suffix
+        return f"_variant_{self.key[:8]}"
+
+    def __eq__(self, other):
+        return isinstance(other, ModelVariant) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return f"ModelVariant({self.spec()})"
+
+
+def apply_variant(doc, variant: ModelVariant):
+    """Apply variant to SBML document in place.
+
+    :param doc: libsbml.SBMLDocument
+    :param variant: model variant
+    """
+    import libsbml
+
+    model = doc.getModel()  # type: libsbml.Model
+
+    for sid in variant.clamp:
+        species = model.getSpecies(sid)
+        if species is None:
+            raise ValueError(f"Species '{sid}' does not exist in model "
+                             f"'{model.getId()}'")
+        species.setBoundaryCondition(True)
+
+    for pid, value in variant.parameters.items():
+        parameter = model.getParameter(pid)
+        if parameter is None:
+            raise ValueError(f"Parameter '{pid}' does not exist in model "
+                             f"'{model.getId()}'")
+        if (model.getRule(pid) is not None
+                or model.getInitialAssignment(pid) is not None):
+            raise ValueError(f"Parameter '{pid}' is defined by a rule or "
+                             f"initial assignment, value cannot be overridden")
+        parameter.setValue(value)
+
+    for rid in variant.knockouts:
+        reaction = model.getReaction(rid)
+        if reaction is None:
+            raise ValueError(f"Reaction '{rid}' does not exist in model "
+                             f"'{model.getId()}'")
+        if (not reaction.isSetKineticLaw()
+                or not reaction.getKineticLaw().isSetMath()):
+            raise ValueError(f"Reaction '{rid}' has no kinetic law, it "
+                             f"cannot be knocked out")
+        klaw = reaction.getKineticLaw()  # type: libsbml.KineticLaw
+        formula = libsbml.formulaToL3String(klaw.getMath())
+        klaw.setMath(libsbml.parseL3Formula(f"0 * ({formula})"))
+
+    if variant.schedules:
+        from pyexsimo.schedules import apply_schedule
+        for schedule in variant.schedules:
+            apply_schedule(model, schedule)
+
+    model.setId(model.getId() + variant.suffix)
+    return doc
+
+
+@lru_cache(maxsize=128)
+def _variant_sbml(sbml_path: str, mtime: float, variant: ModelVariant,
+                  suffix: str) -> str:
+    # the suffix is not part of the variant key, but of the SBML (model id)
+    import libsbml
+
+    doc = libsbml.readSBMLFromString(_base_sbml(sbml_path, mtime))
+    apply_variant(doc, variant)
+    return libsbml.writeSBMLToString(doc)
+
+
+@lru_cache(maxsize=16)
+def _base_sbml(sbml_path: str, mtime: float) -> str:
+    with open(sbml_path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def variant_sbml(sbml_path, variant: ModelVariant) -> str:
+    """SBML string of variant of the base model.
+
+    Variants are cached by base model (path and modification time), variant
+    specification and suffix.
+    """
+    sbml_path = str(sbml_path)
+    return _variant_sbml(sbml_path, os.path.getmtime(sbml_path), variant,
+                         variant.suffix)
+
+
+@contextmanager
+def variant_simulator(sbml_path, variant: ModelVariant, udict=None, ureg=None,
+                      Simulator=None, pool=None, **integrator_settings):
+    """Context manager for simulator of variant of the base model without
+    writing the SBML.
+
+    The compiled variant is taken from the simulator pool and returned to
+    the pool on exit. Variants do not change units, the units of the base
+    model are used.
+
+        with variant_simulator(sbml_path, variant) as simulator:
+            result = simulator.timecourses(tcsim)
+
+    :param udict: units of the base model, read from the base model if None
+    :param ureg: unit registry of the base model
+    :param pool: SimulatorPool, the pool of the process if None
+    """
+    from pyexsimo.pool import get_pool
+    from pyexsimo.runner import create_simulator
+
+    if udict is None:
+        from pyexsimo.units import get_units
+        udict, ureg = get_units(sbml_path)
+    if pool is None:
+        pool = get_pool()
+
+    model = variant_sbml(sbml_path, variant)
+    simulator = create_simulator(model, udict=udict, ureg=ureg,
+                                 Simulator=Simulator, pool=pool,
+                                 **integrator_settings)
+    try:
+        yield simulator
+    finally:
+        pool.release(model, simulator.r)
+
+
+def write_variant(sbml_path, variant: ModelVariant, target_dir,
+                  create_report=False) -> str:
+    """Write SBML file of variant of the base model.
+
+    :param target_dir: directory of the variant
+    :param create_report: create HTML report of the variant
+    :return: path of SBML file
+    """
+    from pyexsimo.utils import write_atomic
+
+    filename = Path(sbml_path).name
+    path = os.path.join(str(target_dir),
+                        f"{filename[:-4]}{variant.suffix}.xml")
+    write_atomic(path, variant_sbml(sbml_path, variant))
+    logger.info(f"Create variant '{path}'")
+
+    if create_report:
+        from sbmlutils.report import sbmlreport
+        sbmlreport.create_report(path, report_dir=target_dir)
+
+    return path
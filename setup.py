@@ -78,6 +78,7 @@ setup(
         'console_scripts':
             [
                 'execute=pyexsimo.execute:execute',
+                'pyexsimo=pyexsimo.cli:main',
             ],
     },
     include_package_data=True,